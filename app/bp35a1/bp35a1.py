@@ -1,14 +1,52 @@
 import re
+import time
 import asyncio
+import logging
 import aioserial
 from asyncio import Queue
 from enum import StrEnum
-from typing import Final, Optional, Union
+from typing import Final, Iterable, Optional, Union
 
+from app.bp35a1.capture import CaptureWriter, Direction
 from app.bp35a1.command import Command
 from app.bp35a1.rx_state import RxState
 from app.bp35a1.event import Epan, Event, EventCode, EventData, RxData
 from app.bp35a1.exception import CommandError, PANAConnectError, TxProhibisionError
+from app.log.config import RAW_LINE_LOGGER
+from app.metrics.registry import REGISTRY
+from app.metrics.tracing import TRACER
+
+logger = logging.getLogger(__name__)
+raw_logger = logging.getLogger(RAW_LINE_LOGGER)
+
+SERIAL_RX_BYTES = REGISTRY.counter(
+    "bp35a1_serial_rx_bytes_total", "Bytes received from serial port", ("port",)
+)
+SERIAL_RX_LINES = REGISTRY.counter(
+    "bp35a1_serial_rx_lines_total", "Lines received from serial port", ("port",)
+)
+SERIAL_TX_BYTES = REGISTRY.counter(
+    "bp35a1_serial_tx_bytes_total", "Bytes sent to serial port", ("port",)
+)
+COMMAND_LATENCY = REGISTRY.histogram(
+    "bp35a1_command_latency_seconds",
+    "Time from command write to OK/FAIL",
+    ("port", "command"),
+)
+COMMAND_FAILURES = REGISTRY.counter(
+    "bp35a1_command_failures_total",
+    "Commands answered with FAIL or timed out",
+    ("port", "command", "reason"),
+)
+EVENTS = REGISTRY.counter(
+    "bp35a1_events_total", "EVENT lines received", ("port", "event")
+)
+EVENT_QUEUE_DEPTH = REGISTRY.gauge(
+    "bp35a1_event_queue_depth", "Items waiting in event queue", ("port",)
+)
+
+MIN_CHANNEL: Final[int] = 33
+"""スキャン対象のチャネルマスクの最下位ビットに対応する論理チャネル番号"""
 
 
 class BP35A1:
@@ -28,8 +66,9 @@ class BP35A1:
         CRLF = "\r\n"
         CR = "\r"
 
-    def __init__(self, port: str):
-        self._ser = aioserial.AioSerial(
+    def __init__(self, port: str, serial: Optional[aioserial.AioSerial] = None):
+        # 計測・再生用に差し替え可能(未指定時は実ポートを開く)
+        self._ser = serial or aioserial.AioSerial(
             port=port, baudrate=self.SERIAL_BAUDRATE, timeout=3
         )
         self._newline_code = self.NewLineCode.CRLF
@@ -43,12 +82,39 @@ class BP35A1:
         self._response_queue: Queue[str] = Queue()
 
         self._udp_tx_allowed: bool = False
+        self._command_lock: asyncio.Lock = asyncio.Lock()
+        """コマンド送信排他(応答キューを共有するため)"""
+        self._pong_waiters: dict[str, asyncio.Future[None]] = {}
+        """SKPING の宛先 → EPONG 受信待ち"""
         self._rx_task = None
-
-    async def init(self, id: str, password: str):
+        self._capture: Optional[CaptureWriter] = None
+        self._line_started_ns: int = 0
+        """受信中の行の先頭バイトの受信時刻(計測用)"""
+
+        self._port: str = port
+        self._rx_bytes = SERIAL_RX_BYTES.labels(port=port)
+        self._rx_lines = SERIAL_RX_LINES.labels(port=port)
+        self._tx_bytes = SERIAL_TX_BYTES.labels(port=port)
+        EVENT_QUEUE_DEPTH.labels(port=port).set_function(self._event_queue.qsize)
+
+    def start(self):
+        """受信処理を開始(init() から呼ばれる。再生時は単独で使用)"""
         if self._rx_task is None:
             self._rx_task = asyncio.create_task(self._proc_rx())
 
+    def start_capture(self, file_path: str):
+        """送受信した全行をキャプチャファイルへ記録"""
+        self.stop_capture()
+        self._capture = CaptureWriter(file_path)
+
+    def stop_capture(self):
+        if self._capture:
+            self._capture.close()
+            self._capture = None
+
+    async def init(self, id: str, password: str):
+        self.start()
+
         await self._correct_baudrate()
 
         await self._send_command(Command.SKRESET, timeout=3, expect_echo=True)
@@ -61,8 +127,26 @@ class BP35A1:
         await self._send_command(Command.SKSETRBID, [id])
         await self._send_command(Command.SKSETPWD, [f"{len(password):X}", password])
 
+    async def close(self):
+        if self._rx_task is not None:
+            self._rx_task.cancel()
+            await asyncio.gather(self._rx_task, return_exceptions=True)
+            self._rx_task = None
+
+        self._udp_tx_allowed = False
+        self._ser.close()
+        self.stop_capture()
+
+    async def wait_rx_stopped(self):
+        """受信処理が停止するまで待機し、停止理由を例外として送出"""
+        if self._rx_task is None:
+            raise Exception("Receive task not started")
+
+        await self._rx_task
+        raise Exception("Serial port closed")
+
     async def _correct_baudrate(self):
-        print("Checking baudrate...")
+        logger.info("Checking baudrate", extra={"port": self._port})
 
         # タイミングによってはなぜかSKVERがFAILを返すので2回ループ
         for _ in range(2):
@@ -70,7 +154,9 @@ class BP35A1:
                 try:
                     self._ser.baudrate = baudrate
 
-                    print(f"Testing baudrate {baudrate}bps")
+                    logger.debug(
+                        "Testing baudrate %dbps", baudrate, extra={"port": self._port}
+                    )
 
                     await self.clear_buffer()
                     await self._ser.write_async(b"\r\n")
@@ -86,35 +172,61 @@ class BP35A1:
 
         raise Exception("No valid baudrate found.")
 
-    async def scan(self, init_duration: int = 4) -> Optional[Epan]:
+    async def scan(
+        self,
+        init_duration: int = 4,
+        pair_id: Optional[str] = None,
+        channels: Optional[Iterable[int]] = None,
+        max_duration: int = 7,
+    ) -> list[Epan]:
+        """アクティブスキャンで検出した全EPANを返す(MACアドレス毎に最新の結果)
+
+        ペアリングIDの指定時は一致するEPANを、未指定時はいずれかのEPANを
+        検出するまでスキャン時間を max_duration まで延ばして再スキャンし、
+        検出結果は合算する。channels 指定時はその論理チャネルのみスキャンする。
+        """
         duration = init_duration
-        epan = None
+        epans: dict[str, Epan] = {}
+        pair_id = pair_id.upper() if pair_id else None
+
+        channel_mask = 0xFFFFFFFF
+        if channels is not None:
+            channel_mask = sum(
+                1 << (channel - MIN_CHANNEL) for channel in set(channels)
+            )
 
-        print("Scanning...")
+        logger.info(
+            "Scanning",
+            extra={"port": self._port, "channel_mask": f"{channel_mask:08X}"},
+        )
 
-        while duration <= 7:
+        while duration <= max_duration:
             await self._send_command(
                 Command.SKSCAN,
-                ["2", "FFFFFFFF", str(duration)],
+                ["2", f"{channel_mask:08X}", str(duration)],
             )
 
             try:
                 while True:
                     result = await asyncio.wait_for(self.get_next_result(), timeout=30)
                     if isinstance(result, Epan):
-                        epan = result
+                        epans[result.mac_address] = result
                     elif isinstance(result, Event):
                         if result.code == EventCode.ACTIVE_SCAN_OK:
                             break
             except asyncio.TimeoutError:
                 pass
 
-            if epan:
-                return epan
+            if any(
+                pair_id is None or (epan.pair_id or "").upper() == pair_id
+                for epan in epans.values()
+            ):
+                break
 
             duration += 1
 
-        return epan
+        logger.info("Scan found %d EPAN", len(epans), extra={"port": self._port})
+        return list(epans.values())
 
     async def connect(self, epan: Epan) -> str:
         await self._send_command(Command.SKSREG, ["S2", f"{epan.channel:X}"])
@@ -122,7 +234,7 @@ class BP35A1:
 
         ip_address = await self._send_command(Command.SKLL64, [epan.mac_address])
 
-        print("Connecting...")
+        logger.info("Connecting", extra={"port": self._port})
 
         await self._send_command(Command.SKJOIN, [ip_address])
 
@@ -131,7 +243,9 @@ class BP35A1:
                 result = await asyncio.wait_for(self.get_next_result(), timeout=30)
                 if isinstance(result, Event):
                     if result.code == EventCode.PANA_CONNECT_OK:
-                        print(f"PANA connect OK {ip_address}")
+                        logger.info(
+                            "PANA connect OK %s", ip_address, extra={"port": self._port}
+                        )
                         return ip_address
                     elif result.code == EventCode.PANA_CONNECT_ERROR:
                         raise PANAConnectError()
@@ -157,7 +271,23 @@ class BP35A1:
             f"{len(data):04X}",
         ]
 
-        await self._send_command(Command.SKSENDTO, params, data)
+        with TRACER.span("bp35a1.send_udp"):
+            await self._send_command(Command.SKSENDTO, params, data)
+
+    async def ping(self, ip_address: str, timeout: float = 10) -> Optional[float]:
+        """SKPING を送信し、EPONG 受信までの往復時間(秒)を返す(応答なしは None)"""
+        waiter = asyncio.get_running_loop().create_future()
+        self._pong_waiters[ip_address.upper()] = waiter
+
+        try:
+            started = time.perf_counter()
+            await self._send_command(Command.SKPING, [ip_address])
+            await asyncio.wait_for(waiter, timeout)
+            return time.perf_counter() - started
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            self._pong_waiters.pop(ip_address.upper(), None)
 
     async def _proc_rx(self):
         while self._ser.is_open:
@@ -166,7 +296,11 @@ class BP35A1:
             if not data:
                 continue
 
+            self._rx_bytes.inc(len(data))
+
             async with self._buffer_lock:
+                if TRACER.enabled and not self._buffer:
+                    self._line_started_ns = time.perf_counter_ns()
                 self._buffer.extend(data)
 
                 if (
@@ -179,10 +313,24 @@ class BP35A1:
                     line = bytes(self._buffer)
                     self._buffer.clear()
 
+                    self._rx_lines.inc()
+                    if self._capture:
+                        self._capture.write(Direction.RX, line)
+                    if TRACER.enabled:
+                        # 以降の処理区間は生成されるタスクへ追跡IDが引き継がれる
+                        TRACER.new_flow()
+                        TRACER.record("bp35a1.framing", self._line_started_ns)
+                        TRACER.enqueue(line, "bp35a1.dispatch")
                     asyncio.create_task(self._process_line(line))
 
     async def _process_line(self, data: bytes):
-        # print(f"=> {data}")
+        TRACER.dequeue(data)
+        with TRACER.span("bp35a1.process_line"):
+            await self._parse_line(data)
+
+    async def _parse_line(self, data: bytes):
+        if raw_logger.isEnabledFor(logging.DEBUG):
+            raw_logger.debug("=> %r", data, extra={"port": self._port})
         line = data.decode().strip()
 
         match self._rx_state:
@@ -199,9 +347,12 @@ class BP35A1:
                         length=int(datas[7], 16),
                         data=bytes.fromhex(datas[8]),
                     )
+                    TRACER.enqueue(rxdata, "bp35a1.event_queue")
                     await self._event_queue.put(rxdata)
                 elif line.startswith("EPONG"):  # 4-2
-                    pass
+                    waiter = self._pong_waiters.get(line.split(" ")[1].upper())
+                    if waiter is not None and not waiter.done():
+                        waiter.set_result(None)
                 elif line == "EADDR":  # 4-3
                     pass
                 elif line == "ENEIGHBOR":  # 4-4
@@ -216,6 +367,7 @@ class BP35A1:
                 elif line.startswith("EVENT"):  # 4-8
                     datas = line.split(" ")
                     event = Event(code=EventCode(int(datas[1], 16)), sender=datas[2])
+                    EVENTS.labels(port=self._port, event=event.code.name).inc()
 
                     match event.code:
                         case EventCode.PANA_CONNECT_OK:
@@ -277,6 +429,19 @@ class BP35A1:
         data: bytes = None,
         timeout: float = 1,
         expect_echo: bool = False,
+    ) -> Optional[str]:
+        async with self._command_lock:
+            return await self._send_command_locked(
+                command, params, data, timeout, expect_echo
+            )
+
+    async def _send_command_locked(
+        self,
+        command: Command,
+        params: list[str],
+        data: Optional[bytes],
+        timeout: float,
+        expect_echo: bool,
     ) -> Optional[str]:
         self._result_queue = Queue()
         self._response_queue = Queue()
@@ -300,8 +465,14 @@ class BP35A1:
 
         send_data += self._newline_code.encode()
 
-        await self._ser.write_async(send_data)
-        # print(f"<= {send_data}")
+        started = time.perf_counter()
+        with TRACER.span("bp35a1.serial_write"):
+            await self._ser.write_async(send_data)
+        self._tx_bytes.inc(len(send_data))
+        if self._capture:
+            self._capture.write(Direction.TX, send_data)
+        if raw_logger.isEnabledFor(logging.DEBUG):
+            raw_logger.debug("<= %r", send_data, extra={"port": self._port})
 
         try:
             if expect_echo:
@@ -309,8 +480,15 @@ class BP35A1:
 
             result = await asyncio.wait_for(self._result_queue.get(), timeout=timeout)
 
+            COMMAND_LATENCY.labels(port=self._port, command=command.name).observe(
+                time.perf_counter() - started
+            )
+
             if result.startswith("FAIL"):
                 error_code = result[5:].strip() if len(result) > 5 else ""
+                COMMAND_FAILURES.labels(
+                    port=self._port, command=command.name, reason="fail"
+                ).inc()
                 raise CommandError(error_code)
 
             response_lines = []
@@ -319,6 +497,9 @@ class BP35A1:
 
             return "\r\n".join(response_lines) if response_lines else None
         except asyncio.TimeoutError:
+            COMMAND_FAILURES.labels(
+                port=self._port, command=command.name, reason="timeout"
+            ).inc()
             raise Exception("Result wait timeout")
 
     async def _skip_echo(self, command: str):
@@ -331,8 +512,13 @@ class BP35A1:
         except asyncio.TimeoutError:
             pass
 
+    def pending_results(self) -> int:
+        return self._event_queue.qsize()
+
     async def get_next_result(self):
-        return await self._event_queue.get()
+        result = await self._event_queue.get()
+        TRACER.dequeue(result)
+        return result
 
     async def clear_buffer(self):
         async with self._buffer_lock:
@@ -0,0 +1,162 @@
+import time
+import struct
+import asyncio
+from enum import IntEnum
+from typing import BinaryIO, Final, Iterator, Optional
+from dataclasses import dataclass
+
+CAPTURE_MAGIC: Final[bytes] = b"BPCAP\x01"
+"""キャプチャファイル識別子(バージョン1)"""
+
+RECORD_HEADER: Final[struct.Struct] = struct.Struct(">BQI")
+"""レコードヘッダ(方向, 開始からの経過時間ns, データ長)"""
+
+
+class Direction(IntEnum):
+    RX = 0
+    TX = 1
+
+
+@dataclass
+class CaptureRecord:
+    direction: Direction
+    """送受信方向"""
+    elapsed_ns: int
+    """キャプチャ開始からの経過時間(ns, 単調増加)"""
+    data: bytes
+    """送受信データ(改行コード含む1行分)"""
+
+
+class CaptureWriter:
+    """シリアル送受信のキャプチャ出力
+
+    1行毎に固定長ヘッダ+生データを追記する。書き込みはバッファリングされるため
+    受信処理中に呼び出しても I/O 待ちは発生しない。
+    """
+
+    def __init__(
+        self,
+        file_path: str,
+        buffer_size: int = 64 * 1024,
+        flush_interval: float = 1.0,
+    ):
+        self._file: BinaryIO = open(file_path, "wb", buffering=buffer_size)
+        self._file.write(CAPTURE_MAGIC)
+        self._started_ns: int = time.monotonic_ns()
+        self._flush_interval_ns: int = int(flush_interval * 1e9)
+        """異常終了時の欠損を抑えるための定期書き出し間隔"""
+        self._flushed_ns: int = self._started_ns
+
+    def write(self, direction: Direction, data: bytes):
+        if self._file.closed:
+            return
+        now_ns = time.monotonic_ns()
+        self._file.write(
+            RECORD_HEADER.pack(direction, now_ns - self._started_ns, len(data))
+        )
+        self._file.write(data)
+
+        if now_ns - self._flushed_ns >= self._flush_interval_ns:
+            self._file.flush()
+            self._flushed_ns = now_ns
+
+    def flush(self):
+        if not self._file.closed:
+            self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+
+def read_capture(file_path: str) -> Iterator[CaptureRecord]:
+    with open(file_path, "rb") as f:
+        if f.read(len(CAPTURE_MAGIC)) != CAPTURE_MAGIC:
+            raise ValueError(f"Not a capture file: {file_path}")
+
+        while True:
+            header = f.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                # 書き込み途中で停止したファイルは末尾の不完全なレコードを無視
+                return
+
+            direction, elapsed_ns, length = RECORD_HEADER.unpack(header)
+            data = f.read(length)
+            if len(data) < length:
+                return
+
+            yield CaptureRecord(Direction(direction), elapsed_ns, data)
+
+
+class ReplaySerial:
+    """キャプチャの受信データを再生するシリアルポート(aioserial.AioSerial 互換の最小実装)
+
+    speed は再生速度の倍率(1.0で実時間、0で待機なし)。
+    全データを再生するとポートを閉じ、BP35A1の受信処理を終了させる。
+    """
+
+    def __init__(self, file_path: str, speed: float = 1.0):
+        self._records: Iterator[CaptureRecord] = (
+            record
+            for record in read_capture(file_path)
+            if record.direction == Direction.RX
+        )
+        self._speed: float = speed
+        self._pending: bytes = b""
+
+        self._started: Optional[float] = None
+        self.is_open: bool = True
+        self.baudrate: int = 115200
+
+        self.lines: int = 0
+        """再生した行数"""
+        self.max_lag: float = 0.0
+        """予定時刻からの最大遅延(秒) ※受信処理の停滞の検出用"""
+        self.tx_bytes: int = 0
+        """送信されたデータ量(再生時は破棄)"""
+
+    async def read_async(self, size: int = 1) -> bytes:
+        if not self._pending:
+            record = next(self._records, None)
+            if record is None:
+                self.is_open = False
+                return b""
+
+            await self._wait_until(record.elapsed_ns)
+            self._pending = record.data
+            self.lines += 1
+
+        data, self._pending = self._pending[:size], self._pending[size:]
+        return data
+
+    async def write_async(self, data: bytes) -> int:
+        self.tx_bytes += len(data)
+        return len(data)
+
+    def reset_input_buffer(self):
+        pass
+
+    def reset_output_buffer(self):
+        pass
+
+    def close(self):
+        self.is_open = False
+
+    async def _wait_until(self, elapsed_ns: int):
+        loop = asyncio.get_running_loop()
+        if self._started is None:
+            self._started = loop.time() - (
+                elapsed_ns / 1e9 / self._speed if self._speed else 0
+            )
+
+        if not self._speed:
+            # 待機なしでも他タスク(デコード等)に処理を譲る
+            await asyncio.sleep(0)
+            return
+
+        due = self._started + elapsed_ns / 1e9 / self._speed
+        delay = due - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        else:
+            self.max_lag = max(self.max_lag, -delay)
@@ -1,8 +1,8 @@
 from enum import IntEnum
-from typing import Optional
-from dataclasses import dataclass
+from typing import Iterable, Optional
+from dataclasses import asdict, dataclass, field
 
-from app.repository.json_repo import JsonSerializable
+from app.repository.json_repo import JsonSerializable, camel_to_snake, snake_to_camel
 
 
 class EventData:
@@ -85,6 +85,53 @@ class Epan(EventData, JsonSerializable):
         )
 
 
+@dataclass
+class EpanCandidates(JsonSerializable):
+    """スキャンで検出したEPAN(接続先の候補、接続を試す順)"""
+
+    candidates: list[dict] = field(default_factory=list)
+    """Epan の各項目"""
+
+    def __len__(self) -> int:
+        return len(self.candidates)
+
+    @classmethod
+    def rank(
+        cls, epans: Iterable[Epan], pair_id: Optional[str] = None
+    ) -> "EpanCandidates":
+        """ペアリングIDが一致するものを優先し、LQI の高い順に並べる"""
+        pair_id = pair_id.upper() if pair_id else None
+
+        def key(epan: Epan):
+            matched = pair_id is not None and (epan.pair_id or "").upper() == pair_id
+            return (matched, epan.lqi or 0)
+
+        return cls(
+            [
+                {snake_to_camel(k): v for k, v in asdict(epan).items()}
+                for epan in sorted(epans, key=key, reverse=True)
+            ]
+        )
+
+    @classmethod
+    def load(cls, json_str: str) -> "EpanCandidates":
+        """保存済みの候補を読み込み(従来の Epan 単体の形式も可)"""
+        try:
+            return cls.from_json(json_str=json_str)
+        except ValueError:
+            return cls.rank([Epan.from_json(json_str=json_str)])
+
+    def epans(self) -> list[Epan]:
+        return [
+            Epan(**{camel_to_snake(k): v for k, v in candidate.items()})
+            for candidate in self.candidates
+        ]
+
+    def promote(self, index: int):
+        """接続できた候補を先頭へ移動(次回はその候補から試す)"""
+        self.candidates.insert(0, self.candidates.pop(index))
+
+
 @dataclass
 class RxData(EventData):
     """受信データ"""
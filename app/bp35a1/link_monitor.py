@@ -0,0 +1,160 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Callable, Final, Optional
+
+from app.bp35a1.bp35a1 import BP35A1
+from app.metrics.registry import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+PING_RTT = REGISTRY.histogram(
+    "bp35a1_ping_rtt_seconds", "Round trip time from SKPING to EPONG", ("port",)
+)
+PING_FAILURES = REGISTRY.counter(
+    "bp35a1_ping_failures_total", "SKPING without EPONG or failed", ("port",)
+)
+LINK_LQI = REGISTRY.gauge("bp35a1_link_lqi", "LQI reported by EPANDESC", ("port",))
+LINK_RSSI = REGISTRY.gauge(
+    "bp35a1_link_rssi_dbm", "RSSI estimated from LQI (dBm)", ("port",)
+)
+LINK_HEALTH = REGISTRY.gauge(
+    "bp35a1_link_health", "Link health score (0 = unusable, 1 = good)", ("port",)
+)
+
+RSSI_RANGE: Final[tuple[float, float]] = (-100.0, -70.0)
+"""健全度 0 / 1 とする RSSI(dBm)"""
+RTT_RANGE: Final[tuple[float, float]] = (5.0, 0.5)
+"""健全度 0 / 1 とする往復時間(秒)"""
+GOOD_SCORE: Final[float] = 0.7
+"""取得間隔・待ち時間を調整しない健全度の下限"""
+
+
+def lqi_to_rssi(lqi: int) -> float:
+    """LQI から受信信号強度(dBm)を換算(BP35A1 の換算式)"""
+    return 0.275 * lqi - 104.27
+
+
+def _ratio(value: float, worst: float, best: float) -> float:
+    return min(1.0, max(0.0, (value - worst) / (best - worst)))
+
+
+@dataclass
+class LinkHealth:
+    """無線区間の状態(各値は指数移動平均)"""
+
+    rtt: Optional[float] = None
+    """ping 往復時間(秒)"""
+    loss: float = 0.0
+    """ping 失敗率(0~1)"""
+    lqi: Optional[int] = None
+    """最新の LQI"""
+    rssi: Optional[float] = None
+    """受信信号強度(dBm)"""
+
+    @property
+    def score(self) -> float:
+        """健全度(0~1) RSSI・往復時間・失敗率の加重平均(未計測の項目は除く)"""
+        weighted = [(1.0 - self.loss, 0.3)]
+        if self.rssi is not None:
+            weighted.append((_ratio(self.rssi, *RSSI_RANGE), 0.4))
+        if self.rtt is not None:
+            weighted.append((_ratio(self.rtt, *RTT_RANGE), 0.3))
+        return sum(v * w for v, w in weighted) / sum(w for _, w in weighted)
+
+    def poll_scale(self) -> float:
+        """定期取得の間隔の倍率(GOOD_SCORE 未満で劣化に応じ最大4倍まで間引く)"""
+        return 1.0 + 3.0 * max(0.0, GOOD_SCORE - self.score) / GOOD_SCORE
+
+    def timeout_scale(self) -> float:
+        """応答待ち時間の倍率(GOOD_SCORE 未満で劣化に応じ最小0.5倍まで短縮)"""
+        return 0.5 + 0.5 * min(1.0, self.score / GOOD_SCORE)
+
+
+class LinkMonitor:
+    """無線区間の品質監視
+
+    低頻度(既定5分毎)に SKPING を送信して EPONG までの往復時間と失敗率を、
+    スキャン結果(EPANDESC)の LQI から RSSI を求め、健全度を公開する。
+    BP35A1 の ERXUDP は受信品質を含まないため、LQI はスキャン時のみ更新される。
+    健全度が更新される毎に登録された通知先を呼び出す(取得間隔・待ち時間の調整用)。
+    """
+
+    def __init__(
+        self,
+        bp35a1: BP35A1,
+        port: str,
+        interval: float = 300.0,
+        timeout: float = 10.0,
+        alpha: float = 0.3,
+    ):
+        self._bp35a1: BP35A1 = bp35a1
+        self._port: str = port
+        self._interval: float = interval
+        """ping の送信間隔(秒) ※送信時間の総和制限があるため低頻度とする"""
+        self._timeout: float = timeout
+        """EPONG の待ち時間(秒)"""
+        self._alpha: float = alpha
+        """指数移動平均の係数"""
+
+        self._target: Optional[str] = None
+        """ping の宛先(接続先IPv6アドレス)"""
+        self._listeners: list[Callable[[LinkHealth], None]] = []
+
+        self.health: LinkHealth = LinkHealth()
+        """現在の状態"""
+
+    def set_target(self, ip_address: Optional[str]):
+        self._target = ip_address
+
+    def add_listener(self, listener: Callable[[LinkHealth], None]):
+        self._listeners.append(listener)
+
+    def observe_lqi(self, lqi: int):
+        self.health.lqi = lqi
+        rssi = lqi_to_rssi(lqi)
+        self.health.rssi = self._average(self.health.rssi, rssi)
+
+        LINK_LQI.labels(port=self._port).set(lqi)
+        LINK_RSSI.labels(port=self._port).set(self.health.rssi)
+        self._publish()
+
+    def observe_rtt(self, rtt: Optional[float]):
+        """ping 結果を反映(応答なしは None)"""
+        if rtt is None:
+            PING_FAILURES.labels(port=self._port).inc()
+        else:
+            PING_RTT.labels(port=self._port).observe(rtt)
+            self.health.rtt = self._average(self.health.rtt, rtt)
+
+        self.health.loss = self._average(
+            self.health.loss, 0.0 if rtt is not None else 1.0
+        )
+        self._publish()
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self._interval)
+
+            if self._target is None:
+                continue
+
+            try:
+                rtt = await self._bp35a1.ping(self._target, timeout=self._timeout)
+            except Exception as e:
+                logger.warning("Ping failed: %s", e, extra={"port": self._port})
+                rtt = None
+
+            self.observe_rtt(rtt)
+
+    def _average(self, current: Optional[float], value: float) -> float:
+        if current is None:
+            return value
+        return current + self._alpha * (value - current)
+
+    def _publish(self):
+        score = self.health.score
+        LINK_HEALTH.labels(port=self._port).set(score)
+
+        for listener in self._listeners:
+            listener(self.health)
@@ -0,0 +1,64 @@
+from typing import Final, Iterable
+from dataclasses import dataclass, field
+
+from app.echonet.protocol.eoj import EnetObject
+from app.echonet.protocol.esv import EnetService
+from app.repository.json_repo import JsonSerializable
+
+PROPERTY_MAP_EPCS: Final[frozenset[int]] = frozenset({0x9D, 0x9E, 0x9F})
+"""プロパティマップ(取得のため常に要求可能とする)"""
+
+
+def object_key(enet_object: EnetObject) -> str:
+    """ECHONETオブジェクトの識別キー(16進6桁)"""
+    return bytes(enet_object.encode()).hex().upper()
+
+
+@dataclass
+class Capabilities:
+    """機器オブジェクトの対応プロパティ(プロパティマップ 0x9D~0x9F)"""
+
+    get_epcs: list[int] = field(default_factory=list)
+    """Getプロパティマップ"""
+    set_epcs: list[int] = field(default_factory=list)
+    """Setプロパティマップ"""
+    anno_epcs: list[int] = field(default_factory=list)
+    """状変アナウンスプロパティマップ"""
+    discovered_at: float = 0.0
+    """取得日時(UNIX秒)"""
+
+    def __post_init__(self):
+        self._get: frozenset[int] = frozenset(self.get_epcs) | PROPERTY_MAP_EPCS
+        self._set: frozenset[int] = frozenset(self.set_epcs)
+        self._anno: frozenset[int] = frozenset(self.anno_epcs)
+
+    def can_get(self, epc: int) -> bool:
+        return epc in self._get
+
+    def can_set(self, epc: int) -> bool:
+        return epc in self._set
+
+    def announces(self, epc: int) -> bool:
+        """状変時に機器から通知されるか(定期取得の要否判定用)"""
+        return epc in self._anno
+
+    def supports(self, enet_service: EnetService, epc: int) -> bool:
+        match enet_service:
+            case EnetService.Get:
+                return self.can_get(epc)
+            case EnetService.SetC | EnetService.SetI:
+                return self.can_set(epc)
+            case _:
+                return True
+
+    def poll_epcs(self, epcs: Iterable[int]) -> list[int]:
+        """取得可能かつ状変アナウンスされないEPC(定期取得が必要なもの)"""
+        return [epc for epc in epcs if self.can_get(epc) and not self.announces(epc)]
+
+
+@dataclass
+class CapabilityCache(JsonSerializable):
+    """取得済みプロパティマップ(オブジェクト毎)"""
+
+    objects: dict[str, dict] = field(default_factory=dict)
+    """ECHONETオブジェクト(16進6桁) → Capabilities"""
@@ -0,0 +1,126 @@
+import os
+import time
+import logging
+import dataclasses
+from typing import Optional
+
+from app.echonet.capability import Capabilities, CapabilityCache, object_key
+from app.echonet.echonet import Echonet
+from app.echonet.enet_data import EchonetData
+from app.echonet.protocol.eoj import EnetObject
+from app.echonet.protocol.esv import EnetService
+from app.echonet.property.base_property import BaseProperty
+
+logger = logging.getLogger(__name__)
+
+CAPABILITY_CACHE_JSON = "capabilities.json"
+
+
+class CapabilityDiscovery:
+    """プロパティマップによる機器の対応プロパティの取得
+
+    メーター毎に1回だけ 0x9F/0x9E/0x9D を取得してキャッシュし、Echonet に登録する。
+    登録後は対応していないEPCが送信前に除外されるため、不可応答(Get_SNA等)と
+    その応答待ちが発生しない。
+    """
+
+    def __init__(
+        self,
+        echonet: Echonet,
+        src_enet_object: EnetObject,
+        cache_path: str = CAPABILITY_CACHE_JSON,
+        max_age: float = 30 * 24 * 60 * 60,
+    ):
+        self._echonet: Echonet = echonet
+        self._src_enet_object: EnetObject = src_enet_object
+        self._cache_path: str = cache_path
+        self._max_age: float = max_age
+        """キャッシュの有効期間(秒) ※メーター交換等に追従するため定期的に再取得"""
+        self._cache: CapabilityCache = self._load_cache()
+
+    async def discover(
+        self, enet_object: EnetObject, refresh: bool = False
+    ) -> Optional[Capabilities]:
+        """対応プロパティを取得して Echonet に登録(取得できない場合は None で除外なし)"""
+        key = object_key(enet_object)
+        cached = self._cache.objects.get(key)
+        capabilities = Capabilities(**cached) if cached else None
+
+        if (
+            capabilities is None
+            or refresh
+            or time.time() - capabilities.discovered_at >= self._max_age
+        ):
+            capabilities = await self._request(enet_object) or capabilities
+
+        if capabilities is not None:
+            self._echonet.set_capabilities(enet_object, capabilities)
+        return capabilities
+
+    async def _request(self, enet_object: EnetObject) -> Optional[Capabilities]:
+        # 取得済みの対応情報で要求自体が除外されないよう登録を解除してから要求
+        self._echonet.set_capabilities(enet_object, None)
+
+        responses = await self._echonet.request(
+            EchonetData(
+                src_enet_object=self._src_enet_object,
+                dst_enet_object=enet_object,
+                enet_service=EnetService.Get,
+                properties=[
+                    BaseProperty.GetPropertyMap(),
+                    BaseProperty.SetPropertyMap(),
+                    BaseProperty.ChangeAnnoPropertyMap(),
+                ],
+            )
+        )
+
+        maps: dict[type, BaseProperty.PropertyMap] = {
+            type(prop): prop
+            for response in responses
+            for prop in response.properties
+            if isinstance(prop, BaseProperty.PropertyMap)
+        }
+
+        get_map = maps.get(BaseProperty.GetPropertyMap)
+        if get_map is None:
+            logger.warning(
+                "Property map not received", extra={"eoj": object_key(enet_object)}
+            )
+            return None
+
+        set_map = maps.get(BaseProperty.SetPropertyMap)
+        anno_map = maps.get(BaseProperty.ChangeAnnoPropertyMap)
+        capabilities = Capabilities(
+            get_epcs=list(get_map.epc_list),
+            set_epcs=list(set_map.epc_list) if set_map else [],
+            anno_epcs=list(anno_map.epc_list) if anno_map else [],
+            discovered_at=time.time(),
+        )
+
+        logger.info(
+            "Property maps discovered",
+            extra={
+                "eoj": object_key(enet_object),
+                "get": len(capabilities.get_epcs),
+                "set": len(capabilities.set_epcs),
+                "anno": len(capabilities.anno_epcs),
+            },
+        )
+
+        self._cache.objects[object_key(enet_object)] = dataclasses.asdict(capabilities)
+        self._save_cache()
+        return capabilities
+
+    def _load_cache(self) -> CapabilityCache:
+        if os.path.exists(self._cache_path):
+            try:
+                return CapabilityCache.from_json(file_path=self._cache_path)
+            except Exception as e:
+                logger.warning("Capability cache read failed: %s", e)
+        return CapabilityCache()
+
+    def _save_cache(self):
+        try:
+            self._cache.to_json(self._cache_path)
+        except OSError as e:
+            logger.warning("Capability cache write failed: %s", e)
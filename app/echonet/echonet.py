@@ -1,109 +1,359 @@
+import time
 import asyncio
-from typing import Final
+import logging
+import dataclasses
+from typing import Final, Iterable, Optional
 from asyncio import Queue
-from dataclasses import dataclass, field
 
-from app.echonet.object.enet_object import EnetObject
-from app.echonet.property.property import Property
-from app.echonet.protocol.eoj import EnetObjectHeader
+from app.echonet.capability import Capabilities, object_key
+from app.echonet.hooks import (
+    DEFAULT_HOOK_SERVICES,
+    HookRegistry,
+    PropertyCallback,
+    PropertyHook,
+)
+from app.echonet.object.device_object import DeviceObject
+from app.echonet.protocol.eoj import EnetObject, EnetObjectHeader
 from app.echonet.protocol.esv import EnetService
 from app.echonet.protocol.protocol_rx import ProtocolRx
 from app.echonet.protocol.protocol_tx import ProtocolTx
 from app.echonet.protocol.tid import TransactionId
 from app.echonet.enet_data import EchonetData
+from app.echonet.responder import Responder
 from app.interface.echonet_if import EchonetInterface
+from app.metrics.registry import REGISTRY
+from app.metrics.tracing import TRACER
+from app.repository.frame_archive import FrameRecorder
 
-ECHONET_LITE_PORT: Final[int] = 3610
-
+logger = logging.getLogger(__name__)
 
-@dataclass
-class DeviceObject:
-    """機器オブジェクト"""
+ECHONET_LITE_PORT: Final[int] = 3610
 
-    enet_object: EnetObject
-    """ECHONETオブジェクト"""
+RESPONSE_SERVICES: Final[frozenset[EnetService]] = frozenset(
+    {
+        EnetService.SetRes,
+        EnetService.GetRes,
+        EnetService.InfcRes,
+        EnetService.SetGetRes,
+        EnetService.SetI_Sna,
+        EnetService.SetC_Sna,
+        EnetService.Get_Sna,
+        EnetService.Inf_Sna,
+        EnetService.SetGet_Sna,
+    }
+)
+"""応答・不可応答ESV"""
 
-    properties: list[Property] = field(default_factory=list)
-    """プロパティ一覧"""
+RESPONSE_RTT = REGISTRY.histogram(
+    "echonet_response_rtt_seconds",
+    "Round trip time of Get/SetC requests",
+    ("meter", "epc"),
+)
+RESPONSE_TIMEOUTS = REGISTRY.counter(
+    "echonet_response_timeouts_total",
+    "Get/SetC requests without response",
+    ("meter", "epc"),
+)
+PENDING_TRANSACTIONS = REGISTRY.gauge(
+    "echonet_pending_transactions", "Requests waiting for response", ("meter",)
+)
+QUEUE_DEPTH = REGISTRY.gauge(
+    "echonet_queue_depth", "Items waiting in queue", ("meter", "queue")
+)
+FRAMES = REGISTRY.counter(
+    "echonet_frames_total", "ECHONET Lite frames", ("meter", "direction")
+)
+UNSUPPORTED_FILTERED = REGISTRY.counter(
+    "echonet_unsupported_filtered_total",
+    "Request properties not sent because the property map lacks them",
+    ("meter", "epc"),
+)
+SUBSCRIBER_DROPPED = REGISTRY.counter(
+    "echonet_subscriber_dropped_total",
+    "Received frames dropped because a subscriber queue was full",
+    ("meter",),
+)
 
 
 class Echonet:
-    def __init__(self, device_objects: list[DeviceObject], interface: EchonetInterface):
+    def __init__(
+        self,
+        device_objects: list[DeviceObject],
+        interface: EchonetInterface,
+        name: str = "default",
+        archive: Optional[FrameRecorder] = None,
+    ):
+        self._name: str = name
+        """メトリクス用の名前(メーター名)"""
         self._device_objects: list[DeviceObject] = device_objects
         self._interface: EchonetInterface = interface
 
-        self._transfer_data: Queue[EchonetData] = Queue()
-        """送信データ"""
+        self._transfer_data: Queue[
+            tuple[EchonetData, Optional[asyncio.Future[list[EchonetData]]]]
+        ] = Queue()
+        """送信データ(送信データ, 応答通知先)"""
         self._receive_data: Queue[EchonetData] = Queue()
         """受信データ"""
+        self._subscribers: list[Queue[EchonetData]] = []
+        """受信データの配信先(転送処理等)"""
+        self._hooks: HookRegistry = HookRegistry(name)
+        """受信プロパティのコールバック(キューを介さず即時呼び出し)"""
+        self._archive: Optional[FrameRecorder] = archive
+        """受信フレームの記録先"""
 
         self._transaction_id: TransactionId = TransactionId()
         """トランザクションID"""
-        self._pending_transactions: dict[int, asyncio.Event] = {}
+        self._pending_transactions: dict[int, asyncio.Future[EchonetData]] = {}
         """未完了トランザクション"""
+        self._capabilities: dict[str, Capabilities] = {}
+        """送信先オブジェクト毎の対応プロパティ(未登録の送信先は除外しない)"""
+
+        self._responder: Responder = Responder(device_objects)
+        """自ノード宛て要求の応答生成"""
+        self._send_lock: asyncio.Lock = asyncio.Lock()
+        """送信排他(送信キューと応答の同時送信防止)"""
+
+        self.response_timeout: float = 30.0
+        """Get/SetC の応答待ち時間(秒) ※回線品質に応じて変更可"""
+
+        PENDING_TRANSACTIONS.labels(meter=name).set_function(
+            lambda: len(self._pending_transactions)
+        )
+        QUEUE_DEPTH.labels(meter=name, queue="transfer").set_function(
+            self._transfer_data.qsize
+        )
+        QUEUE_DEPTH.labels(meter=name, queue="receive").set_function(
+            self._receive_data.qsize
+        )
+        self._tx_frames = FRAMES.labels(meter=name, direction="tx")
+        self._rx_frames = FRAMES.labels(meter=name, direction="rx")
+        self._subscriber_dropped = SUBSCRIBER_DROPPED.labels(meter=name)
+
+    @property
+    def name(self) -> str:
+        return self._name
 
     async def proc_tx_task(self):
         while True:
-            data = await self._transfer_data.get()
+            data, future = await self._transfer_data.get()
+            TRACER.dequeue(data)
+            TRACER.new_flow()
 
-            protocol_tx = ProtocolTx(
-                enet_object_header=EnetObjectHeader(
-                    src=data.src_enet_object, dst=data.dst_enet_object
-                ),
-                enet_service=data.enet_service,
-                packet_size_limit=self._interface.packet_size_limit,
-            )
+            try:
+                responses = await self._transmit(data)
+            except Exception as e:
+                if future is not None and not future.done():
+                    future.set_exception(e)
+                raise
 
-            wait_response = data.enet_service in {EnetService.Get, EnetService.SetC}
+            if future is not None and not future.done():
+                future.set_result(responses)
 
-            for property in data.properties:
-                protocol_tx.add_property(property)
+    async def _transmit(self, data: EchonetData) -> list[EchonetData]:
+        data = self._filter_unsupported(data)
+        if not data.properties:
+            return []
 
-            send_datas = protocol_tx.make(self._transaction_id)
+        wait_response = data.enet_service in {EnetService.Get, EnetService.SetC}
+        responses = []
 
-            for tid, send_data in send_datas:
-                if wait_response:
-                    event = asyncio.Event()
-                    self._pending_transactions[tid] = event
+        with TRACER.span("echonet.protocol_tx"):
+            packets = self._make_packets(data)
 
+        for tid, send_data in packets:
+            if wait_response:
+                response = asyncio.get_running_loop().create_future()
+                self._pending_transactions[tid] = response
+
+            async with self._send_lock:
                 await self._interface.send_data(send_data)
+            self._tx_frames.inc()
+            started = time.perf_counter()
+
+            if wait_response:
+                try:
+                    enet_data = await asyncio.wait_for(
+                        response, timeout=self.response_timeout
+                    )
+                    elapsed = time.perf_counter() - started
+                    for property in enet_data.properties:
+                        RESPONSE_RTT.labels(
+                            meter=self._name, epc=f"0x{property.code:02X}"
+                        ).observe(elapsed)
+                    responses.append(enet_data)
+                except asyncio.TimeoutError:
+                    logger.warning(
+                        "Response timeout",
+                        extra={
+                            "meter": self._name,
+                            "tid": tid,
+                            "epcs": ",".join(
+                                f"0x{p.code:02X}" for p in data.properties
+                            ),
+                        },
+                    )
+                    for property in data.properties:
+                        RESPONSE_TIMEOUTS.labels(
+                            meter=self._name, epc=f"0x{property.code:02X}"
+                        ).inc()
+                finally:
+                    self._pending_transactions.pop(tid, None)
 
-                if wait_response:
-                    try:
-                        await asyncio.wait_for(event.wait(), timeout=30)
-                    except asyncio.TimeoutError:
-                        print(f"TID {tid}: Response Timeout")
-                    finally:
-                        self._pending_transactions.pop(tid, None)
+        return responses
 
     async def proc_rx_task(self):
         while True:
             data = await self._interface.get_data()
-            enet_data = ProtocolRx.proc(data)
+
+            if self._archive:
+                with TRACER.span("echonet.archive"):
+                    self._archive.append(data)
+
+            with TRACER.span("echonet.protocol_rx"):
+                enet_data = ProtocolRx.proc(data)
 
             if not enet_data:
                 continue
 
+            self._rx_frames.inc()
+
+            # 警報等の遅延に敏感な処理はキューより先に呼び出す
+            if self._hooks:
+                with TRACER.span("echonet.hooks"):
+                    self._hooks.dispatch(enet_data)
+
+            TRACER.enqueue(enet_data, "echonet.receive_queue")
             await self._receive_data.put(enet_data)
 
+            # 配信先の処理が遅れても受信を止めないよう、満杯の配信先には破棄する
+            for subscriber in self._subscribers:
+                try:
+                    subscriber.put_nowait(enet_data)
+                except asyncio.QueueFull:
+                    self._subscriber_dropped.inc()
+
             # 送信したTIDに対応するレスポンスなら送信待機を解除
-            if enet_data.transaction_id in self._pending_transactions:
-                self._pending_transactions[enet_data.transaction_id].set()
-
-            # 他にもやることはたくさんあるがとりあえずInfCの返信だけ実装
-            if enet_data.enet_service == EnetService.InfC:
-                # srcとdstを入れ替え,対応するESVをセットして同一TIDで返信
-                response = EchonetData(
-                    src_enet_object=enet_data.dst_enet_object,
-                    dst_enet_object=enet_data.src_enet_object,
-                    enet_service=EnetService.InfcRes,
-                    transaction_id=enet_data.transaction_id,
-                    properties=enet_data.properties,
-                )
-                await self._transfer_data.put(response)
+            if enet_data.enet_service in RESPONSE_SERVICES:
+                response = self._pending_transactions.get(enet_data.transaction_id)
+                if response is not None and not response.done():
+                    response.set_result(enet_data)
+
+            # 自ノード宛て要求(Get/SetC/SetI/Inf_Req/InfC)には送信キューを介さず即時応答
+            for response in self._responder.respond(enet_data):
+                with TRACER.span("echonet.protocol_tx"):
+                    packets = self._make_packets(response)
+                for _, send_data in packets:
+                    async with self._send_lock:
+                        await self._interface.send_data(send_data)
+                    self._tx_frames.inc()
+
+    def _filter_unsupported(self, data: EchonetData) -> EchonetData:
+        """送信先のプロパティマップにないEPCを要求から除外"""
+        capabilities = self._capabilities.get(object_key(data.dst_enet_object))
+        if capabilities is None:
+            return data
+
+        properties = []
+        for property in data.properties:
+            if capabilities.supports(data.enet_service, property.code):
+                properties.append(property)
+            else:
+                UNSUPPORTED_FILTERED.labels(
+                    meter=self._name, epc=f"0x{property.code:02X}"
+                ).inc()
+
+        if len(properties) == len(data.properties):
+            return data
+        return dataclasses.replace(data, properties=tuple(properties))
+
+    def _make_packets(self, data: EchonetData) -> list[tuple[int, bytes]]:
+        protocol_tx = ProtocolTx(
+            enet_object_header=EnetObjectHeader(
+                src=data.src_enet_object, dst=data.dst_enet_object
+            ),
+            enet_service=data.enet_service,
+            packet_size_limit=self._interface.packet_size_limit,
+        )
+
+        for property in data.properties:
+            protocol_tx.add_property(property)
+
+        # 応答は要求と同一TIDで送信する
+        if data.transaction_id is not None:
+            return protocol_tx.make(TransactionId(data.transaction_id))
+
+        return protocol_tx.make(self._transaction_id)
+
+    def set_capabilities(
+        self, enet_object: EnetObject, capabilities: Optional[Capabilities]
+    ):
+        """送信先の対応プロパティを登録(以降の Get/SetC/SetI から未対応EPCを除外)"""
+        if capabilities is None:
+            self._capabilities.pop(object_key(enet_object), None)
+        else:
+            self._capabilities[object_key(enet_object)] = capabilities
 
     async def send_data(self, data: EchonetData):
-        await self._transfer_data.put(data)
+        TRACER.enqueue(data, "echonet.transfer_queue")
+        await self._transfer_data.put((data, None))
+
+    def submit(self, data: EchonetData) -> asyncio.Future[list[EchonetData]]:
+        """送信を予約し、応答一覧(Get/SetCのみ、タイムアウト分は除く)を返すFutureを得る
+
+        予約は呼び出し順に送信されるため、SetC→Getのような依存する要求も
+        応答を待たずに続けて予約できる
+        """
+        future = asyncio.get_running_loop().create_future()
+        TRACER.enqueue(data, "echonet.transfer_queue")
+        self._transfer_data.put_nowait((data, future))
+        return future
+
+    async def request(self, data: EchonetData) -> list[EchonetData]:
+        return await self.submit(data)
+
+    def subscribe(self, maxsize: int = 1000) -> Queue[EchonetData]:
+        """受信データの配信を登録し、配信先キューを得る
+
+        get_received_data() とは独立して全受信データが配信される。
+        キューが満杯の間に受信したデータは破棄される。
+        """
+        subscriber: Queue[EchonetData] = Queue(maxsize)
+        self._subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Queue[EchonetData]):
+        if subscriber in self._subscribers:
+            self._subscribers.remove(subscriber)
+
+    def add_hook(
+        self,
+        callback: PropertyCallback,
+        epcs: Iterable[int] = None,
+        enet_object: EnetObject = None,
+        services: Iterable[EnetService] = DEFAULT_HOOK_SERVICES,
+        budget: float = 0.005,
+        offload_after: int = 3,
+        timeout: float = 5.0,
+    ) -> PropertyHook:
+        """受信プロパティのコールバックを登録(受信処理から直接呼び出す)
+
+        epcs・enet_object(送信元)・services で対象を絞り込む(None は全て)。
+        callback(受信データ, プロパティ) は同期関数・コルーチン関数のいずれも可。
+        同期関数は budget 秒を offload_after 回連続で超過するとスレッドプールでの
+        実行に切り替わり、コルーチンは timeout 秒で打ち切られる。
+        """
+        return self._hooks.add(
+            callback, epcs, enet_object, services, budget, offload_after, timeout
+        )
+
+    def remove_hook(self, hook: PropertyHook):
+        self._hooks.remove(hook)
 
     async def get_received_data(self) -> EchonetData:
-        return await self._receive_data.get()
+        enet_data = await self._receive_data.get()
+        TRACER.dequeue(enet_data)
+        return enet_data
+
+    def pending_received(self) -> int:
+        """get_received_data() で未取得の受信データ数"""
+        return self._receive_data.qsize()
@@ -0,0 +1,210 @@
+import time
+import asyncio
+import inspect
+import logging
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Final, Iterable, Optional, Union
+
+from app.echonet.capability import object_key
+from app.echonet.enet_data import EchonetData
+from app.echonet.protocol.eoj import EnetObject
+from app.echonet.protocol.esv import EnetService
+from app.echonet.property.property import Property
+from app.metrics.registry import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+PropertyCallback = Callable[[EchonetData, Property], Union[None, Awaitable[None]]]
+"""受信プロパティの通知先(受信データ, プロパティ) ※コルーチン関数も可"""
+
+DEFAULT_HOOK_SERVICES: Final[frozenset[EnetService]] = frozenset(
+    {EnetService.GetRes, EnetService.Inf, EnetService.InfC}
+)
+"""既定で通知するESV(値を含む応答・通知)"""
+
+HOOK_OVERRUNS = REGISTRY.counter(
+    "echonet_hook_overruns_total",
+    "Property callbacks that exceeded their time budget or timeout",
+    ("meter", "hook"),
+)
+HOOK_ERRORS = REGISTRY.counter(
+    "echonet_hook_errors_total",
+    "Property callbacks that raised an exception",
+    ("meter", "hook"),
+)
+
+
+@dataclass(eq=False)
+class PropertyHook:
+    """受信プロパティの通知先1件分(Echonet.add_hook() の戻り値)"""
+
+    callback: PropertyCallback
+    epcs: Optional[frozenset[int]]
+    """対象EPC(None は全EPC)"""
+    eoj: Optional[str]
+    """対象の送信元オブジェクト(16進6桁、None は全オブジェクト)"""
+    services: frozenset[EnetService]
+    """対象ESV"""
+    budget: float
+    """同期コールバック1回あたりの許容時間(秒)"""
+    offload_after: int
+    """同期コールバックが連続で超過した場合に別スレッド実行へ切り替える回数"""
+    timeout: float
+    """非同期コールバックの打ち切り時間(秒)"""
+    name: str = field(init=False)
+    """メトリクス用の名前"""
+    is_async: bool = field(init=False)
+    overruns: int = 0
+    """連続超過回数"""
+    offloaded: bool = False
+    """別スレッドで実行中(以降は受信処理を待たせない)"""
+
+    def __post_init__(self):
+        self.name = getattr(self.callback, "__qualname__", repr(self.callback))
+        self.is_async = inspect.iscoroutinefunction(self.callback)
+
+    def matches(self, enet_data: EchonetData, src_key: str) -> bool:
+        return enet_data.enet_service in self.services and (
+            self.eoj is None or self.eoj == src_key
+        )
+
+
+class HookRegistry:
+    """受信プロパティのコールバック(キューを介さず受信処理から直接呼び出す)
+
+    EPC毎に索引し、対象外のプロパティでは呼び出し・判定を行わない。
+    同期コールバックは受信処理内で実行するため短時間で終えること。
+    許容時間を offload_after 回連続で超過したコールバックは以降スレッドプールで
+    実行する(呼び出し順は保証されない)。非同期コールバックはタスクとして実行し、
+    timeout で打ち切る。例外は記録のみで受信処理は継続する。
+    """
+
+    def __init__(self, name: str = "default"):
+        self._name: str = name
+        self._by_epc: dict[int, list[PropertyHook]] = {}
+        """EPC → コールバック"""
+        self._any_epc: list[PropertyHook] = []
+        """全EPCが対象のコールバック"""
+        self._tasks: set[asyncio.Future] = set()
+        """実行中の非同期・別スレッド実行"""
+
+    def __bool__(self) -> bool:
+        return bool(self._by_epc or self._any_epc)
+
+    def add(
+        self,
+        callback: PropertyCallback,
+        epcs: Iterable[int] = None,
+        enet_object: EnetObject = None,
+        services: Iterable[EnetService] = DEFAULT_HOOK_SERVICES,
+        budget: float = 0.005,
+        offload_after: int = 3,
+        timeout: float = 5.0,
+    ) -> PropertyHook:
+        hook = PropertyHook(
+            callback=callback,
+            epcs=frozenset(epcs) if epcs is not None else None,
+            eoj=object_key(enet_object) if enet_object is not None else None,
+            services=frozenset(services),
+            budget=budget,
+            offload_after=offload_after,
+            timeout=timeout,
+        )
+
+        if hook.epcs is None:
+            self._any_epc.append(hook)
+        else:
+            for epc in hook.epcs:
+                self._by_epc.setdefault(epc, []).append(hook)
+
+        return hook
+
+    def remove(self, hook: PropertyHook):
+        if hook in self._any_epc:
+            self._any_epc.remove(hook)
+
+        for epc in hook.epcs or ():
+            hooks = self._by_epc.get(epc)
+            if hooks and hook in hooks:
+                hooks.remove(hook)
+                if not hooks:
+                    del self._by_epc[epc]
+
+    def dispatch(self, enet_data: EchonetData):
+        src_key = None
+
+        for prop in enet_data.properties:
+            hooks = self._by_epc.get(prop.code)
+            if hooks is None and not self._any_epc:
+                continue
+
+            if src_key is None:
+                src_key = object_key(enet_data.src_enet_object)
+
+            for hook in (hooks or []) + self._any_epc:
+                if hook.matches(enet_data, src_key):
+                    self._call(hook, enet_data, prop)
+
+    def _call(self, hook: PropertyHook, enet_data: EchonetData, prop: Property):
+        if hook.is_async:
+            self._track(
+                asyncio.ensure_future(self._call_async(hook, enet_data, prop)), hook
+            )
+            return
+
+        if hook.offloaded:
+            loop = asyncio.get_running_loop()
+            self._track(
+                loop.run_in_executor(None, hook.callback, enet_data, prop), hook
+            )
+            return
+
+        started = time.perf_counter()
+        try:
+            hook.callback(enet_data, prop)
+        except Exception:
+            self._error(hook)
+        elapsed = time.perf_counter() - started
+
+        if elapsed <= hook.budget:
+            hook.overruns = 0
+            return
+
+        hook.overruns += 1
+        HOOK_OVERRUNS.labels(meter=self._name, hook=hook.name).inc()
+        if hook.overruns >= hook.offload_after:
+            hook.offloaded = True
+            logger.warning(
+                "Slow property callback moved to thread pool",
+                extra={
+                    "meter": self._name,
+                    "hook": hook.name,
+                    "elapsed_ms": round(elapsed * 1000, 3),
+                },
+            )
+
+    async def _call_async(
+        self, hook: PropertyHook, enet_data: EchonetData, prop: Property
+    ):
+        try:
+            await asyncio.wait_for(hook.callback(enet_data, prop), hook.timeout)
+        except asyncio.TimeoutError:
+            HOOK_OVERRUNS.labels(meter=self._name, hook=hook.name).inc()
+
+    def _track(self, future: asyncio.Future, hook: PropertyHook):
+        self._tasks.add(future)
+
+        def done(future: asyncio.Future):
+            self._tasks.discard(future)
+            if not future.cancelled() and future.exception() is not None:
+                self._error(hook, future.exception())
+
+        future.add_done_callback(done)
+
+    def _error(self, hook: PropertyHook, exc: BaseException = None):
+        HOOK_ERRORS.labels(meter=self._name, hook=hook.name).inc()
+        logger.error(
+            "Property callback failed",
+            exc_info=exc or True,
+            extra={"meter": self._name, "hook": hook.name},
+        )
@@ -0,0 +1,40 @@
+from typing import Optional
+from dataclasses import dataclass, field
+
+from app.echonet.object.enet_object import EnetObject
+from app.echonet.property.property import Property
+
+
+@dataclass
+class DeviceObject:
+    """機器オブジェクト"""
+
+    enet_object: EnetObject
+    """ECHONETオブジェクト"""
+
+    properties: list[Property] = field(default_factory=list)
+    """プロパティ一覧"""
+
+    revision: int = field(default=0, init=False, repr=False)
+    """更新番号(プロパティ変更毎に加算)"""
+
+    def get_property(self, epc: int) -> Optional[Property]:
+        for prop in self.properties:
+            if prop.code == epc:
+                return prop
+        return None
+
+    def set_property(self, prop: Property):
+        """プロパティを追加・置換する
+
+        応答キャッシュの再構築はrevisionで判定するため、
+        プロパティの変更は必ずこのメソッドを経由すること
+        """
+        for index, current in enumerate(self.properties):
+            if current.code == prop.code:
+                self.properties[index] = prop
+                break
+        else:
+            self.properties.append(prop)
+
+        self.revision += 1
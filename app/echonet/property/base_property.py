@@ -1,6 +1,7 @@
 import struct
 from enum import IntEnum
-from typing import Optional, Union
+from functools import lru_cache
+from typing import Final, Optional, Union
 from dataclasses import dataclass, field
 from datetime import date, datetime, time
 
@@ -8,6 +9,18 @@ from app.echonet.object.access import Access
 from app.echonet.property.property import Property
 from app.echonet.property.install_location import LocationCode, SpecialLocationCode
 
+_BITMAP_NIBBLES: Final[tuple[tuple[int, ...], ...]] = tuple(
+    tuple(0x80 + (bit << 4) for bit in range(8) if (value >> bit) & 1)
+    for value in range(256)
+)
+"""プロパティマップ(記述形式2)の1バイト → 含まれるEPCの上位4ビット(下位4ビットはバイト位置)"""
+
+
+@lru_cache(maxsize=4096)
+def _bitmap_epcs(byte_index: int, value: int) -> tuple[int, ...]:
+    """プロパティマップ(記述形式2)のバイト位置・値 → 含まれるEPC"""
+    return tuple(nibble | byte_index for nibble in _BITMAP_NIBBLES[value])
+
 
 class BaseProperty:
     @dataclass
@@ -584,6 +597,11 @@ class BaseProperty:
 
     @dataclass
     class PropertyMap(Property):
+        """プロパティマップ(0x9B~0x9F共通)
+
+        16件以上は記述形式2(16バイトのビットマップ)で符号化する。
+        """
+
         epc_list: Optional[list[int]] = field(default_factory=list)
         """EPC一覧"""
 
@@ -606,35 +624,32 @@ class BaseProperty:
                     raise ValueError(
                         f"Invalid data length: expected {1 + count} bytes, got {len(data)}"
                     )
-                epc_list = list(data[1:])
-            else:
-                if len(data) != 17:
-                    raise ValueError(
-                        f"Invalid data length: expected 17 bytes, got {len(data)}"
-                    )
-                epc_list = []
-                for byte_index in range(16):
-                    byte_value = data[byte_index + 1]
-                    for bit_index in range(8):
-                        if (byte_value >> (7 - bit_index)) & 1:
-                            epc = 0xF0 + byte_index - (bit_index * 0x10)
-                            epc_list.append(epc)
+                return cls(sorted(data[1:]))
+
+            if len(data) != 17:
+                raise ValueError(
+                    f"Invalid data length: expected 17 bytes, got {len(data)}"
+                )
 
+            # バイト位置が下位4ビット、ビット位置が上位4ビット(0x8_~0xF_)に対応
+            epc_list = []
+            for byte_index in range(16):
+                byte_value = data[byte_index + 1]
+                if byte_value:
+                    epc_list += _bitmap_epcs(byte_index, byte_value)
             return cls(sorted(epc_list))
 
         def encode(self) -> bytes:
             if self.count < 16:
                 return bytes([self.count] + self.epc_list)
-            else:
-                bitmap = [0x00] * 16
-                for epc in self.epc_list:
-                    if not 0x80 <= epc <= 0xFF:
-                        continue
-
-                    byte_index = epc % 0x10
-                    bit_index = (epc >> 4) - 8
-                    bitmap[byte_index] |= 1 << bit_index
-                return bytes([self.count] + bitmap)
+
+            bitmap = bytearray(16)
+            for epc in self.epc_list:
+                if not 0x80 <= epc <= 0xFF:
+                    continue
+
+                bitmap[epc & 0x0F] |= 1 << ((epc >> 4) - 8)
+            return bytes([self.count]) + bytes(bitmap)
 
     @dataclass
     class SetMPropertyMap(PropertyMap):
@@ -0,0 +1,147 @@
+from datetime import datetime
+from typing import Final, Optional
+from dataclasses import dataclass
+
+# 履歴１(0xE2, 0xE4)・履歴２(0xEC)・履歴３(0xEE)のEDTをレコード毎のstruct.unpackではなく
+# numpy.frombufferで一括デコードする(長期間の補完やアーカイブ再生向けの任意機能)
+# 受信処理・BackfillEngine・FrameArchive からは使用しない(オプトインのAPI)。
+# 受信したEDTは1件ずつ届き、1件毎ではstruct.unpackの方が速いため、
+# アーカイブから取り出した多数のEDTを呼び出し側でまとめて渡す場合に使う。
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+NO_DATA: Final[int] = 0xFFFFFFFE
+"""計測値なし"""
+
+HISTORY1_LENGTH: Final[int] = 194
+HISTORY1_SLOTS: Final[int] = 48
+RECORD_HEADER_LENGTH: Final[int] = 7
+RECORD_LENGTH: Final[int] = 8
+
+HISTORY1_DTYPE = (
+    np.dtype([("collect_day", ">u2"), ("values", ">u4", (HISTORY1_SLOTS,))])
+    if np is not None
+    else None
+)
+
+
+def is_available() -> bool:
+    return np is not None
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError(
+            "numpy is required for columnar history decoding. "
+            "Install it with the 'numpy' extra."
+        )
+
+
+@dataclass
+class History1Columns:
+    """積算電力量計測値履歴１(0xE2, 0xE4)"""
+
+    collect_day: "int | np.ndarray"
+    """積算履歴収集日"""
+    values: "np.ndarray"
+    """計測値(uint32, 48コマ)"""
+    valid: "np.ndarray"
+    """計測値ありマスク(bool)"""
+
+
+@dataclass
+class HistoryRecordColumns:
+    """積算電力量計測値履歴２・３(0xEC, 0xEE)"""
+
+    timestamp: Optional[datetime]
+    """積算履歴収集日時"""
+    forward: "np.ndarray"
+    """正方向計測値(uint32)"""
+    reverse: "np.ndarray"
+    """逆方向計測値(uint32)"""
+    forward_valid: "np.ndarray"
+    """正方向計測値ありマスク(bool)"""
+    reverse_valid: "np.ndarray"
+    """逆方向計測値ありマスク(bool)"""
+
+
+def decode_history1(data: bytes) -> History1Columns:
+    _require_numpy()
+
+    if len(data) != HISTORY1_LENGTH:
+        raise ValueError(
+            f"Invalid data length: expected {HISTORY1_LENGTH} bytes, got {len(data)}"
+        )
+
+    collect_day = int.from_bytes(data[0:2], byteorder="big")
+    values = np.frombuffer(data, dtype=">u4", count=HISTORY1_SLOTS, offset=2)
+
+    return History1Columns(collect_day, values, values != NO_DATA)
+
+
+def decode_history1_batch(frames: list[bytes]) -> History1Columns:
+    """複数の履歴１EDTを一括デコード(collect_dayは(n,)、valuesは(n, 48))
+
+    1件毎の呼び出しはstruct.unpackより遅いため、長期間分をまとめて処理する場合に使う
+    """
+    _require_numpy()
+
+    for data in frames:
+        if len(data) != HISTORY1_LENGTH:
+            raise ValueError(
+                f"Invalid data length: expected {HISTORY1_LENGTH} bytes, got {len(data)}"
+            )
+
+    rows = np.frombuffer(b"".join(frames), dtype=HISTORY1_DTYPE)
+    values = rows["values"]
+
+    return History1Columns(rows["collect_day"], values, values != NO_DATA)
+
+
+def decode_history_records(data: bytes) -> HistoryRecordColumns:
+    _require_numpy()
+
+    if (
+        len(data) < RECORD_HEADER_LENGTH
+        or (len(data) - RECORD_HEADER_LENGTH) % RECORD_LENGTH != 0
+    ):
+        raise ValueError(
+            f"Invalid data length: expected at least 7 bytes with 8-byte multiples, got {len(data)}"
+        )
+
+    year = int.from_bytes(data[0:2], byteorder="big")
+    month, day, hour, minute, record_count = data[2:7]
+
+    if year == 0xFFFF and month == day == hour == minute == 0xFF:
+        # レコード毎のデコードと同じく計測値なしの1件([(None, None)])とする
+        missing = np.full(1, NO_DATA, dtype=">u4")
+        invalid = np.zeros(1, dtype=bool)
+        return HistoryRecordColumns(None, missing, missing, invalid, invalid)
+
+    if RECORD_HEADER_LENGTH + record_count * RECORD_LENGTH > len(data):
+        raise ValueError("Insufficient data for the expected number of records")
+
+    records = np.frombuffer(
+        data, dtype=">u4", count=record_count * 2, offset=RECORD_HEADER_LENGTH
+    ).reshape(record_count, 2)
+    forward = records[:, 0]
+    reverse = records[:, 1]
+
+    return HistoryRecordColumns(
+        timestamp=datetime(year, month, day, hour, minute),
+        forward=forward,
+        reverse=reverse,
+        forward_valid=forward != NO_DATA,
+        reverse_valid=reverse != NO_DATA,
+    )
+
+
+def to_kwh(
+    values: "np.ndarray", valid: "np.ndarray", coefficient: int, multiplier: float
+) -> "np.ndarray":
+    """係数(0xD3) × 積算電力量単位(0xE1)でkWhへ換算(計測値なしはNaN)"""
+    _require_numpy()
+
+    return np.where(valid, values * (float(coefficient) * multiplier), np.nan)
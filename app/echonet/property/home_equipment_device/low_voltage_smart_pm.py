@@ -181,6 +181,18 @@ class LowVoltageSmartPm:
             UNIT_1000KWH = 0x0C  # 1000kWh
             UNIT_10000KWH = 0x0D  # 10000kWh
 
+        UNIT_MULTIPLIERS = {
+            Unit.UNIT_1KWH: 1.0,
+            Unit.UNIT_0_1KWH: 0.1,
+            Unit.UNIT_0_01KWH: 0.01,
+            Unit.UNIT_0_001KWH: 0.001,
+            Unit.UNIT_0_0001KWH: 0.0001,
+            Unit.UNIT_10KWH: 10.0,
+            Unit.UNIT_100KWH: 100.0,
+            Unit.UNIT_1000KWH: 1000.0,
+            Unit.UNIT_10000KWH: 10000.0,
+        }
+
         unit: Unit = Unit.UNIT_0_1KWH
         """単位"""
 
@@ -188,6 +200,11 @@ class LowVoltageSmartPm:
             self.code = 0xE1
             self.access_rules = [Access.GET]
 
+        @property
+        def multiplier(self) -> float:
+            """単位の倍率(kWh)"""
+            return self.UNIT_MULTIPLIERS[self.unit]
+
         @classmethod
         def decode(cls, data: bytes) -> "LowVoltageSmartPm.CumulativeEnergyUnit":
             if len(data) != 1:
@@ -532,33 +549,23 @@ class LowVoltageSmartPm:
 
             return cls(timestamp, collect_count)
 
-        def encode(self, mode: Access) -> list[int]:
-            if mode == Access.GET:
-                return []
-
-            if mode == Access.SET:
-                if self.timestamp is None or self.collect_count is None:
-                    raise ValueError(
-                        "Timestamp and record count must be set for encoding."
-                    )
-                if self.timestamp.minute not in (0, 30):
-                    raise ValueError("Minute must be 00 or 30.")
-                if not (1 <= self.collect_count <= 12):
-                    raise ValueError("Record count must be between 1 and 12.")
-
-                return list(
-                    struct.pack(
-                        ">HBBBBB",
-                        self.timestamp.year,
-                        self.timestamp.month,
-                        self.timestamp.day,
-                        self.timestamp.hour,
-                        self.timestamp.minute,
-                        self.collect_count,
-                    )
-                )
+        def encode(self) -> bytes:
+            if self.timestamp is None or self.collect_count is None:
+                raise ValueError("Timestamp and record count must be set for encoding.")
+            if self.timestamp.minute not in (0, 30):
+                raise ValueError("Minute must be 00 or 30.")
+            if not (1 <= self.collect_count <= 12):
+                raise ValueError("Record count must be between 1 and 12.")
 
-            raise NotImplementedError(f"Encoding for mode {mode} is not implemented")
+            return struct.pack(
+                ">HBBBBB",
+                self.timestamp.year,
+                self.timestamp.month,
+                self.timestamp.day,
+                self.timestamp.hour,
+                self.timestamp.minute,
+                self.collect_count,
+            )
 
     @dataclass
     class CumulativeEnergyMeasurementHistory3(Property):
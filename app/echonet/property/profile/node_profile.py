@@ -1,3 +1,4 @@
+import struct
 from dataclasses import dataclass, field
 
 from app.echonet.property.base_property import Property
@@ -6,6 +7,75 @@ from app.echonet.protocol.eoj import EnetObject, EnetObjectHeader
 
 
 class NodeProfile:
+    @dataclass
+    class VersionInfo(Property):
+        """Version情報(0x82)"""
+
+        major: int = 1
+        """メジャーバージョン"""
+        minor: int = 13
+        """マイナーバージョン"""
+
+        def __post_init__(self):
+            self.code = 0x82
+            self.access_rules = [Access.GET]
+
+        @classmethod
+        def decode(cls, data: bytes) -> "NodeProfile.VersionInfo":
+            if len(data) != 4:
+                raise ValueError(
+                    f"Invalid data length: expected 4 bytes, got {len(data)}"
+                )
+            return cls(data[0], data[1])
+
+        def encode(self) -> bytes:
+            # 電文形式は規定電文形式(0x01)のみ対応
+            return bytes([self.major, self.minor, 0x01, 0x00])
+
+    @dataclass
+    class SelfNodeInstanceCount(Property):
+        """自ノードインスタンス数(0xD3)"""
+
+        count: int = 0
+        """インスタンス数"""
+
+        def __post_init__(self):
+            self.code = 0xD3
+            self.access_rules = [Access.GET]
+
+        @classmethod
+        def decode(cls, data: bytes) -> "NodeProfile.SelfNodeInstanceCount":
+            if len(data) != 3:
+                raise ValueError(
+                    f"Invalid data length: expected 3 bytes, got {len(data)}"
+                )
+            return cls(int.from_bytes(data, byteorder="big"))
+
+        def encode(self) -> bytes:
+            return self.count.to_bytes(3, byteorder="big")
+
+    @dataclass
+    class SelfNodeClassCount(Property):
+        """自ノードクラス数(0xD4)"""
+
+        count: int = 1
+        """クラス数(ノードプロファイルクラスを含む)"""
+
+        def __post_init__(self):
+            self.code = 0xD4
+            self.access_rules = [Access.GET]
+
+        @classmethod
+        def decode(cls, data: bytes) -> "NodeProfile.SelfNodeClassCount":
+            if len(data) != 2:
+                raise ValueError(
+                    f"Invalid data length: expected 2 bytes, got {len(data)}"
+                )
+            return cls(struct.unpack(">H", data)[0])
+
+        def encode(self) -> bytes:
+            return struct.pack(">H", self.count)
+
     @dataclass
     class InstanceListNotify(Property):
         """インスタンスリスト通知"""
@@ -47,3 +117,51 @@ class NodeProfile:
                 data.extend(obj.encode())
 
             return bytes(data)
+
+    @dataclass
+    class SelfNodeInstanceListS(InstanceListNotify):
+        """自ノードインスタンスリストS(0xD6)"""
+
+        def __post_init__(self):
+            self.code = 0xD6
+            self.access_rules = [Access.GET]
+
+    @dataclass
+    class SelfNodeClassListS(Property):
+        """自ノードクラスリストS(0xD7)"""
+
+        count: int = 0
+        """クラス数(ノードプロファイルクラスを除く)"""
+        class_codes: list[tuple[int, int]] = field(default_factory=list)
+        """クラスコード(クラスグループコード, クラスコード) ※最大8クラス"""
+
+        def __post_init__(self):
+            self.code = 0xD7
+            self.access_rules = [Access.GET]
+
+        @classmethod
+        def decode(cls, data: bytes) -> "NodeProfile.SelfNodeClassListS":
+            if len(data) < 1:
+                raise ValueError("Invalid data: at least 1 byte is required for count.")
+
+            count = data[0]
+            listed = min(count, 8)
+
+            expected_length = 1 + listed * 2
+            if len(data) != expected_length:
+                raise ValueError(
+                    f"Invalid data length: expected {expected_length} bytes, got {len(data)}"
+                )
+
+            class_codes = [
+                (data[index], data[index + 1]) for index in range(1, expected_length, 2)
+            ]
+
+            return cls(count, class_codes)
+
+        def encode(self) -> bytes:
+            data = bytearray([self.count])
+            for class_group_code, class_code in self.class_codes[:8]:
+                data.extend([int(class_group_code), int(class_code)])
+
+            return bytes(data)
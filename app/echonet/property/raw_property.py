@@ -0,0 +1,33 @@
+from dataclasses import dataclass
+from typing import Callable, TypeVar
+
+from app.echonet.object.access import Access
+from app.echonet.property.property import Property
+
+T = TypeVar("T")
+
+
+@dataclass
+class RawProperty(Property):
+    """未デコードプロパティ(EPC + EDT をそのまま保持)"""
+
+    epc: int = 0
+    """EPCコード"""
+    edt: bytes = b""
+    """EDT"""
+
+    def __post_init__(self):
+        self.code = self.epc
+        self.access_rules = [Access.GET, Access.SET, Access.ANNO]
+
+    @classmethod
+    def decode(cls, data: bytes) -> "RawProperty":
+        # EPCを持たないため通常はコンストラクタで生成する
+        return cls(edt=bytes(data))
+
+    def encode(self) -> bytes:
+        return self.edt
+
+    def decode_as(self, decoder: Callable[[bytes], T]) -> T:
+        """任意のデコーダ(例: SomeProperty.decode)でEDTを後からデコード"""
+        return decoder(self.edt)
@@ -1,149 +1,101 @@
+import importlib
+from functools import lru_cache
+from typing import Callable, Final, Optional
+
 from app.echonet.object.classcode import ClassCode, ClassGroupCode
 
 from app.echonet.protocol.eoj import EnetObject
 
-from app.echonet.property.base_property import BaseProperty
-from app.echonet.property.home_equipment_device.low_voltage_smart_pm import (
-    LowVoltageSmartPm as LVSPM,
+# プロパティクラスは初回のデコーダ参照時に import する(起動時の読み込みを省略)
+_BASE: Final[str] = "app.echonet.property.base_property:BaseProperty"
+_LVSPM: Final[str] = (
+    "app.echonet.property.home_equipment_device.low_voltage_smart_pm:LowVoltageSmartPm"
 )
-from app.echonet.property.profile.node_profile import NodeProfile
+_NODE: Final[str] = "app.echonet.property.profile.node_profile:NodeProfile"
+
+SUPER_CLASS_DECODERS: Final[dict[int, str]] = {
+    0x80: f"{_BASE}.OpStatus",  # 動作状態
+    0x81: f"{_BASE}.InstallLocation",  # 設置場所
+    0x82: f"{_BASE}.VersionInfo",  # 規格Version情報
+    # 0x83: 識別番号 (デコーダ未実装)
+    0x84: f"{_BASE}.InstantPowerConsumption",  # 瞬時消費電力計測値
+    0x85: f"{_BASE}.CumulativePowerConsumption",  # 積算消費電力量計測値
+    0x86: f"{_BASE}.ManufacturerErrorCode",  # メーカ異常コード
+    0x87: f"{_BASE}.CurrentLimitSetting",  # 電流制限設定
+    0x88: f"{_BASE}.AbnormalState",  # 異常発生状態
+    # 0x89: 異常内容 (複雑なので保留)
+    0x8A: f"{_BASE}.MemberID",  # 会員ID／メーカコード
+    0x8B: f"{_BASE}.BusinessCode",  # 事業場コード
+    0x8C: f"{_BASE}.ProductCode",  # 商品コード
+    0x8D: f"{_BASE}.SerialNumber",  # 製造番号
+    0x8E: f"{_BASE}.ManufactureDate",  # 製造年月日
+    0x8F: f"{_BASE}.PowerSavingMode",  # 節電動作設定
+    0x93: f"{_BASE}.RemoteControlSetting",  # 遠隔操作設定
+    0x97: f"{_BASE}.CurrentTime",  # 現在時刻設定
+    0x98: f"{_BASE}.CurrentDate",  # 現在年月日設定
+    0x99: f"{_BASE}.PowerLimitSetting",  # 電力制限設定
+    0x9A: f"{_BASE}.CumulativeOperatingTime",  # 積算運転時間
+    0x9B: f"{_BASE}.SetMPropertyMap",  # SetMプロパティマップ
+    0x9C: f"{_BASE}.GetMPropertyMap",  # GetMプロパティマップ
+    0x9D: f"{_BASE}.ChangeAnnoPropertyMap",  # 状変アナウンスプロパティマップ
+    0x9E: f"{_BASE}.SetPropertyMap",  # Setプロパティマップ
+    0x9F: f"{_BASE}.GetPropertyMap",  # Getプロパティマップ
+}
+"""機器オブジェクトスーパークラス構成プロパティ(EPC → プロパティクラス)"""
+
+CLASS_DECODERS: Final[dict[tuple[int, int], dict[int, str]]] = {
+    (ClassGroupCode.HomeEquipmentDevice, ClassCode.LowVoltageSmartPowerMeter): {
+        0xC0: f"{_LVSPM}.BrouteIdentifyNo",  # B ルート識別番号
+        0xD0: f"{_LVSPM}.OneMinuteCumulativeEnergy",  # 1分積算電力量計測値（正方向、逆方向計測値）
+        0xD3: f"{_LVSPM}.Coefficient",  # 係数
+        0xD7: f"{_LVSPM}.CumulativeEnergySignificantDigit",  # 積算電力量有効桁数
+        0xE0: f"{_LVSPM}.CumulativeEnergyMeasurementNormalDir",  # 積算電力量計測値（正方向計測値）
+        0xE1: f"{_LVSPM}.CumulativeEnergyUnit",  # 積算電力量単位（正方向、逆方向計測値）
+        0xE2: f"{_LVSPM}.CumulativeEnergyMeasurementHistory1NormalDir",  # 積算電力量計測値履歴１(正方向計測値)
+        0xE3: f"{_LVSPM}.CumulativeEnergyMeasurementReverseDir",  # 積算電力量計測値(逆方向計測値)
+        0xE4: f"{_LVSPM}.CumulativeEnergyMeasurementHistory1ReverseDir",  # 積算電力量計測値履歴１(逆方向計測値)
+        0xE5: f"{_LVSPM}.CumulativeHistoryCollectDay1",  # 積算履歴収集日１
+        0xE7: f"{_LVSPM}.MomentPower",  # 瞬時電力計測値
+        0xE8: f"{_LVSPM}.MomentCurrent",  # 瞬時電流計測値
+        0xEA: f"{_LVSPM}.IntCumulativeEnergyNormalDir",  # 定時積算電力量計測値（正方向計測値）
+        0xEB: f"{_LVSPM}.IntCumulativeEnergyReverseDir",  # 定時積算電力量計測値（逆方向計測値）
+        0xEC: f"{_LVSPM}.CumulativeEnergyMeasurementHistory2",  # 積算電力量計測値履歴２（正方向、逆方向計測値）
+        0xED: f"{_LVSPM}.CumulativeHistoryCollectDay2",  # 積算履歴収集日２
+        0xEE: f"{_LVSPM}.CumulativeEnergyMeasurementHistory3",  # 積算電力量計測値履歴３（正方向、逆方向計測値）
+        0xEF: f"{_LVSPM}.CumulativeHistoryCollectDay3",  # 積算履歴収集日３
+    },
+    (ClassGroupCode.Profile, ClassCode.NodeProfile): {
+        # 0xBF: 個体識別情報 (デコーダ未実装)
+        0xD3: f"{_NODE}.SelfNodeInstanceCount",  # 自ノードインスタンス数
+        0xD4: f"{_NODE}.SelfNodeClassCount",  # 自ノードクラス数
+        0xD5: f"{_NODE}.InstanceListNotify",  # インスタンスリスト通知
+        0xD6: f"{_NODE}.SelfNodeInstanceListS",  # 自ノードインスタンスリストＳ
+        0xD7: f"{_NODE}.SelfNodeClassListS",  # 自ノードクラスリストＳ
+    },
+}
+"""クラス固有プロパティ((クラスグループコード, クラスコード) → EPC → プロパティクラス)"""
+
+
+def _resolve(path: str) -> Callable[[bytes], object]:
+    """`モジュール:クラス.属性` 形式のパスからデコーダを得る"""
+    module_name, _, qualname = path.partition(":")
+    target = importlib.import_module(module_name)
+    for name in qualname.split("."):
+        target = getattr(target, name)
+    return target.decode
+
+
+@lru_cache(maxsize=4096)
+def _lookup(class_group_code: int, class_code: int, epc: int):
+    path = SUPER_CLASS_DECODERS.get(epc) or CLASS_DECODERS.get(
+        (class_group_code, class_code), {}
+    ).get(epc)
+    return _resolve(path) if path else None
 
 
 def getPropertyDecoder(enet_object: EnetObject, epc: int):
     if epc < 0x80:
         raise ValueError("Invalid EPC code")
 
-    # 機器オブジェクトスーパークラス構成プロパティ
-    if epc < 0xA0:
-        match epc:
-            case 0x80:  # 動作状態
-                return BaseProperty.OpStatus.decode
-            case 0x81:  # 設置場所
-                return BaseProperty.InstallLocation.decode
-            case 0x82:  # 規格Version情報
-                return BaseProperty.VersionInfo.decode
-            case 0x83:  # 識別番号
-                pass  # return BaseProperty.IdentifierNo.decode # デコーダ未実装
-            case 0x84:  # 瞬時消費電力計測値
-                return BaseProperty.InstantPowerConsumption.decode
-            case 0x85:  # 積算消費電力量計測値
-                return BaseProperty.CumulativePowerConsumption.decode
-            case 0x86:  # メーカ異常コード
-                return BaseProperty.ManufacturerErrorCode.decode
-            case 0x87:  # 電流制限設定
-                return BaseProperty.CurrentLimitSetting.decode
-            case 0x88:  # 異常発生状態
-                return BaseProperty.AbnormalState.decode
-            case 0x89:  # 異常内容
-                pass  # return BaseProperty.AbnormalContent.decode # 複雑なので保留
-            case 0x8A:  # 会員ID／メーカコード
-                return BaseProperty.MemberID.decode
-            case 0x8B:  # 事業場コード
-                return BaseProperty.BusinessCode.decode
-            case 0x8C:  # 商品コード
-                return BaseProperty.ProductCode.decode
-            case 0x8D:  # 製造番号
-                return BaseProperty.SerialNumber.decode
-            case 0x8E:  # 製造年月日
-                return BaseProperty.ManufactureDate.decode
-            case 0x8F:  # 節電動作設定
-                return BaseProperty.PowerSavingMode.decode
-            case 0x93:  # 遠隔操作設定
-                return BaseProperty.RemoteControlSetting.decode
-            case 0x97:  # 現在時刻設定
-                return BaseProperty.CurrentTime.decode
-            case 0x98:  # 現在年月日設定
-                return BaseProperty.CurrentDate.decode
-            case 0x99:  # 電力制限設定
-                return BaseProperty.PowerLimitSetting.decode
-            case 0x9A:  # 積算運転時間
-                return BaseProperty.CumulativeOperatingTime.decode
-            case 0x9B:  # SetMプロパティマップ
-                return BaseProperty.SetMPropertyMap.decode
-            case 0x9C:  # GetMプロパティマップ
-                return BaseProperty.GetMPropertyMap.decode
-            case 0x9D:  # 状変アナウンスプロパティマップ
-                return BaseProperty.ChangeAnnoPropertyMap.decode
-            case 0x9E:  # Setプロパティマップ
-                return BaseProperty.SetPropertyMap.decode
-            case 0x9F:  # Getプロパティマップ
-                return BaseProperty.GetPropertyMap.decode
-
-    match enet_object.classGroupCode:
-        case ClassGroupCode.SensorDevice:
-            pass
-        case ClassGroupCode.AirConditionerDevice:
-            pass
-        case ClassGroupCode.HomeEquipmentDevice:
-            match enet_object.classCode:
-                case ClassCode.LowVoltageSmartPowerMeter:
-                    match epc:
-                        case 0xC0:  # B ルート識別番号
-                            return LVSPM.BrouteIdentifyNo.decode
-                        case 0xD0:  # 1分積算電力量計測値（正方向、逆方向計測値）
-                            return LVSPM.OneMinuteCumulativeEnergy.decode
-                        case 0xD3:  # 係数
-                            return LVSPM.Coefficient.decode
-                        case 0xD7:  # 積算電力量有効桁数
-                            return LVSPM.CumulativeEnergySignificantDigit.decode
-                        case 0xE0:  # 積算電力量計測値（正方向計測値）
-                            return LVSPM.CumulativeEnergyMeasurementNormalDir.decode
-                        case 0xE1:  # 積算電力量単位（正方向、逆方向計測値）
-                            return LVSPM.CumulativeEnergyUnit.decode
-                        case 0xE2:  # 積算電力量計測値履歴１(正方向計測値)
-                            return (
-                                LVSPM.CumulativeEnergyMeasurementHistory1NormalDir.decode
-                            )
-                        case 0xE3:  # 積算電力量計測値(逆方向計測値)
-                            return LVSPM.CumulativeEnergyMeasurementReverseDir.decode
-                        case 0xE4:  # 積算電力量計測値履歴１(逆方向計測値)
-                            return (
-                                LVSPM.CumulativeEnergyMeasurementHistory1ReverseDir.decode
-                            )
-                        case 0xE5:  # 積算履歴収集日１
-                            return LVSPM.CumulativeHistoryCollectDay1.decode
-                        case 0xE7:  # 瞬時電力計測値
-                            return LVSPM.MomentPower.decode
-                        case 0xE8:  # 瞬時電流計測値
-                            return LVSPM.MomentCurrent.decode
-                        case 0xEA:  # 定時積算電力量計測値（正方向計測値）
-                            return LVSPM.IntCumulativeEnergyNormalDir.decode
-                        case 0xEB:  # 定時積算電力量計測値（逆方向計測値）
-                            return LVSPM.IntCumulativeEnergyReverseDir.decode
-                        case 0xEC:  # 積算電力量計測値履歴２（正方向、逆方向計測値）
-                            return LVSPM.CumulativeEnergyMeasurementHistory2.decode
-                        case 0xED:  # 積算履歴収集日２
-                            return LVSPM.CumulativeHistoryCollectDay2.decode
-                        case 0xEE:  # 積算電力量計測値履歴３（正方向、逆方向計測値）
-                            return LVSPM.CumulativeEnergyMeasurementHistory3.decode
-                        case 0xEF:  # 積算履歴収集日３
-                            return LVSPM.CumulativeHistoryCollectDay3.decode
-        case ClassGroupCode.CookingHouseWorkDevice:
-            pass
-        case ClassGroupCode.HealthDevice:
-            pass
-        case ClassGroupCode.ManagerOpDevice:
-            pass
-        case ClassGroupCode.AvDevice:
-            pass
-        case ClassGroupCode.Profile:
-            match enet_object.classCode:
-                case ClassCode.NodeProfile:
-                    match epc:
-                        case 0xBF:  # 個体識別情報
-                            pass
-                        case 0xD3:  # 自ノードインスタンス数
-                            pass
-                        case 0xD4:  # 自ノードクラス数
-                            pass
-                        case 0xD5:  # インスタンスリスト通知
-                            return NodeProfile.InstanceListNotify.decode
-                        case 0xD6:  # 自ノードインスタンスリストＳ
-                            pass
-                        case 0xD7:  # 自ノードクラスリストＳ
-                            pass
-        case ClassGroupCode.UserDefine:
-            pass
-
-    print(f"Unsupported ECHONET object")
-    print(enet_object, f"EPC: 0x{epc:02X}")
+    # 未対応のEPCはNoneを返し、呼び出し側でRawPropertyとして保持する
+    return _lookup(enet_object.classGroupCode, enet_object.classCode, epc)
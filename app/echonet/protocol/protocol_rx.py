@@ -1,4 +1,5 @@
 import struct
+import logging
 from typing import Optional
 
 from app.echonet.enet_data import EchonetData
@@ -8,8 +9,11 @@ from app.echonet.protocol.eoj import EnetObjectHeader
 from app.echonet.protocol.esv import EnetService
 
 from app.echonet.property.property import Property
+from app.echonet.property.raw_property import RawProperty
 from app.echonet.protocol.decoder import getPropertyDecoder
 
+logger = logging.getLogger(__name__)
+
 
 class ProtocolRx:
     @classmethod
@@ -27,9 +31,13 @@ class ProtocolRx:
         enet_service = EnetService(data[10])  # ESV
         operation_count = data[11]  # OPC
 
-        # print(
-        #     f"TID: {transaction_id}, ESV: 0x{enet_service:02x}, OPC: {operation_count}"
-        # )
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "TID: %d, ESV: 0x%02x, OPC: %d",
+                transaction_id,
+                enet_service,
+                operation_count,
+            )
 
         properties: list[Property] = []
 
@@ -46,6 +54,8 @@ class ProtocolRx:
                 index += 2
 
                 if pdc == 0:
+                    # Get要求・SetRes・不可応答等のEDTなしプロパティ
+                    properties.append(RawProperty(epc=epc))
                     continue
 
                 if len(data) < index + pdc:
@@ -61,7 +71,9 @@ class ProtocolRx:
                 )
                 if decoder:
                     property = decoder(edt)
-                    properties.append(property)
+                else:
+                    property = RawProperty(epc=epc, edt=edt)
+                properties.append(property)
 
             if index < len(data):
                 raise ValueError("Excess data found after processing all properties")
@@ -0,0 +1,232 @@
+from typing import Optional
+from dataclasses import dataclass, field
+
+from app.echonet.enet_data import EchonetData
+from app.echonet.object.access import Access
+from app.echonet.object.classcode import ClassCode, ClassGroupCode
+from app.echonet.object.device_object import DeviceObject
+from app.echonet.object.enet_object import EnetObject
+from app.echonet.property.base_property import BaseProperty
+from app.echonet.property.profile.node_profile import NodeProfile
+from app.echonet.property.raw_property import RawProperty
+from app.echonet.protocol.esv import EnetService
+
+NODE_PROFILE_ENET_OBJ = EnetObject(
+    classGroupCode=ClassGroupCode.Profile,
+    classCode=ClassCode.NodeProfile,
+    instanceCode=0x01,
+)
+
+# 要求ESV -> (応答ESV, 不可応答ESV) ※応答ESVがNoneの場合は成功時に応答しない
+RESPONSE_SERVICE_MAP: dict[EnetService, tuple[Optional[EnetService], EnetService]] = {
+    EnetService.Get: (EnetService.GetRes, EnetService.Get_Sna),
+    EnetService.SetC: (EnetService.SetRes, EnetService.SetC_Sna),
+    EnetService.SetI: (None, EnetService.SetI_Sna),
+    EnetService.Inf_Req: (EnetService.Inf, EnetService.Inf_Sna),
+}
+
+PROPERTY_MAP_EPCS: frozenset[int] = frozenset({0x9D, 0x9E, 0x9F})
+
+
+@dataclass
+class _ResponseCache:
+    """機器オブジェクト毎の応答キャッシュ"""
+
+    revision: int = -1
+    """キャッシュ作成時の機器オブジェクト更新番号"""
+    get_edts: dict[int, bytes] = field(default_factory=dict)
+    """Get可能なプロパティのエンコード済EDT"""
+    set_epcs: frozenset[int] = frozenset()
+    """Set可能なEPC"""
+
+
+class Responder:
+    """自ノード(ノードプロファイル・機器オブジェクト)宛て要求への応答生成"""
+
+    def __init__(self, device_objects: list[DeviceObject]):
+        self._device_objects: list[DeviceObject] = list(device_objects)
+
+        if not any(
+            self._is_node_profile(obj.enet_object) for obj in self._device_objects
+        ):
+            self._device_objects.insert(0, self._create_node_profile())
+
+        self._caches: dict[int, _ResponseCache] = {
+            id(obj): _ResponseCache() for obj in self._device_objects
+        }
+
+    def respond(self, request: EchonetData) -> list[EchonetData]:
+        """要求に対する応答を生成(応答不要の場合は空)"""
+        if request.enet_service == EnetService.InfC:
+            # InfCは宛先に関わらず同一EPCをPDC=0で返信
+            return [
+                self._make_response(
+                    request,
+                    request.dst_enet_object,
+                    EnetService.InfcRes,
+                    [RawProperty(epc=prop.code) for prop in request.properties],
+                )
+            ]
+
+        services = RESPONSE_SERVICE_MAP.get(request.enet_service)
+        if services is None:
+            return []
+
+        responses = []
+        for obj in self._find_objects(request.dst_enet_object):
+            cache = self._get_cache(obj)
+
+            if request.enet_service in {EnetService.SetC, EnetService.SetI}:
+                properties, success = self._proc_set(obj, cache, request)
+            else:
+                properties, success = self._proc_get(cache, request)
+
+            service = services[0] if success else services[1]
+            if service is None:
+                continue
+
+            responses.append(
+                self._make_response(request, obj.enet_object, service, properties)
+            )
+
+        return responses
+
+    def _proc_get(
+        self, cache: _ResponseCache, request: EchonetData
+    ) -> tuple[list[RawProperty], bool]:
+        properties = []
+        success = True
+
+        for prop in request.properties:
+            edt = cache.get_edts.get(prop.code)
+            if edt is None:
+                success = False
+                properties.append(RawProperty(epc=prop.code))
+            else:
+                properties.append(RawProperty(epc=prop.code, edt=edt))
+
+        return properties, success
+
+    def _proc_set(
+        self, obj: DeviceObject, cache: _ResponseCache, request: EchonetData
+    ) -> tuple[list[RawProperty], bool]:
+        properties = []
+        success = True
+
+        for prop in request.properties:
+            edt = prop.encode()
+
+            current = (
+                obj.get_property(prop.code) if prop.code in cache.set_epcs else None
+            )
+            try:
+                if current is None:
+                    raise ValueError(f"EPC 0x{prop.code:02X} is not settable")
+                obj.set_property(type(current).decode(edt))
+            except Exception:
+                success = False
+                properties.append(RawProperty(epc=prop.code, edt=edt))
+            else:
+                properties.append(RawProperty(epc=prop.code))
+
+        return properties, success
+
+    def _make_response(
+        self,
+        request: EchonetData,
+        src: EnetObject,
+        service: EnetService,
+        properties: list[RawProperty],
+    ) -> EchonetData:
+        return EchonetData(
+            src_enet_object=src,
+            dst_enet_object=request.src_enet_object,
+            enet_service=service,
+            transaction_id=request.transaction_id,
+            properties=tuple(properties),
+        )
+
+    def _find_objects(self, dst: EnetObject) -> list[DeviceObject]:
+        # インスタンスコード0x00は同一クラスの全インスタンス宛て
+        return [
+            obj
+            for obj in self._device_objects
+            if obj.enet_object.classGroupCode == dst.classGroupCode
+            and obj.enet_object.classCode == dst.classCode
+            and (
+                dst.instanceCode == 0x00
+                or obj.enet_object.instanceCode == dst.instanceCode
+            )
+        ]
+
+    def _get_cache(self, obj: DeviceObject) -> _ResponseCache:
+        cache = self._caches[id(obj)]
+        if cache.revision != obj.revision:
+            cache = self._build_cache(obj)
+            self._caches[id(obj)] = cache
+        return cache
+
+    def _build_cache(self, obj: DeviceObject) -> _ResponseCache:
+        get_epcs = set()
+        set_epcs = set()
+        anno_epcs = set()
+        get_edts = {}
+
+        for prop in obj.properties:
+            if Access.GET in prop.access_rules:
+                get_epcs.add(prop.code)
+                get_edts[prop.code] = prop.encode()
+            if Access.SET in prop.access_rules:
+                set_epcs.add(prop.code)
+            if Access.ANNO in prop.access_rules:
+                anno_epcs.add(prop.code)
+
+        # プロパティマップは未定義であれば保持プロパティから生成
+        get_epcs |= PROPERTY_MAP_EPCS
+        generated_maps = [
+            BaseProperty.ChangeAnnoPropertyMap(sorted(anno_epcs)),
+            BaseProperty.SetPropertyMap(sorted(set_epcs)),
+            BaseProperty.GetPropertyMap(sorted(get_epcs)),
+        ]
+        for prop_map in generated_maps:
+            get_edts.setdefault(prop_map.code, prop_map.encode())
+
+        return _ResponseCache(
+            revision=obj.revision,
+            get_edts=get_edts,
+            set_epcs=frozenset(set_epcs),
+        )
+
+    def _create_node_profile(self) -> DeviceObject:
+        enet_objs = [
+            obj.enet_object
+            for obj in self._device_objects
+            if not self._is_node_profile(obj.enet_object)
+        ]
+
+        class_codes = []
+        for enet_obj in enet_objs:
+            class_code = (int(enet_obj.classGroupCode), int(enet_obj.classCode))
+            if class_code not in class_codes:
+                class_codes.append(class_code)
+
+        return DeviceObject(
+            enet_object=NODE_PROFILE_ENET_OBJ,
+            properties=[
+                BaseProperty.OpStatus(),
+                NodeProfile.VersionInfo(),
+                BaseProperty.MemberID(),
+                NodeProfile.SelfNodeInstanceCount(len(enet_objs)),
+                NodeProfile.SelfNodeClassCount(len(class_codes) + 1),
+                NodeProfile.InstanceListNotify(len(enet_objs), enet_objs),
+                NodeProfile.SelfNodeInstanceListS(len(enet_objs), enet_objs),
+                NodeProfile.SelfNodeClassListS(len(class_codes), class_codes),
+            ],
+        )
+
+    @staticmethod
+    def _is_node_profile(enet_object: EnetObject) -> bool:
+        return (
+            enet_object.classGroupCode == ClassGroupCode.Profile
+            and enet_object.classCode == ClassCode.NodeProfile
+        )
@@ -1,11 +1,36 @@
 import os
+import logging
+from typing import Final, Optional
 from app.bp35a1.bp35a1 import BP35A1
-from app.bp35a1.event import Epan, RxData
+from app.bp35a1.event import Epan, EpanCandidates, RxData
+from app.bp35a1.exception import PANAConnectError
+from app.bp35a1.link_monitor import LinkMonitor
 from app.echonet.echonet import ECHONET_LITE_PORT
 from app.interface.echonet_if import EchonetInterface
+from app.metrics.registry import REGISTRY
+from app.metrics.tracing import TRACER
+from app.repository.sqlite_store import MeterState
 
+logger = logging.getLogger(__name__)
 
 EPAN_DATA_JSON = "epan.json"
+EPAN_STATE_KEY = "epan"
+
+JOIN_FAILURES = REGISTRY.counter(
+    "bp35a1_join_failures_total",
+    "PANA joins that failed and moved on to the next EPAN candidate",
+    ("port",),
+)
+RESCANS = REGISTRY.counter(
+    "bp35a1_epan_rescans_total",
+    "Full scans caused by a stale or unjoinable cached EPAN",
+    ("port", "reason"),
+)
+
+SCAN_DURATION: Final[int] = 6
+"""全チャネルスキャンの初回のスキャン時間"""
+VALIDATE_DURATION: Final[int] = 6
+"""保存済みEPANの確認スキャンのスキャン時間(対象チャネルのみのため短時間)"""
 
 
 class BP35A1Interface(EchonetInterface):
@@ -13,43 +38,166 @@ class BP35A1Interface(EchonetInterface):
     def packet_size_limit(self) -> int:
         return 1232
 
-    def __init__(self, port: str, id: str, password: str):
+    def __init__(
+        self,
+        port: str,
+        id: str,
+        password: str,
+        epan_path: str = EPAN_DATA_JSON,
+        capture_path: Optional[str] = None,
+        state: Optional[MeterState] = None,
+    ):
         self._bp35a1: BP35A1 = BP35A1(port)
+        self._port: str = port
+        self._link_monitor: LinkMonitor = LinkMonitor(self._bp35a1, port)
+        if capture_path:
+            self._bp35a1.start_capture(capture_path)
         self._id: str = id
         self._password: str = password
+        self._epan_path: str = epan_path
+        self._state: Optional[MeterState] = state
+        """EPANの保存先(指定時は epan_path の代わりに使用)"""
         self._connected_ip: str = None
 
+    @property
+    def link_monitor(self) -> LinkMonitor:
+        """無線区間の品質監視(run() の実行は呼び出し側で行う)"""
+        return self._link_monitor
+
     async def init(self):
         await self._bp35a1.init(self._id, self._password)
 
-        epan = self._load_epan() or await self._scan_and_save_epan()
+        candidates = self._load_candidates()
+        if candidates:
+            candidates = await self._validate_candidates(candidates)
+        if candidates:
+            try:
+                epan = await self._join(candidates)
+            except PANAConnectError:
+                # チャネル・PAN ID の変更やメーター交換に備え全チャネルを再スキャン
+                logger.warning(
+                    "Cached EPAN unjoinable, rescanning", extra={"port": self._port}
+                )
+                RESCANS.labels(port=self._port, reason="join_failed").inc()
+                candidates = None
+        if not candidates:
+            epan = await self._join(await self._scan_and_save_candidates())
+        if epan.lqi is not None:
+            self._link_monitor.observe_lqi(epan.lqi)
+
+        self._link_monitor.set_target(self._connected_ip)
+
+    async def close(self):
+        self._connected_ip = None
+        self._link_monitor.set_target(None)
+        await self._bp35a1.close()
+
+    async def wait_closed(self):
+        """シリアル受信が停止するまで待機(停止時は例外を送出)"""
+        await self._bp35a1.wait_rx_stopped()
+
+    async def _join(self, candidates: EpanCandidates) -> Epan:
+        """候補を順に接続し、接続できたEPANを返す(失敗時は再スキャンせず次の候補へ)"""
+        for index, epan in enumerate(candidates.epans()):
+            try:
+                self._connected_ip = await self._bp35a1.connect(epan)
+            except PANAConnectError:
+                self._connected_ip = None
+
+            if self._connected_ip:
+                if index > 0:
+                    candidates.promote(index)
+                    self._save_candidates(candidates)
+                return epan
 
-        self._connected_ip = await self._bp35a1.connect(epan)
+            JOIN_FAILURES.labels(port=self._port).inc()
+            logger.warning(
+                "PANA join failed, trying next candidate",
+                extra={"port": self._port, "mac_address": epan.mac_address},
+            )
 
-    def _load_epan(self) -> Epan:
-        if os.path.exists(EPAN_DATA_JSON):
+        raise PANAConnectError()
+
+    def _load_candidates(self) -> Optional[EpanCandidates]:
+        if self._state is not None:
+            epan_json = self._state.get(EPAN_STATE_KEY)
+            if epan_json:
+                try:
+                    return EpanCandidates.load(epan_json) or None
+                except Exception as e:
+                    logger.warning("EPAN state read failed: %s", e)
+                    return None
+
+        if os.path.exists(self._epan_path):
             try:
-                return Epan.from_json(file_path=EPAN_DATA_JSON)
+                with open(self._epan_path, "r", encoding="utf-8") as f:
+                    candidates = EpanCandidates.load(f.read())
+                if self._state is not None:
+                    # 従来の epan.json は状態保存先へ移行
+                    self._save_candidates(candidates)
+                return candidates or None
             except Exception as e:
-                print(f"EPAN json read failed: {e}")
+                logger.warning("EPAN json read failed: %s", e)
         return None
 
-    async def _scan_and_save_epan(self) -> Epan:
-        epan = await self._bp35a1.scan(init_duration=6)
-        if epan is None:
+    @property
+    def _pair_id(self) -> str:
+        """ペアリングID(Bルート認証IDの下位8文字)"""
+        return self._id[-8:].upper()
+
+    async def _validate_candidates(
+        self, candidates: EpanCandidates
+    ) -> Optional[EpanCandidates]:
+        """保存済みの候補のチャネルのみ短時間スキャンし、検出結果で候補を更新
+
+        ペアリングIDが一致するEPANを検出できない場合は None(全チャネルの再スキャンが必要)
+        """
+        epans = await self._bp35a1.scan(
+            init_duration=VALIDATE_DURATION,
+            max_duration=VALIDATE_DURATION,
+            pair_id=self._pair_id,
+            channels=[epan.channel for epan in candidates.epans()],
+        )
+        validated = EpanCandidates.rank(epans, self._pair_id)
+        if not any(
+            (epan.pair_id or "").upper() == self._pair_id for epan in validated.epans()
+        ):
+            logger.warning(
+                "Cached EPAN not found, rescanning", extra={"port": self._port}
+            )
+            RESCANS.labels(port=self._port, reason="stale").inc()
+            return None
+
+        if validated != candidates:
+            self._save_candidates(validated)
+        return validated
+
+    async def _scan_and_save_candidates(self) -> EpanCandidates:
+        candidates = EpanCandidates.rank(
+            await self._bp35a1.scan(init_duration=SCAN_DURATION, pair_id=self._pair_id),
+            self._pair_id,
+        )
+        if not candidates:
             raise Exception("Epan not found")
-        epan.to_json(EPAN_DATA_JSON)
-        return epan
+        self._save_candidates(candidates)
+        return candidates
+
+    def _save_candidates(self, candidates: EpanCandidates):
+        if self._state is not None:
+            self._state.set(EPAN_STATE_KEY, candidates.to_json())
+        else:
+            candidates.to_json(self._epan_path)
 
     async def send_data(self, data: bytes):
         if not self._connected_ip:
             raise Exception("Not connected")
 
-        await self._bp35a1.send_udp(
-            ip_address=self._connected_ip,
-            port=ECHONET_LITE_PORT,
-            data=data,
-        )
+        with TRACER.span("interface.send_data"):
+            await self._bp35a1.send_udp(
+                ip_address=self._connected_ip,
+                port=ECHONET_LITE_PORT,
+                data=data,
+            )
 
     async def get_data(self) -> bytes:
         while True:
@@ -0,0 +1,80 @@
+import asyncio
+from typing import Optional
+
+from app.bp35a1.bp35a1 import BP35A1
+from app.bp35a1.capture import ReplaySerial
+from app.bp35a1.event import RxData
+from app.echonet.echonet import ECHONET_LITE_PORT
+from app.interface.echonet_if import EchonetInterface
+
+
+class ReplayInterface(EchonetInterface):
+    """キャプチャファイルの再生
+
+    受信行を実機と同じ BP35A1 の受信処理(_proc_rx, _process_line)へ流し、
+    Echonet 以降のデコード処理をオフラインで再現する。送信データは破棄する。
+    全データを再生し受信処理済みのデータを渡し終えると get_data() は EOFError を送出する
+    (Echonet.proc_rx_task() は最後のフレームの処理後に終了する)。
+    """
+
+    @property
+    def packet_size_limit(self) -> int:
+        return 1232
+
+    def __init__(self, capture_path: str, speed: float = 1.0):
+        self._serial: ReplaySerial = ReplaySerial(capture_path, speed)
+        self._bp35a1: BP35A1 = BP35A1(capture_path, serial=self._serial)
+        self._rx_stopped: Optional[asyncio.Task] = None
+        """BP35A1の受信処理の停止待ち"""
+
+    @property
+    def serial(self) -> ReplaySerial:
+        return self._serial
+
+    def pending(self) -> int:
+        """受信処理済みでデコード待ちの件数"""
+        return self._bp35a1.pending_results()
+
+    async def init(self):
+        self._bp35a1.start()
+        self._rx_stopped = asyncio.create_task(self._bp35a1.wait_rx_stopped())
+
+    async def close(self):
+        await self._bp35a1.close()
+
+    async def wait_closed(self):
+        """全データを再生するまで待機"""
+        await self._bp35a1.wait_rx_stopped()
+
+    async def send_data(self, data: bytes):
+        pass
+
+    async def get_data(self) -> bytes:
+        while True:
+            result = await self._next_result()
+
+            if isinstance(result, RxData) and result.dst_port == ECHONET_LITE_PORT:
+                return result.data
+
+    async def _next_result(self):
+        """受信処理の結果(再生完了で EOFError、受信処理の異常はその例外を送出)"""
+        if self._bp35a1.pending_results():
+            return await self._bp35a1.get_next_result()
+
+        getter = asyncio.create_task(self._bp35a1.get_next_result())
+        await asyncio.wait(
+            [getter, self._rx_stopped], return_when=asyncio.FIRST_COMPLETED
+        )
+        if getter.done():
+            return getter.result()
+        getter.cancel()
+
+        # 停止までに受信処理済みの結果は全て渡してから終了する
+        if self._bp35a1.pending_results():
+            return await self._bp35a1.get_next_result()
+
+        error = self._rx_stopped.exception()
+        if self._serial.is_open:
+            # 再生途中での停止は受信処理の異常
+            raise error
+        raise EOFError("Replay finished")
@@ -0,0 +1,173 @@
+import json
+import time
+import queue
+import logging
+import logging.handlers
+from typing import Final, Optional
+
+RAW_LINE_LOGGER: Final[str] = "app.bp35a1.raw"
+"""シリアル送受信行の出力先(DEBUG で出力、既定は無効)"""
+
+# LogRecord 標準の属性(これ以外の extra 指定分を構造化項目として出力)
+_RECORD_ATTRS: Final[frozenset[str]] = frozenset(
+    vars(logging.LogRecord("", 0, "", 0, "", None, None))
+) | {"message", "asctime", "taskName"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_handler: Optional["_AsyncQueueHandler"] = None
+
+
+def _fields(record: logging.LogRecord) -> dict[str, object]:
+    return {k: v for k, v in vars(record).items() if k not in _RECORD_ATTRS}
+
+
+class TextFormatter(logging.Formatter):
+    """`日時 レベル ロガー メッセージ key=value ...` 形式"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = (
+            f"{self.formatTime(record)} {record.levelname} {record.name}: "
+            f"{record.getMessage()}"
+        )
+        fields = _fields(record)
+        if fields:
+            line += " " + " ".join(f"{k}={v}" for k, v in fields.items())
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """1行1オブジェクトのJSON形式(ログ収集基盤向け)"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": record.created,
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            **_fields(record),
+        }
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """メッセージ毎(ロガー名+書式文字列)の出力頻度制限
+
+    対象は min_level 以上(既定は WARNING 以上)のみ。INFO 以下は受信値の出力等の
+    本来の出力であり、書式文字列が同じでも内容が異なるため制限しない。
+    burst 件までは即時出力し、以降は rate 件/秒まで。抑止した件数は次に出力する
+    同じメッセージの suppressed 項目に付与する。書式化前に判定するため、抑止分の
+    文字列化は行われない。
+    """
+
+    def __init__(
+        self, rate: float = 0.2, burst: int = 5, min_level: int = logging.WARNING
+    ):
+        super().__init__()
+        self._rate: float = rate
+        self._burst: float = burst
+        self._min_level: int = min_level
+        """制限の対象とする最低レベル"""
+        self._buckets: dict[tuple[str, object], list[float]] = {}
+        """メッセージ毎の状態(残り件数, 更新時刻, 抑止件数)"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        # 送受信行のデバッグ出力は明示的に有効化したものなので制限しない
+        if record.levelno < self._min_level or record.name == RAW_LINE_LOGGER:
+            return True
+
+        now = time.monotonic()
+        key = (record.name, record.msg)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [self._burst, now, 0]
+
+        tokens, updated, suppressed = bucket
+        tokens = min(self._burst, tokens + (now - updated) * self._rate)
+
+        if tokens < 1:
+            bucket[:] = [tokens, now, suppressed + 1]
+            return False
+
+        bucket[:] = [tokens - 1, now, 0]
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class _AsyncQueueHandler(logging.handlers.QueueHandler):
+    """書式化と出力を QueueListener のスレッドで行う QueueHandler
+
+    呼び出し側(イベントループ)ではキューへの投入のみ行い、満杯時は待たずに破棄する。
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped: int = 0
+        """キュー満杯で破棄した件数"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 同一プロセス内で受け渡すため書式化せずそのまま渡す
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def configure_logging(
+    level: str = "INFO",
+    json_format: bool = False,
+    raw_lines: bool = False,
+    rate: float = 0.2,
+    burst: int = 5,
+    queue_size: int = 10000,
+):
+    """app 配下のロガーの出力を設定(出力はバックグラウンドスレッドで行う)"""
+    global _listener, _handler
+
+    stop_logging()
+
+    output = logging.StreamHandler()
+    output.setFormatter(JsonFormatter() if json_format else TextFormatter())
+
+    _handler = _AsyncQueueHandler(queue.Queue(queue_size))
+    _handler.addFilter(RateLimitFilter(rate, burst))
+
+    _listener = logging.handlers.QueueListener(_handler.queue, output)
+    _listener.start()
+
+    logger = logging.getLogger("app")
+    logger.handlers = [_handler]
+    logger.setLevel(level.upper())
+    logger.propagate = False
+
+    set_raw_line_logging(raw_lines)
+
+
+def stop_logging():
+    """未出力のログを書き出して出力スレッドを停止"""
+    global _listener, _handler
+
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    if _handler is not None:
+        logging.getLogger("app").removeHandler(_handler)
+        _handler = None
+
+
+def set_raw_line_logging(enabled: bool):
+    """シリアル送受信行のデバッグ出力を切り替え(実行中に変更可)"""
+    logging.getLogger(RAW_LINE_LOGGER).setLevel(
+        logging.DEBUG if enabled else logging.INFO
+    )
+
+
+def is_raw_line_logging() -> bool:
+    return logging.getLogger(RAW_LINE_LOGGER).isEnabledFor(logging.DEBUG)
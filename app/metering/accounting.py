@@ -0,0 +1,133 @@
+import time
+from typing import Optional
+from dataclasses import dataclass
+
+from app.echonet.property.property import Property
+from app.echonet.property.home_equipment_device.low_voltage_smart_pm import (
+    LowVoltageSmartPm,
+)
+
+
+@dataclass
+class EnergyDelta:
+    """積算電力量の差分"""
+
+    epc: int
+    """EPCコード"""
+    timestamp: float
+    """計測日時(UNIX秒)"""
+    delta_kwh: float
+    """前回計測値からの差分(kWh)"""
+    total_kwh: float
+    """集計開始からの累計(kWh)"""
+    rollover: bool
+    """有効桁数による桁あふれを検出"""
+
+
+@dataclass
+class _CounterState:
+    raw: int
+    """前回の計測値(換算前)"""
+    timestamp: float
+    """前回の計測日時"""
+    total_raw: int = 0
+    """累計(換算前) ※換算誤差の累積を避けるため整数で保持"""
+
+
+class EnergyAccountant:
+    """積算電力量の差分集計(1メーター分)
+
+    積算電力量計測値(0xE0, 0xE3, 0xEA, 0xEB)を受信順に取り込み、
+    係数(0xD3)・単位(0xE1)でkWhへ換算した差分と累計を返す。
+    計測値は有効桁数(0xD7)で桁あふれするため、減少した場合は桁あふれとして補正する。
+    状態は計測値の種類毎に前回値と累計のみを保持する。
+    """
+
+    def __init__(self):
+        self._coefficient: int = 1
+        """係数(0xD3) ※未提供のメーターは1"""
+        self._unit_multiplier: Optional[float] = None
+        """積算電力量単位の倍率(0xE1)"""
+        self._significant_digits: Optional[int] = None
+        """積算電力量有効桁数(0xD7)"""
+
+        self._counters: dict[int, _CounterState] = {}
+
+    def total_kwh(self, epc: int) -> Optional[float]:
+        counter = self._counters.get(epc)
+        if counter is None or self._unit_multiplier is None:
+            return None
+        return self._scale(counter.total_raw)
+
+    def consume(self, prop: Property, timestamp: float = None) -> Optional[EnergyDelta]:
+        """プロパティを取り込み、差分が得られた場合に返す"""
+        match prop:
+            case LowVoltageSmartPm.Coefficient():
+                self._coefficient = prop.value
+            case LowVoltageSmartPm.CumulativeEnergyUnit():
+                self._unit_multiplier = prop.multiplier
+            case LowVoltageSmartPm.CumulativeEnergySignificantDigit():
+                self._significant_digits = prop.value
+            case LowVoltageSmartPm.CumulativeEnergyMeasurement():
+                return self._count(prop.code, prop.value, timestamp or time.time())
+            case LowVoltageSmartPm.IntCumulativeEnergyMeasurement():
+                if prop.timestamp is not None:
+                    timestamp = prop.timestamp.timestamp()
+                return self._count(prop.code, prop.value, timestamp or time.time())
+
+        return None
+
+    def _count(
+        self, epc: int, raw: Optional[int], timestamp: float
+    ) -> Optional[EnergyDelta]:
+        if raw is None:
+            return None
+
+        counter = self._counters.get(epc)
+        if counter is None:
+            self._counters[epc] = _CounterState(raw, timestamp)
+            return None
+
+        # 定時積算値の再送・遅延到着は集計済みのため無視
+        if timestamp <= counter.timestamp:
+            return None
+
+        delta_raw = raw - counter.raw
+        rollover = False
+
+        if delta_raw < 0:
+            if self._significant_digits is None:
+                # 有効桁数不明のため補正できず、基準値のみ更新
+                counter.raw, counter.timestamp = raw, timestamp
+                return None
+
+            modulus = 10**self._significant_digits
+            delta_raw += modulus
+            rollover = True
+
+            if not 0 <= delta_raw < modulus // 2:
+                # 桁あふれでは説明できない減少(メーター交換等)は基準値のみ更新
+                counter.raw, counter.timestamp = raw, timestamp
+                return None
+
+        counter.raw, counter.timestamp = raw, timestamp
+
+        if self._unit_multiplier is None:
+            return None
+
+        counter.total_raw += delta_raw
+
+        return EnergyDelta(
+            epc=epc,
+            timestamp=timestamp,
+            delta_kwh=self._scale(delta_raw),
+            total_kwh=self._scale(counter.total_raw),
+            rollover=rollover,
+        )
+
+    def _scale(self, raw: int) -> float:
+        # 倍率は10の累乗のため除算側で換算して誤差を抑える
+        divisor = 1 / self._unit_multiplier
+        if divisor >= 1:
+            return raw * self._coefficient / round(divisor)
+        return raw * self._coefficient * self._unit_multiplier
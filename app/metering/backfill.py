@@ -0,0 +1,535 @@
+import os
+import math
+import asyncio
+import logging
+from enum import StrEnum
+from collections import deque
+from typing import Final, Optional
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from app.echonet.capability import Capabilities
+from app.echonet.echonet import Echonet
+from app.echonet.enet_data import EchonetData
+from app.echonet.protocol.eoj import EnetObject
+from app.echonet.protocol.esv import EnetService
+from app.echonet.property.property import Property
+from app.echonet.property.home_equipment_device.low_voltage_smart_pm import (
+    LowVoltageSmartPm,
+)
+from app.repository.json_repo import JsonSerializable
+from app.repository.timeseries import Series, TimeSeriesStore
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_CHECKPOINT_JSON = "backfill.json"
+
+HALF_HOUR: Final[timedelta] = timedelta(minutes=30)
+ONE_MINUTE: Final[timedelta] = timedelta(minutes=1)
+
+
+class HistoryKind(StrEnum):
+    """積算履歴の取得方法"""
+
+    HISTORY1 = "history1"
+    """積算履歴収集日１(0xE5) + 履歴１(0xE2, 0xE4) 1日分48コマ"""
+    HISTORY2 = "history2"
+    """積算履歴収集日２(0xED) + 履歴２(0xEC) 30分毎 最大12コマ"""
+    HISTORY3 = "history3"
+    """積算履歴収集日３(0xEF) + 履歴３(0xEE) 1分毎 最大10コマ"""
+
+
+HISTORY_EPCS: Final[dict[HistoryKind, tuple[int, int]]] = {
+    HistoryKind.HISTORY1: (0xE5, 0xE2),
+    HistoryKind.HISTORY2: (0xED, 0xEC),
+    HistoryKind.HISTORY3: (0xEF, 0xEE),
+}
+"""取得方法毎の(収集日 Set, 履歴 Get)EPC ※機器の対応可否の判定用"""
+
+
+class BackfillError(Exception):
+    """補完に必要な値を取得できない(次回の補完で再試行)"""
+
+
+@dataclass
+class BackfillTask:
+    """補完要求1回分(収集日SetC + 履歴Get)"""
+
+    kind: HistoryKind
+    """取得方法"""
+    timestamp: datetime
+    """HISTORY1: 対象日の0時, HISTORY2/3: 最新コマの日時"""
+    count: int
+    """コマ数"""
+    attempts: int = 0
+    """失敗回数"""
+
+    @property
+    def key(self) -> tuple[HistoryKind, datetime, int]:
+        """再計画時に同じ要求を識別するキー"""
+        return (self.kind, self.timestamp, self.count)
+
+    @property
+    def first_slot(self) -> datetime:
+        """対象の最古のコマ"""
+        match self.kind:
+            case HistoryKind.HISTORY1:
+                return self.timestamp
+            case HistoryKind.HISTORY2:
+                return self.timestamp - HALF_HOUR * (self.count - 1)
+            case HistoryKind.HISTORY3:
+                return self.timestamp - ONE_MINUTE * (self.count - 1)
+
+    def to_dict(self) -> dict:
+        return {
+            "kind": self.kind.value,
+            "timestamp": self.timestamp.isoformat(),
+            "count": self.count,
+            "attempts": self.attempts,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "BackfillTask":
+        return cls(
+            kind=HistoryKind(data["kind"]),
+            timestamp=datetime.fromisoformat(data["timestamp"]),
+            count=data["count"],
+            attempts=data.get("attempts", 0),
+        )
+
+
+@dataclass
+class BackfillCheckpoint(JsonSerializable):
+    """補完の進捗"""
+
+    watermark: Optional[str] = None
+    """欠測がない(または補完を断念した)ことを確認済みの日時(ISO形式)"""
+    tasks: list[dict] = field(default_factory=list)
+    """未完了の補完要求(失敗回数が上限に達したものを含む)"""
+
+
+class BackfillEngine:
+    """積算履歴による欠測補完
+
+    格納済みの30分毎・1分毎の積算電力量系列から欠測区間を検出し、
+    区間毎に要求回数が最少となる履歴プロパティを選択して取得する。
+    収集日のSetCと履歴のGetは応答を待たずに続けて予約し(パイプライン)、
+    完了した要求毎に進捗をチェックポイントへ保存するため中断後も再開できる。
+    欠測は毎回検出し直し、未完了の要求は失敗回数を引き継ぐ。失敗が max_attempts 回に
+    達した要求は以降送信せず、その区間を越えて進捗を進める。
+    """
+
+    HISTORY1_SLOTS: Final[int] = 48
+    HISTORY1_MAX_COLLECT_DAY: Final[int] = 99
+    HISTORY2_MAX_COUNT: Final[int] = 12
+    HISTORY3_MAX_COUNT: Final[int] = 10
+
+    def __init__(
+        self,
+        echonet: Echonet,
+        store: TimeSeriesStore,
+        src_enet_object: EnetObject,
+        dst_enet_object: EnetObject,
+        checkpoint_path: str = BACKFILL_CHECKPOINT_JSON,
+        max_history_days: int = 45,
+        history3_window: timedelta = timedelta(days=1),
+        pipeline_depth: int = 2,
+        settle_time: timedelta = timedelta(minutes=5),
+        max_attempts: int = 3,
+        capabilities: Optional[Capabilities] = None,
+    ):
+        self._echonet: Echonet = echonet
+        self._store: TimeSeriesStore = store
+        self._src: EnetObject = src_enet_object
+        self._dst: EnetObject = dst_enet_object
+        self._checkpoint_path: str = checkpoint_path
+
+        self._max_history_days: int = max_history_days
+        """履歴１・２で遡れる日数"""
+        self._history3_window: timedelta = history3_window
+        """履歴３で遡れる期間"""
+        self._pipeline_depth: int = pipeline_depth
+        """同時に予約する要求数"""
+        self._settle_time: timedelta = settle_time
+        """コマの計測値が確定するまでの猶予"""
+        self._max_attempts: int = max_attempts
+        """要求1件あたりの失敗回数の上限"""
+        self._capabilities: Optional[Capabilities] = capabilities
+        """機器の対応プロパティ(None は全て対応とみなす)"""
+
+        self._coefficient: int = 1
+        self._unit_multiplier: Optional[float] = None
+
+        self._checkpoint: BackfillCheckpoint = self._load_checkpoint()
+
+    async def run(self, now: datetime = None):
+        """欠測を検出して補完する(未完了の補完要求は失敗回数を引き継いで再計画)"""
+        now = now or datetime.now()
+
+        await self._fetch_scale()
+
+        end = self._floor(now - self._settle_time, HALF_HOUR)
+        attempts = {
+            task.key: task.attempts
+            for task in map(BackfillTask.from_dict, self._checkpoint.tasks)
+        }
+
+        # 補完済みの区間は除かれ、新たな欠測は未完了の要求と併せて計画される
+        start = self._start_time(end)
+        tasks = self.plan(start, end, now)
+        for task in tasks:
+            task.attempts = attempts.get(task.key, 0)
+        self._checkpoint.tasks = [task.to_dict() for task in tasks]
+        self._save_checkpoint()
+
+        await self._execute(
+            [task for task in tasks if task.attempts < self._max_attempts]
+        )
+
+        # 再試行する要求の手前まで進める(上限に達した要求の区間は越える)
+        pending = [
+            max(start, task.first_slot)
+            for task in map(BackfillTask.from_dict, self._checkpoint.tasks)
+            if task.attempts < self._max_attempts
+        ]
+        self._checkpoint.watermark = min([end, *pending]).isoformat()
+        self._save_checkpoint()
+
+    async def run_periodically(self, interval: timedelta = HALF_HOUR):
+        while True:
+            # 失敗しても補完を止めず次回に再試行(タスクは待ち合わされないため記録のみ)
+            try:
+                await self.run()
+            except Exception as e:
+                logger.exception("Backfill failed: %s", e)
+            await asyncio.sleep(interval.total_seconds())
+
+    def plan(self, start: datetime, end: datetime, now: datetime) -> list[BackfillTask]:
+        oldest = self._floor(now, timedelta(days=1)) - timedelta(
+            days=self._max_history_days
+        )
+        tasks = self._plan_half_hour(
+            self.detect_gaps(
+                Series.INTERVAL_ENERGY_NORMAL, max(start, oldest), end, HALF_HOUR
+            ),
+            now,
+        )
+
+        # 1分毎の系列は収集している場合のみ補完
+        if self._supports(HistoryKind.HISTORY3) and len(
+            self._store.series(Series.ONE_MINUTE_ENERGY_NORMAL)
+        ):
+            for run in self.detect_gaps(
+                Series.ONE_MINUTE_ENERGY_NORMAL,
+                max(start, now - self._history3_window),
+                self._floor(now - ONE_MINUTE, ONE_MINUTE),
+                ONE_MINUTE,
+            ):
+                tasks.extend(self._chunk(HistoryKind.HISTORY3, run))
+
+        return tasks
+
+    def detect_gaps(
+        self, series: str, start: datetime, end: datetime, step: timedelta
+    ) -> list[list[datetime]]:
+        """start～endのコマのうち欠測が連続する区間の一覧"""
+        first = self._floor(start, step)
+        if first < start:
+            first += step
+
+        runs = []
+        for gap_start, gap_end in self._store.gaps(
+            series, first.timestamp(), end.timestamp() + 1
+        ):
+            # 欠測区間内のコマ(先頭はコマ境界に切り上げ)
+            offset = math.ceil((gap_start - first.timestamp()) / step.total_seconds())
+            slot = first + step * offset
+            run = []
+            while slot <= end and slot.timestamp() < gap_end:
+                run.append(slot)
+                slot += step
+            if run:
+                runs.append(run)
+
+        return runs
+
+    def _plan_half_hour(
+        self, runs: list[list[datetime]], now: datetime
+    ) -> list[BackfillTask]:
+        # 日毎に欠測区間をまとめ、履歴２での要求回数が1回を超える日は履歴１(1日分を1回)を選択
+        # (いずれか一方のみ対応する機器はその方法のみを用いる)
+        history1 = self._supports(HistoryKind.HISTORY1)
+        history2 = self._supports(HistoryKind.HISTORY2)
+
+        days: dict[datetime, list[list[datetime]]] = {}
+        for run in runs:
+            for slot in run:
+                day = self._floor(slot, timedelta(days=1))
+                day_runs = days.setdefault(day, [])
+                if day_runs and day_runs[-1][-1] + HALF_HOUR == slot:
+                    day_runs[-1].append(slot)
+                else:
+                    day_runs.append([slot])
+
+        tasks = []
+        for day, day_runs in days.items():
+            chunks = [
+                task
+                for run in day_runs
+                for task in self._chunk(HistoryKind.HISTORY2, run)
+            ]
+            day_task = BackfillTask(HistoryKind.HISTORY1, day, self.HISTORY1_SLOTS)
+            if (
+                history1
+                and (len(chunks) > 1 or not history2)
+                and self._is_valid(day_task, now)
+            ):
+                tasks.append(day_task)
+            elif history2:
+                tasks.extend(chunks)
+
+        return tasks
+
+    def _chunk(self, kind: HistoryKind, slots: list[datetime]) -> list[BackfillTask]:
+        max_count = (
+            self.HISTORY2_MAX_COUNT
+            if kind == HistoryKind.HISTORY2
+            else self.HISTORY3_MAX_COUNT
+        )
+
+        # 履歴２・３は指定日時から過去方向に取得するため新しい側から分割
+        tasks = []
+        for end in range(len(slots), 0, -max_count):
+            chunk = slots[max(0, end - max_count) : end]
+            tasks.append(BackfillTask(kind, chunk[-1], len(chunk)))
+        return tasks
+
+    async def _execute(self, tasks: list[BackfillTask]):
+        window = deque()
+
+        for task in tasks:
+            # 計画後に日付が変わり収集日が範囲外となった要求は送信しない(エンコード不可)
+            if not self._is_valid(task):
+                logger.warning(
+                    "Backfill task out of range, dropped",
+                    extra={"kind": task.kind, "timestamp": task.timestamp},
+                )
+                self._checkpoint.tasks.remove(task.to_dict())
+                self._save_checkpoint()
+                continue
+
+            set_future = self._echonet.submit(
+                self._make_request(EnetService.SetC, task)
+            )
+            get_future = self._echonet.submit(self._make_request(EnetService.Get, task))
+            window.append((task, set_future, get_future))
+
+            if len(window) >= self._pipeline_depth:
+                await self._complete(*window.popleft())
+
+        while window:
+            await self._complete(*window.popleft())
+
+    async def _complete(
+        self,
+        task: BackfillTask,
+        set_future: asyncio.Future,
+        get_future: asyncio.Future,
+    ):
+        set_responses = await set_future
+        get_responses = await get_future
+
+        if not any(r.enet_service == EnetService.SetRes for r in set_responses):
+            self._fail(task, "Backfill SetC failed")
+            return
+
+        for response in get_responses:
+            if response.enet_service != EnetService.GetRes:
+                continue
+            if self._store_history(task, response.properties):
+                self._checkpoint.tasks.remove(task.to_dict())
+                self._save_checkpoint()
+                return
+
+        self._fail(task, "Backfill history not received")
+
+    def _fail(self, task: BackfillTask, message: str):
+        index = self._checkpoint.tasks.index(task.to_dict())
+        task.attempts += 1
+        self._checkpoint.tasks[index] = task.to_dict()
+        self._save_checkpoint()
+
+        logger.warning(
+            message if task.attempts < self._max_attempts else f"{message}, giving up",
+            extra={
+                "kind": task.kind,
+                "timestamp": task.timestamp,
+                "attempts": task.attempts,
+            },
+        )
+
+    def _store_history(self, task: BackfillTask, properties: tuple[Property]) -> bool:
+        stored = False
+
+        for prop in properties:
+            match prop:
+                case LowVoltageSmartPm.CumulativeEnergyMeasurementHistory1():
+                    if prop.collect_day != self._collect_day(task.timestamp):
+                        continue
+                    series = (
+                        Series.INTERVAL_ENERGY_NORMAL
+                        if isinstance(
+                            prop,
+                            LowVoltageSmartPm.CumulativeEnergyMeasurementHistory1NormalDir,
+                        )
+                        else Series.INTERVAL_ENERGY_REVERSE
+                    )
+                    for index, value in enumerate(prop.values):
+                        slot = task.timestamp + HALF_HOUR * index
+                        if slot > datetime.now():
+                            break
+                        self._store.insert(series, slot.timestamp(), self._scale(value))
+                    stored = True
+                case (
+                    LowVoltageSmartPm.CumulativeEnergyMeasurementHistory2()
+                    | LowVoltageSmartPm.CumulativeEnergyMeasurementHistory3()
+                ):
+                    if prop.timestamp != task.timestamp:
+                        continue
+                    if task.kind == HistoryKind.HISTORY2:
+                        step = HALF_HOUR
+                        normal = Series.INTERVAL_ENERGY_NORMAL
+                        reverse = Series.INTERVAL_ENERGY_REVERSE
+                    else:
+                        step = ONE_MINUTE
+                        normal = Series.ONE_MINUTE_ENERGY_NORMAL
+                        reverse = Series.ONE_MINUTE_ENERGY_REVERSE
+                    for index, (forward, backward) in enumerate(prop.energy_records):
+                        slot = (task.timestamp - step * index).timestamp()
+                        self._store.insert(normal, slot, self._scale(forward))
+                        self._store.insert(reverse, slot, self._scale(backward))
+                    stored = True
+
+        return stored
+
+    def _make_request(self, service: EnetService, task: BackfillTask) -> EchonetData:
+        match task.kind:
+            case HistoryKind.HISTORY1:
+                set_property = LowVoltageSmartPm.CumulativeHistoryCollectDay1(
+                    collect_day=self._collect_day(task.timestamp)
+                )
+                get_properties = [
+                    LowVoltageSmartPm.CumulativeEnergyMeasurementHistory1NormalDir(),
+                    LowVoltageSmartPm.CumulativeEnergyMeasurementHistory1ReverseDir(),
+                ]
+            case HistoryKind.HISTORY2:
+                set_property = LowVoltageSmartPm.CumulativeHistoryCollectDay2(
+                    timestamp=task.timestamp, collect_count=task.count
+                )
+                get_properties = [
+                    LowVoltageSmartPm.CumulativeEnergyMeasurementHistory2()
+                ]
+            case HistoryKind.HISTORY3:
+                set_property = LowVoltageSmartPm.CumulativeHistoryCollectDay3(
+                    timestamp=task.timestamp, collect_count=task.count
+                )
+                get_properties = [
+                    LowVoltageSmartPm.CumulativeEnergyMeasurementHistory3()
+                ]
+
+        return EchonetData(
+            src_enet_object=self._src,
+            dst_enet_object=self._dst,
+            enet_service=service,
+            properties=(
+                [set_property] if service == EnetService.SetC else get_properties
+            ),
+        )
+
+    async def _fetch_scale(self):
+        if self._unit_multiplier is not None:
+            return
+
+        responses = await self._echonet.request(
+            EchonetData(
+                src_enet_object=self._src,
+                dst_enet_object=self._dst,
+                enet_service=EnetService.Get,
+                properties=[
+                    LowVoltageSmartPm.Coefficient(),
+                    LowVoltageSmartPm.CumulativeEnergyUnit(),
+                ],
+            )
+        )
+
+        for response in responses:
+            for prop in response.properties:
+                match prop:
+                    case LowVoltageSmartPm.Coefficient():
+                        self._coefficient = prop.value
+                    case LowVoltageSmartPm.CumulativeEnergyUnit():
+                        self._unit_multiplier = prop.multiplier
+                self._store.ingest(prop)
+
+        if self._unit_multiplier is None:
+            raise BackfillError("Cumulative energy unit not received")
+
+    def _scale(self, raw: Optional[int]) -> Optional[float]:
+        if raw is None:
+            return None
+        return raw * self._coefficient * self._unit_multiplier
+
+    def _start_time(self, end: datetime) -> datetime:
+        if self._checkpoint.watermark:
+            return datetime.fromisoformat(self._checkpoint.watermark)
+
+        # 初回は格納済みの最古データ以降のみを対象とする
+        timestamps, _ = self._store.series(Series.INTERVAL_ENERGY_NORMAL).range(
+            -math.inf, math.inf
+        )
+        if timestamps:
+            return datetime.fromtimestamp(timestamps[0])
+        return end
+
+    def _collect_day(self, day: datetime, now: datetime = None) -> int:
+        return ((now or datetime.now()).date() - day.date()).days
+
+    def _supports(self, kind: HistoryKind) -> bool:
+        if self._capabilities is None:
+            return True
+        set_epc, get_epc = HISTORY_EPCS[kind]
+        return self._capabilities.can_set(set_epc) and self._capabilities.can_get(
+            get_epc
+        )
+
+    def _is_valid(self, task: BackfillTask, now: datetime = None) -> bool:
+        if task.kind != HistoryKind.HISTORY1:
+            return True
+        return (
+            0 <= self._collect_day(task.timestamp, now) <= self.HISTORY1_MAX_COLLECT_DAY
+        )
+
+    def _load_checkpoint(self) -> BackfillCheckpoint:
+        if os.path.exists(self._checkpoint_path):
+            try:
+                checkpoint = BackfillCheckpoint.from_json(
+                    file_path=self._checkpoint_path
+                )
+                # 以前の実行から日数が経過し収集日が範囲外となった要求は除く
+                checkpoint.tasks = [
+                    task
+                    for task in checkpoint.tasks
+                    if self._is_valid(BackfillTask.from_dict(task))
+                ]
+                return checkpoint
+            except Exception as e:
+                logger.warning("Backfill checkpoint read failed: %s", e)
+        return BackfillCheckpoint()
+
+    def _save_checkpoint(self):
+        self._checkpoint.to_json(self._checkpoint_path)
+
+    @staticmethod
+    def _floor(value: datetime, step: timedelta) -> datetime:
+        midnight = value.replace(hour=0, minute=0, second=0, microsecond=0)
+        return midnight + (value - midnight) // step * step
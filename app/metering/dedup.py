@@ -0,0 +1,239 @@
+import os
+import time
+import logging
+from typing import Optional
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from app.echonet.enet_data import EchonetData
+from app.echonet.property.property import Property
+from app.echonet.property.home_equipment_device.low_voltage_smart_pm import (
+    LowVoltageSmartPm,
+)
+from app.metering.reading import Reading, eoj_hex, reading_from
+from app.metrics.registry import REGISTRY
+from app.repository.interval_set import IntervalSet
+from app.repository.json_repo import JsonSerializable
+from app.repository.timeseries import SERIES_STEPS, Series
+
+logger = logging.getLogger(__name__)
+
+FORWARDED_SLOTS_JSON = "forwarded.json"
+
+DUPLICATE_POINTS = REGISTRY.counter(
+    "readings_duplicate_points_total",
+    "Metered points not forwarded because the slot was already forwarded",
+    ("meter", "series"),
+)
+
+
+@dataclass
+class ForwardedSlots(JsonSerializable):
+    """出力済みのコマ(再起動後に同じコマを再出力しないための保存内容)"""
+
+    series: dict[str, list[list[float]]] = field(default_factory=dict)
+    """系列 → 出力済みの区間 [開始, 終了)(UNIX秒)"""
+
+
+@dataclass(frozen=True)
+class Point:
+    """計測時刻を持つ積算電力量1コマ分"""
+
+    series: Series
+    """系列"""
+    timestamp: float
+    """計測時刻(UNIX秒)"""
+    raw: Optional[int]
+    """計測値(係数・単位換算前、欠測は None)"""
+
+
+def points_from(prop: Property, received_at: datetime) -> Optional[list[Point]]:
+    """定時積算・1分積算・積算履歴をコマ毎の計測値に展開(該当しないプロパティは None)"""
+    match prop:
+        case LowVoltageSmartPm.IntCumulativeEnergyNormalDir():
+            return _point(Series.INTERVAL_ENERGY_NORMAL, prop.timestamp, prop.value)
+        case LowVoltageSmartPm.IntCumulativeEnergyReverseDir():
+            return _point(Series.INTERVAL_ENERGY_REVERSE, prop.timestamp, prop.value)
+        case LowVoltageSmartPm.OneMinuteCumulativeEnergy():
+            return _point(
+                Series.ONE_MINUTE_ENERGY_NORMAL, prop.timestamp, prop.forward_energy
+            ) + _point(
+                Series.ONE_MINUTE_ENERGY_REVERSE, prop.timestamp, prop.reverse_energy
+            )
+        case LowVoltageSmartPm.CumulativeEnergyMeasurementHistory1():
+            series = (
+                Series.INTERVAL_ENERGY_NORMAL
+                if isinstance(
+                    prop, LowVoltageSmartPm.CumulativeEnergyMeasurementHistory1NormalDir
+                )
+                else Series.INTERVAL_ENERGY_REVERSE
+            )
+            day = datetime.combine(
+                received_at.date() - timedelta(days=prop.collect_day),
+                datetime.min.time(),
+            )
+            # 当日分の未到来のコマは除く
+            return [
+                Point(series, slot.timestamp(), value)
+                for index, value in enumerate(prop.values)
+                if (slot := day + timedelta(minutes=30) * index) <= received_at
+            ]
+        case LowVoltageSmartPm.CumulativeEnergyMeasurementHistory2():
+            return _history_points(
+                prop,
+                timedelta(minutes=30),
+                Series.INTERVAL_ENERGY_NORMAL,
+                Series.INTERVAL_ENERGY_REVERSE,
+            )
+        case LowVoltageSmartPm.CumulativeEnergyMeasurementHistory3():
+            return _history_points(
+                prop,
+                timedelta(minutes=1),
+                Series.ONE_MINUTE_ENERGY_NORMAL,
+                Series.ONE_MINUTE_ENERGY_REVERSE,
+            )
+        case _:
+            return None
+
+
+def _point(series: Series, timestamp: Optional[datetime], raw: Optional[int]):
+    if timestamp is None:
+        return []
+    return [Point(series, timestamp.timestamp(), raw)]
+
+
+def _history_points(
+    prop: Property, step: timedelta, normal: Series, reverse: Series
+) -> list[Point]:
+    # 履歴２・３は収集日時から過去方向の順
+    if prop.timestamp is None:
+        return []
+
+    points = []
+    for index, (forward, backward) in enumerate(prop.energy_records):
+        timestamp = (prop.timestamp - step * index).timestamp()
+        points.append(Point(normal, timestamp, forward))
+        points.append(Point(reverse, timestamp, backward))
+    return points
+
+
+class ReadingDeduplicator:
+    """受信データを計測値に変換し、同一コマの計測値は1回だけ出力する
+
+    定時積算(0xEA/0xEB)・1分積算(0xD0)・積算履歴(0xE2/0xE4/0xEC/0xEE)は
+    互いに・過去の補完と同じコマを含むため、系列毎に計測時刻で索引して
+    未出力のコマのみを計測値(コマ毎、timestamp は計測時刻)として出力する。
+    欠測(None)のコマは出力せず、後から値を受信した時点で出力する。
+    その他のプロパティは readings_from() と同じく受信毎に出力する。
+    checkpoint_path 指定時は出力済みのコマを保存し、再起動後も重複して出力しない
+    (積算履歴１の最大遡及日数を超える retention より前の区間は破棄する)。
+    """
+
+    def __init__(
+        self,
+        meter: str = "default",
+        checkpoint_path: Optional[str] = None,
+        retention: timedelta = timedelta(days=100),
+    ):
+        self._meter: str = meter
+        self._checkpoint_path: Optional[str] = checkpoint_path
+        self._retention: float = retention.total_seconds()
+        """出力済みのコマを保持する期間(秒)"""
+        self._forwarded: dict[str, IntervalSet] = self._load_checkpoint()
+        """系列毎の出力済みのコマ"""
+
+        self._coefficient: int = 1
+        """係数(0xD3)"""
+        self._unit_multiplier: Optional[float] = None
+        """積算電力量単位の倍率(0xE1)"""
+
+    def forwarded(self, series: str) -> IntervalSet:
+        forwarded = self._forwarded.get(series)
+        if forwarded is None:
+            forwarded = IntervalSet()
+            self._forwarded[series] = forwarded
+        return forwarded
+
+    def readings(
+        self, enet_data: EchonetData, timestamp: float = None
+    ) -> list[Reading]:
+        timestamp = timestamp or time.time()
+        received_at = datetime.fromtimestamp(timestamp)
+        eoj = eoj_hex(enet_data.src_enet_object)
+
+        readings = []
+        added = False
+        for prop in enet_data.properties:
+            match prop:
+                case LowVoltageSmartPm.Coefficient():
+                    self._coefficient = prop.value or 1
+                case LowVoltageSmartPm.CumulativeEnergyUnit():
+                    self._unit_multiplier = prop.multiplier
+
+            points = points_from(prop, received_at)
+            if points is None:
+                readings.append(reading_from(prop, self._meter, timestamp, eoj))
+                continue
+
+            for point in points:
+                if point.raw is None:
+                    continue
+                if not self.forwarded(point.series).add(
+                    point.timestamp, point.timestamp + SERIES_STEPS[point.series]
+                ):
+                    DUPLICATE_POINTS.labels(
+                        meter=self._meter, series=point.series
+                    ).inc()
+                    continue
+
+                added = True
+                readings.append(
+                    Reading(
+                        meter=self._meter,
+                        timestamp=point.timestamp,
+                        eoj=eoj,
+                        epc=prop.code,
+                        name=point.series,
+                        value={"raw": point.raw, "value": self._scale(point.raw)},
+                    )
+                )
+
+        if added and self._checkpoint_path:
+            self._save_checkpoint(timestamp)
+
+        return readings
+
+    def _load_checkpoint(self) -> dict[str, IntervalSet]:
+        forwarded = {}
+        if self._checkpoint_path and os.path.exists(self._checkpoint_path):
+            try:
+                checkpoint = ForwardedSlots.from_json(file_path=self._checkpoint_path)
+            except Exception as e:
+                logger.warning("Forwarded slots read failed: %s", e)
+                return forwarded
+
+            for series, intervals in checkpoint.series.items():
+                forwarded[series] = IntervalSet()
+                for start, end in intervals:
+                    forwarded[series].add(start, end)
+        return forwarded
+
+    def _save_checkpoint(self, now: float):
+        for intervals in self._forwarded.values():
+            intervals.discard_before(now - self._retention)
+
+        try:
+            ForwardedSlots(
+                {
+                    series: [list(interval) for interval in intervals]
+                    for series, intervals in self._forwarded.items()
+                }
+            ).to_json(self._checkpoint_path)
+        except OSError as e:
+            logger.warning("Forwarded slots write failed: %s", e)
+
+    def _scale(self, raw: int) -> Optional[float]:
+        # 単位(0xE1)未取得の間は換算値なし(raw のみ)
+        if self._unit_multiplier is None:
+            return None
+        return raw * self._coefficient * self._unit_multiplier
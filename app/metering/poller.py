@@ -0,0 +1,237 @@
+import time
+import asyncio
+import logging
+from asyncio import Queue
+from typing import Final, Optional
+from dataclasses import dataclass, field
+
+from app.echonet.capability import object_key
+from app.echonet.echonet import Echonet
+from app.echonet.enet_data import EchonetData
+from app.echonet.protocol.eoj import EnetObject
+from app.echonet.protocol.esv import EnetService
+from app.echonet.property.property import Property
+from app.metrics.registry import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_SERVICES: Final[frozenset[EnetService]] = frozenset(
+    {EnetService.Inf, EnetService.InfC}
+)
+"""機器からの通知ESV"""
+
+VALUE_SERVICES: Final[frozenset[EnetService]] = NOTIFY_SERVICES | {EnetService.GetRes}
+"""計測値を含むESV(通知・Get応答)"""
+
+POLL_REQUESTS = REGISTRY.counter(
+    "poller_requests_total",
+    "Get requests sent because no value arrived within the poll interval",
+    ("meter", "epc"),
+)
+NOTIFIED_VALUES = REGISTRY.counter(
+    "poller_notified_total",
+    "Inf/InfC values that reset the poll timer instead of a Get",
+    ("meter", "epc"),
+)
+
+
+@dataclass
+class PollTarget:
+    """定期取得の対象プロパティ1つ分"""
+
+    property: Property
+    """Get要求に用いるプロパティ"""
+    interval: float
+    """値を受信しない場合に要求する間隔(秒)"""
+    received_at: float = float("-inf")
+    """最後に値を受信した時刻(monotonic)"""
+    requested_at: float = float("-inf")
+    """最後に要求した時刻(monotonic)"""
+    value: Optional[Property] = None
+    """最後に受信した値"""
+    forced: bool = False
+    """間隔によらず次回要求する(read() で値が古い場合)"""
+    waiters: list[asyncio.Future[Property]] = field(default_factory=list)
+    """値の受信を待つ read()"""
+
+    def due_at(self, scale: float = 1.0) -> float:
+        if self.forced:
+            return float("-inf")
+        return max(self.received_at, self.requested_at) + self.interval * scale
+
+
+class NotificationPoller:
+    """通知(Inf/InfC)と定期取得(Get)を併用した計測値の取得
+
+    送信先オブジェクトのプロパティ毎に最後に値を受信した時刻を保持し、
+    通知・Get応答のいずれかで値を受信するとそのプロパティの要求タイマーを
+    リセットする。間隔内に通知がなかったプロパティのみ、まとめて1回の Get で要求する。
+    定時積算電力量(0xEA/0xEB)のように機器が定期通知する値は、通知を取りこぼした
+    場合のみ要求される。
+    """
+
+    def __init__(
+        self,
+        echonet: Echonet,
+        src_enet_object: EnetObject,
+        dst_enet_object: EnetObject,
+        name: str = "default",
+    ):
+        self._echonet: Echonet = echonet
+        self._src: EnetObject = src_enet_object
+        self._dst: EnetObject = dst_enet_object
+        self._dst_key: str = object_key(dst_enet_object)
+        self._name: str = name
+        """メトリクス用の名前(メーター名)"""
+
+        self._targets: dict[int, PollTarget] = {}
+        """EPC → 定期取得の対象"""
+        self._wakeup: asyncio.Event = asyncio.Event()
+        """要求スケジュールの再計算通知(値の受信・read() 時)"""
+        self._interval_scale: float = 1.0
+        """要求間隔の倍率(回線品質の劣化時に間引く)"""
+
+    def add(self, property: Property, interval: float):
+        """定期取得の対象を追加(追加直後に初回の要求を行う)"""
+        self._targets[property.code] = PollTarget(property, interval)
+        self._wakeup.set()
+
+    @property
+    def interval_scale(self) -> float:
+        return self._interval_scale
+
+    @interval_scale.setter
+    def interval_scale(self, scale: float):
+        self._interval_scale = scale
+        self._wakeup.set()
+
+    def value(self, epc: int) -> Optional[Property]:
+        target = self._targets.get(epc)
+        return target.value if target else None
+
+    async def read(self, epc: int, max_age: float = None) -> Property:
+        """max_age 秒以内に受信した値を返す(なければ即時要求し、通知・応答の早い方を返す)
+
+        要求が応答なし(タイムアウト)または送信失敗の場合は asyncio.TimeoutError
+        """
+        target = self._targets[epc]
+        if target.value is not None and (
+            max_age is None or time.monotonic() - target.received_at <= max_age
+        ):
+            return target.value
+
+        waiter = asyncio.get_running_loop().create_future()
+        target.waiters.append(waiter)
+        target.forced = True
+        self._wakeup.set()
+
+        try:
+            return await waiter
+        finally:
+            if waiter in target.waiters:
+                target.waiters.remove(waiter)
+
+    def observe(self, enet_data: EchonetData):
+        """受信データの値を反映(送信先オブジェクトからの通知・Get応答のみ)"""
+        if enet_data.enet_service not in VALUE_SERVICES:
+            return
+        if object_key(enet_data.src_enet_object) != self._dst_key:
+            return
+
+        now = time.monotonic()
+        notified = enet_data.enet_service in NOTIFY_SERVICES
+
+        for prop in enet_data.properties:
+            target = self._targets.get(prop.code)
+            if target is None:
+                continue
+
+            target.value = prop
+            target.received_at = now
+            target.forced = False
+            if notified:
+                NOTIFIED_VALUES.labels(meter=self._name, epc=f"0x{prop.code:02X}").inc()
+
+            for waiter in target.waiters:
+                if not waiter.done():
+                    waiter.set_result(prop)
+            target.waiters.clear()
+
+        self._wakeup.set()
+
+    async def run(self):
+        subscriber = self._echonet.subscribe()
+        receiver = asyncio.create_task(self._proc_receive(subscriber))
+
+        try:
+            await self._proc_poll()
+        finally:
+            receiver.cancel()
+            self._echonet.unsubscribe(subscriber)
+
+    async def _proc_receive(self, subscriber: Queue[EchonetData]):
+        while True:
+            self.observe(await subscriber.get())
+
+    async def _proc_poll(self):
+        while True:
+            self._wakeup.clear()
+
+            now = time.monotonic()
+            due = [
+                target
+                for target in self._targets.values()
+                if target.due_at(self._interval_scale) <= now
+            ]
+
+            if due:
+                await self._request(due, now)
+                continue
+
+            timeout = None
+            if self._targets:
+                timeout = (
+                    min(t.due_at(self._interval_scale) for t in self._targets.values())
+                    - now
+                )
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _request(self, targets: list[PollTarget], now: float):
+        for target in targets:
+            target.requested_at = now
+            target.forced = False
+            POLL_REQUESTS.labels(
+                meter=self._name, epc=f"0x{target.property.code:02X}"
+            ).inc()
+
+        waiters = [(target, list(target.waiters)) for target in targets]
+
+        # 値は受信データの配信(observe)で反映するため応答は待ち合わせのみ
+        try:
+            responses = await self._echonet.request(
+                EchonetData(
+                    src_enet_object=self._src,
+                    dst_enet_object=self._dst,
+                    enet_service=EnetService.Get,
+                    properties=[target.property for target in targets],
+                )
+            )
+        except Exception:
+            # 要求の失敗で定期取得を止めない(次回は間隔経過後に再要求)
+            logger.exception("Poll request failed: meter=%s", self._name)
+            responses = []
+
+        if not responses:
+            # 応答がなければ値は届かないため、要求時点の read() の待ちを打ち切る
+            for target, target_waiters in waiters:
+                for waiter in target_waiters:
+                    if not waiter.done():
+                        waiter.set_exception(
+                            asyncio.TimeoutError(
+                                f"No response for EPC 0x{target.property.code:02X}"
+                            )
+                        )
@@ -0,0 +1,89 @@
+import time
+import dataclasses
+from enum import Enum
+from typing import Any
+from dataclasses import dataclass
+from datetime import date, datetime, time as dt_time
+
+from app.echonet.enet_data import EchonetData
+from app.echonet.object.enet_object import EnetObject
+from app.echonet.property.property import Property
+
+
+@dataclass(frozen=True)
+class Reading:
+    """出力用の計測値(プロパティ1件分)"""
+
+    meter: str
+    """メーター名"""
+    timestamp: float
+    """受信日時(UNIX秒) ※コマ毎の積算電力量(ReadingDeduplicator)は計測時刻"""
+    eoj: str
+    """送信元ECHONETオブジェクト(16進6桁)"""
+    epc: int
+    """EPCコード"""
+    name: str
+    """プロパティ名"""
+    value: dict[str, Any]
+    """プロパティ値(JSON変換可能な値のみ)"""
+
+    def to_dict(self) -> dict[str, Any]:
+        return dataclasses.asdict(self)
+
+
+def eoj_hex(enet_object: EnetObject) -> str:
+    return bytes(enet_object.encode()).hex().upper()
+
+
+def property_value(prop: Property) -> dict[str, Any]:
+    """プロパティのフィールドをJSON変換可能な辞書に変換"""
+    return {
+        f.name: _to_json_value(getattr(prop, f.name))
+        for f in dataclasses.fields(prop)
+        if f.init
+    }
+
+
+def reading_from(prop: Property, meter: str, timestamp: float, eoj: str) -> Reading:
+    return Reading(
+        meter=meter,
+        timestamp=timestamp,
+        eoj=eoj,
+        epc=prop.code,
+        name=type(prop).__qualname__,
+        value=property_value(prop),
+    )
+
+
+def readings_from(
+    enet_data: EchonetData, meter: str = "default", timestamp: float = None
+) -> list[Reading]:
+    timestamp = timestamp or time.time()
+    eoj = eoj_hex(enet_data.src_enet_object)
+
+    return [reading_from(prop, meter, timestamp, eoj) for prop in enet_data.properties]
+
+
+def _to_json_value(value: Any) -> Any:
+    match value:
+        case None | bool() | str():
+            return value
+        case Enum():
+            return value.value
+        case int() | float():
+            return value
+        case datetime() | date() | dt_time():
+            return value.isoformat()
+        case bytes() | bytearray():
+            return value.hex()
+        case EnetObject():
+            return eoj_hex(value)
+        case list() | tuple():
+            return [_to_json_value(v) for v in value]
+        case _ if dataclasses.is_dataclass(value):
+            return {
+                f.name: _to_json_value(getattr(value, f.name))
+                for f in dataclasses.fields(value)
+            }
+        case _:
+            return str(value)
@@ -0,0 +1,62 @@
+import asyncio
+from typing import Optional
+
+from app.metrics.registry import REGISTRY, Registry
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class MetricsServer:
+    """メトリクス公開用HTTPサーバ(GET /metrics のみ)
+
+    受信処理と同じイベントループ上で動作する。
+    """
+
+    def __init__(
+        self, host: str = "127.0.0.1", port: int = 9100, registry: Registry = REGISTRY
+    ):
+        self._host: str = host
+        self._port: int = port
+        self._registry: Registry = registry
+        self._server: Optional[asyncio.Server] = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(
+            self._handle, host=self._host, port=self._port
+        )
+
+    async def close(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+
+            # ヘッダは読み捨て
+            while True:
+                line = await asyncio.wait_for(reader.readline(), timeout=5)
+                if line in (b"\r\n", b"\n", b""):
+                    break
+
+            parts = request_line.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1] in ("/", "/metrics"):
+                status = "200 OK"
+                body = self._registry.render().encode()
+            else:
+                status = "404 Not Found"
+                body = b"Not Found\n"
+
+            writer.write(
+                f"HTTP/1.1 {status}\r\n"
+                f"Content-Type: {CONTENT_TYPE}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                "Connection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
@@ -0,0 +1,257 @@
+import json
+import time
+import random
+import itertools
+from contextvars import ContextVar
+from typing import Any, Optional
+
+_current_flow: ContextVar[Optional[int]] = ContextVar("trace_flow", default=None)
+"""処理中のフレームの追跡ID(同一タスク内の入れ子のスパンへ引き継ぐ)"""
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ("_tracer", "_name", "_flow", "_start", "_token")
+
+    def __init__(self, tracer: "Tracer", name: str, flow: Optional[int]):
+        self._tracer = tracer
+        self._name = name
+        self._flow = flow
+
+    def __enter__(self):
+        if self._flow is None:
+            self._flow = _current_flow.get()
+        self._token = _current_flow.set(self._flow)
+        self._start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *args):
+        end = time.perf_counter_ns()
+        _current_flow.reset(self._token)
+        self._tracer._complete(self._name, self._start, end, self._flow)
+        return False
+
+
+class _Durations:
+    """区間1種類分の所要時間(ns)の集計
+
+    件数・合計・最大は全件で集計し、分位数は固定長のリザーバサンプル
+    (全件から一様に抽出)から求めるため、長時間の計測でもメモリは増えない。
+    """
+
+    __slots__ = ("count", "total", "max", "samples", "_size")
+
+    def __init__(self, size: int):
+        self.count: int = 0
+        self.total: int = 0
+        self.max: int = 0
+        self.samples: list[int] = []
+        self._size: int = size
+
+    def add(self, duration: int):
+        self.count += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+
+        if len(self.samples) < self._size:
+            self.samples.append(duration)
+        else:
+            index = random.randrange(self.count)
+            if index < self._size:
+                self.samples[index] = duration
+
+
+class Tracer:
+    """受信・送信経路の処理区間の計測(Chrome trace 形式で出力)
+
+    無効時の span() は共有の空コンテキストを返すだけのため、計測箇所に残しても負荷はほぼない。
+    キューを経由する区間は enqueue()/dequeue() で投入から取り出しまでを計測し、
+    同一フレームの各区間は追跡ID(flow)で関連付ける。
+    """
+
+    def __init__(
+        self,
+        max_events: int = 1_000_000,
+        max_pending: int = 10_000,
+        max_samples: int = 10_000,
+    ):
+        self.enabled: bool = False
+        self._max_events: int = max_events
+        self._max_pending: int = max_pending
+        self._max_samples: int = max_samples
+        """区間毎に分位数の算出用に保持する所要時間の件数"""
+
+        self._events: list[dict[str, Any]] = []
+        self._durations: dict[str, _Durations] = {}
+        self._pending: dict[int, tuple[object, Optional[str], int, Optional[int]]] = {}
+        """キュー投入中の要素(id → 要素, 区間名, 投入時刻, 追跡ID)"""
+        self._lanes: dict[str, int] = {}
+        self._flow_ids = itertools.count(1)
+        self._origin_ns: int = 0
+
+        self.dropped: int = 0
+        """上限超過で記録しなかったイベント数"""
+
+    def start(self):
+        self._events.clear()
+        self._durations.clear()
+        self._pending.clear()
+        self._lanes.clear()
+        self._origin_ns = time.perf_counter_ns()
+        self.dropped = 0
+        self.enabled = True
+
+    def stop(self):
+        self.enabled = False
+        self._pending.clear()
+
+    def new_flow(self) -> Optional[int]:
+        """フレーム1件分の追跡IDを発行し、以降のスパンに引き継ぐ"""
+        if not self.enabled:
+            return None
+        flow = next(self._flow_ids)
+        _current_flow.set(flow)
+        return flow
+
+    def span(self, name: str, flow: Optional[int] = None):
+        if not self.enabled:
+            return _NOOP_SPAN
+        return _Span(self, name, flow)
+
+    def record(self, name: str, start_ns: int, flow: Optional[int] = None):
+        """開始時刻を別途計測した区間を記録(終了は現在時刻)"""
+        if self.enabled:
+            self._complete(
+                name, start_ns, time.perf_counter_ns(), flow or _current_flow.get()
+            )
+
+    def enqueue(self, item: object, name: Optional[str] = None):
+        """キューへの投入を記録(name 省略時は追跡IDの引き継ぎのみ)"""
+        if not self.enabled:
+            return
+        if len(self._pending) >= self._max_pending:
+            # 取り出されなかった要素(破棄・対象外)の蓄積を防ぐ
+            self._pending.pop(next(iter(self._pending)))
+        self._pending[id(item)] = (
+            item,
+            name,
+            time.perf_counter_ns(),
+            _current_flow.get(),
+        )
+
+    def dequeue(self, item: object) -> Optional[int]:
+        """キューからの取り出しを記録し、追跡IDを現在のタスクへ引き継ぐ"""
+        if not self.enabled:
+            return None
+
+        pending = self._pending.pop(id(item), None)
+        if pending is None or pending[0] is not item:
+            return None
+
+        _, name, start, flow = pending
+        if name:
+            self._queue_wait(name, start, time.perf_counter_ns(), flow)
+        _current_flow.set(flow)
+        return flow
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """区間毎の所要時間(ms) ※p50/p99 はサンプルからの推定値"""
+        result = {}
+        for name, durations in sorted(self._durations.items()):
+            ordered = sorted(durations.samples)
+            result[name] = {
+                "count": durations.count,
+                "mean_ms": durations.total / durations.count / 1e6,
+                "p50_ms": ordered[len(ordered) // 2] / 1e6,
+                "p99_ms": ordered[min(len(ordered) - 1, len(ordered) * 99 // 100)]
+                / 1e6,
+                "max_ms": durations.max / 1e6,
+            }
+        return result
+
+    def export(self, file_path: str):
+        metadata = [
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": 1,
+                "tid": tid,
+                "args": {"name": name},
+            }
+            for name, tid in self._lanes.items()
+        ]
+        with open(file_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"traceEvents": metadata + self._events, "displayTimeUnit": "ms"}, f
+            )
+
+    def _lane(self, name: str) -> int:
+        lane = self._lanes.get(name)
+        if lane is None:
+            lane = self._lanes[name] = len(self._lanes) + 1
+        return lane
+
+    def _us(self, ns: int) -> float:
+        return (ns - self._origin_ns) / 1000
+
+    def _add(self, name: str, start: int, end: int, events: list[dict[str, Any]]):
+        durations = self._durations.get(name)
+        if durations is None:
+            durations = self._durations[name] = _Durations(self._max_samples)
+        durations.add(end - start)
+        if len(self._events) + len(events) > self._max_events:
+            self.dropped += len(events)
+            return
+        self._events.extend(events)
+
+    def _complete(self, name: str, start: int, end: int, flow: Optional[int]):
+        self._add(
+            name,
+            start,
+            end,
+            [
+                {
+                    "name": name,
+                    "ph": "X",
+                    "ts": self._us(start),
+                    "dur": (end - start) / 1000,
+                    "pid": 1,
+                    "tid": self._lane(name),
+                    "args": {"flow": flow},
+                }
+            ],
+        )
+
+    def _queue_wait(self, name: str, start: int, end: int, flow: Optional[int]):
+        # 待機は複数フレームで重なるため非同期イベントとして出力
+        event = {
+            "name": name,
+            "cat": "queue",
+            "pid": 1,
+            "id": flow or next(self._flow_ids),
+        }
+        self._add(
+            name,
+            start,
+            end,
+            [
+                {**event, "ph": "b", "ts": self._us(start), "args": {"flow": flow}},
+                {**event, "ph": "e", "ts": self._us(end)},
+            ],
+        )
+
+
+TRACER = Tracer()
+"""既定の計測"""
@@ -0,0 +1,331 @@
+import os
+import mmap
+import time
+import struct
+from bisect import bisect_left
+import argparse
+from datetime import datetime
+from typing import BinaryIO, Final, Iterator, Optional, Protocol
+from dataclasses import dataclass
+
+from app.echonet.enet_data import EchonetData
+from app.echonet.protocol.eoj import EnetObject
+from app.echonet.protocol.protocol_rx import ProtocolRx
+
+DATA_SUFFIX: Final[str] = ".frames"
+INDEX_SUFFIX: Final[str] = ".idx"
+
+DATA_HEADER: Final[struct.Struct] = struct.Struct(">qI")
+"""データレコードヘッダ(受信日時ns, フレーム長) ※索引の再構築用"""
+
+INDEX_ENTRY: Final[struct.Struct] = struct.Struct(">qQI3sB16s")
+"""索引エントリ(受信日時ns, データ位置, フレーム長, SEOJ, ESV, EPC有無ビット 0x80~0xFF)"""
+
+_TIMESTAMP: Final[struct.Struct] = struct.Struct(">q")
+
+
+def _epc_bits(data: bytes) -> Optional[bytes]:
+    """フレームに含まれるEPCのビット列(EDTはデコードしない)"""
+    if len(data) < 12 or data[:2] != b"\x10\x81":
+        return None
+
+    bits = bytearray(16)
+    index = 12
+
+    for _ in range(data[11]):
+        if index + 2 > len(data):
+            return None
+
+        epc, pdc = data[index], data[index + 1]
+        if epc >= 0x80:
+            bits[(epc - 0x80) >> 3] |= 0x80 >> (epc & 0x07)
+        index += 2 + pdc
+
+    return bytes(bits)
+
+
+def _has_epc(bits: bytes, epc: int) -> bool:
+    return bool(bits[(epc - 0x80) >> 3] & (0x80 >> (epc & 0x07)))
+
+
+class FrameRecorder(Protocol):
+    """受信フレームの記録先"""
+
+    def append(self, data: bytes, timestamp: float = None) -> bool: ...
+
+    def close(self): ...
+
+
+@dataclass
+class ArchivedFrame:
+    """アーカイブ済みの受信フレーム"""
+
+    timestamp: float
+    """受信日時(UNIX秒)"""
+    src_eoj: bytes
+    """送信元ECHONETオブジェクト(3byte)"""
+    esv: int
+    """ECHONETサービス"""
+    data: bytes
+    """受信フレーム"""
+
+    def decode(self) -> Optional[EchonetData]:
+        return ProtocolRx.proc(self.data)
+
+
+class FrameArchiveWriter:
+    """受信フレームの追記型アーカイブ
+
+    フレーム本体(.frames)と固定長の索引(.idx)を追記する。
+    異常終了で索引とデータが食い違った場合は、開く際に索引を補完して整合を取る。
+    受信日時が前回より過去の場合(時刻補正等)は、索引の整列を保つため前回の日時で記録する。
+    """
+
+    def __init__(self, base_path: str, flush_interval: float = 1.0):
+        self._base_path: str = base_path
+        self._flush_interval: float = flush_interval
+        self._flushed_at: float = time.monotonic()
+
+        os.makedirs(os.path.dirname(base_path) or ".", exist_ok=True)
+        self._last_timestamp_ns: int = self._recover()
+
+        self._data: BinaryIO = open(base_path + DATA_SUFFIX, "ab")
+        self._index: BinaryIO = open(base_path + INDEX_SUFFIX, "ab")
+
+    def append(self, data: bytes, timestamp: float = None) -> bool:
+        """フレームを追記(ECHONET Liteフレームでない場合は追記せず False)"""
+        bits = _epc_bits(data)
+        if bits is None:
+            return False
+
+        timestamp_ns = int((timestamp or time.time()) * 1e9)
+        timestamp_ns = max(timestamp_ns, self._last_timestamp_ns)
+        self._last_timestamp_ns = timestamp_ns
+
+        offset = self._data.tell()
+        self._data.write(DATA_HEADER.pack(timestamp_ns, len(data)))
+        self._data.write(data)
+
+        self._index.write(
+            INDEX_ENTRY.pack(
+                timestamp_ns,
+                offset + DATA_HEADER.size,
+                len(data),
+                bytes(data[4:7]),
+                data[10],
+                bits,
+            )
+        )
+
+        if time.monotonic() - self._flushed_at >= self._flush_interval:
+            self.flush()
+
+        return True
+
+    def flush(self):
+        # 索引がデータより先に書き出されないよう、データから書き出す
+        self._data.flush()
+        self._index.flush()
+        self._flushed_at = time.monotonic()
+
+    def close(self):
+        if not self._data.closed:
+            self.flush()
+            self._data.close()
+            self._index.close()
+
+    def _recover(self) -> int:
+        """索引とデータの整合を取り、最終受信日時を返す
+
+        索引が欠けている場合はデータのレコードヘッダから再構築し、
+        書き込み途中のレコードは破棄する。
+        """
+        data_path = self._base_path + DATA_SUFFIX
+        index_path = self._base_path + INDEX_SUFFIX
+
+        if not os.path.exists(data_path):
+            open(index_path, "wb").close()
+            return 0
+
+        data_size = os.path.getsize(data_path)
+
+        with open(index_path, "ab+") as index:
+
+            def entry(position: int) -> tuple:
+                index.seek(position * INDEX_ENTRY.size)
+                return INDEX_ENTRY.unpack(index.read(INDEX_ENTRY.size))
+
+            # データ側の書き込みが失われた分(データ末尾より先を指す索引)は破棄
+            # ※データ位置は昇順のため、収まる最後のエントリを二分探索
+            lo, hi = 0, index.tell() // INDEX_ENTRY.size
+            while lo < hi:
+                mid = (lo + hi) // 2
+                _, offset, length, *_ = entry(mid)
+                if offset + length <= data_size:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            count = lo
+            index.truncate(count * INDEX_ENTRY.size)
+
+            last_timestamp_ns, end = 0, 0
+            if count:
+                last_timestamp_ns, offset, length, *_ = entry(count - 1)
+                end = offset + length
+
+            with open(data_path, "rb+") as data:
+                data.seek(end)
+
+                while True:
+                    header = data.read(DATA_HEADER.size)
+                    if len(header) < DATA_HEADER.size:
+                        break
+
+                    timestamp_ns, length = DATA_HEADER.unpack(header)
+                    frame = data.read(length)
+                    bits = _epc_bits(frame) if len(frame) == length else None
+                    if bits is None:
+                        break
+
+                    index.seek(0, os.SEEK_END)
+                    index.write(
+                        INDEX_ENTRY.pack(
+                            timestamp_ns,
+                            end + DATA_HEADER.size,
+                            length,
+                            frame[4:7],
+                            frame[10],
+                            bits,
+                        )
+                    )
+                    last_timestamp_ns = timestamp_ns
+                    end += DATA_HEADER.size + length
+
+                # end はデータ長以下のため縮小のみ(書き込み途中のレコードを破棄)
+                data.truncate(end)
+
+        return last_timestamp_ns
+
+
+class FrameArchive:
+    """受信フレームアーカイブの読み出し
+
+    索引・データとも mmap で参照し、受信日時は二分探索、EPCは索引のビット列で
+    絞り込むため、条件に一致したレコードのデータのみを読み出す。
+    """
+
+    def __init__(self, base_path: str):
+        self._base_path: str = base_path
+        self._index_file: Optional[BinaryIO] = None
+        self._data_file: Optional[BinaryIO] = None
+        self._index: Optional[mmap.mmap] = None
+        self._data: Optional[mmap.mmap] = None
+        self._count: int = 0
+
+        self.refresh()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __enter__(self) -> "FrameArchive":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def refresh(self):
+        """追記されたレコードを参照できるよう再マップ"""
+        self.close()
+
+        self._index_file = open(self._base_path + INDEX_SUFFIX, "rb")
+        self._data_file = open(self._base_path + DATA_SUFFIX, "rb")
+
+        index_size = os.fstat(self._index_file.fileno()).st_size
+        data_size = os.fstat(self._data_file.fileno()).st_size
+        self._count = index_size // INDEX_ENTRY.size
+
+        if self._count:
+            self._index = mmap.mmap(
+                self._index_file.fileno(), 0, access=mmap.ACCESS_READ
+            )
+        if data_size:
+            self._data = mmap.mmap(self._data_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        # データの書き出しが追いついていない末尾の索引は対象外
+        while self._count and self._entry_end(self._count - 1) > data_size:
+            self._count -= 1
+
+    def close(self):
+        for resource in (self._index, self._data, self._index_file, self._data_file):
+            if resource is not None:
+                resource.close()
+        self._index = self._data = self._index_file = self._data_file = None
+        self._count = 0
+
+    def query(
+        self,
+        start: float = None,
+        end: float = None,
+        epc: int = None,
+        src_eoj: EnetObject = None,
+    ) -> Iterator[ArchivedFrame]:
+        """条件に一致するフレームを受信順に返す(start 以上 end 未満)"""
+        first = self._bisect(start) if start is not None else 0
+        last = self._bisect(end) if end is not None else self._count
+        eoj = bytes(src_eoj.encode()) if src_eoj is not None else None
+
+        for position in range(first, last):
+            timestamp_ns, offset, length, seoj, esv, bits = INDEX_ENTRY.unpack_from(
+                self._index, position * INDEX_ENTRY.size
+            )
+
+            if epc is not None and not _has_epc(bits, epc):
+                continue
+            if eoj is not None and seoj != eoj:
+                continue
+
+            yield ArchivedFrame(
+                timestamp=timestamp_ns / 1e9,
+                src_eoj=seoj,
+                esv=esv,
+                data=self._data[offset : offset + length],
+            )
+
+    def _bisect(self, timestamp: float) -> int:
+        timestamp_ns = int(timestamp * 1e9)
+        return bisect_left(range(self._count), timestamp_ns, key=self._timestamp_at)
+
+    def _timestamp_at(self, position: int) -> int:
+        return _TIMESTAMP.unpack_from(self._index, position * INDEX_ENTRY.size)[0]
+
+    def _entry_end(self, position: int) -> int:
+        _, offset, length, *_ = INDEX_ENTRY.unpack_from(
+            self._index, position * INDEX_ENTRY.size
+        )
+        return offset + length
+
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(description="Query a frame archive")
+    parser.add_argument("base_path", help="archive path without suffix")
+    parser.add_argument("--epc", type=lambda v: int(v, 16), help="EPC (hex)")
+    parser.add_argument("--start", type=datetime.fromisoformat)
+    parser.add_argument("--end", type=datetime.fromisoformat)
+    args = parser.parse_args(argv)
+
+    with FrameArchive(args.base_path) as archive:
+        for frame in archive.query(
+            start=args.start.timestamp() if args.start else None,
+            end=args.end.timestamp() if args.end else None,
+            epc=args.epc,
+        ):
+            enet_data = frame.decode()
+            for prop in enet_data.properties if enet_data else ():
+                if args.epc is None or prop.code == args.epc:
+                    print(
+                        f"{datetime.fromtimestamp(frame.timestamp).isoformat()} {prop}"
+                    )
+
+
+if __name__ == "__main__":
+    main()
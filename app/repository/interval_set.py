@@ -0,0 +1,78 @@
+from bisect import bisect_left, bisect_right
+from typing import Iterator
+
+
+class IntervalSet:
+    """半開区間 [start, end) の集合
+
+    区間は開始順に保持し、重なる・隣接する区間は追加時に結合する。
+    所属判定・区間の追加は二分探索で O(log n)(n は区間数)。
+    欠測がなければ区間は1つに収束するため、保持するコマ数によらず小さい。
+    """
+
+    def __init__(self):
+        self._starts: list[float] = []
+        """区間の開始(昇順)"""
+        self._ends: list[float] = []
+        """区間の終了(昇順)"""
+
+    def __len__(self) -> int:
+        """区間数"""
+        return len(self._starts)
+
+    def __iter__(self) -> Iterator[tuple[float, float]]:
+        return zip(self._starts, self._ends)
+
+    def __contains__(self, point: float) -> bool:
+        index = bisect_right(self._starts, point) - 1
+        return index >= 0 and point < self._ends[index]
+
+    def add(self, start: float, end: float) -> bool:
+        """区間を追加し、新たに含まれる範囲があれば True を返す"""
+        if start >= end:
+            return False
+
+        # 終了が start 以上の最初の区間から、開始が end 以下の最後の区間までを結合
+        lo = bisect_left(self._ends, start)
+        hi = bisect_right(self._starts, end)
+
+        if lo < hi and self._starts[lo] <= start and end <= self._ends[lo]:
+            return False
+
+        if lo < hi:
+            start = min(start, self._starts[lo])
+            end = max(end, self._ends[hi - 1])
+
+        self._starts[lo:hi] = [start]
+        self._ends[lo:hi] = [end]
+        return True
+
+    def discard_before(self, point: float):
+        """point より前の範囲を除く(保持期間外の区間の破棄用)"""
+        index = bisect_right(self._ends, point)
+        del self._starts[:index]
+        del self._ends[:index]
+        if self._starts and self._starts[0] < point:
+            self._starts[0] = point
+
+    def covers(self, start: float, end: float) -> bool:
+        """[start, end) 全体が含まれるか"""
+        index = bisect_right(self._starts, start) - 1
+        return index >= 0 and end <= self._ends[index]
+
+    def gaps(self, start: float, end: float) -> list[tuple[float, float]]:
+        """[start, end) のうち含まれない区間の一覧"""
+        gaps = []
+        cursor = start
+
+        for index in range(bisect_right(self._ends, start), len(self._starts)):
+            if self._starts[index] >= end:
+                break
+            if self._starts[index] > cursor:
+                gaps.append((cursor, self._starts[index]))
+            cursor = max(cursor, self._ends[index])
+
+        if cursor < end:
+            gaps.append((cursor, end))
+
+        return gaps
@@ -1,3 +1,4 @@
+import os
 import re
 import json
 import dataclasses
@@ -21,8 +22,13 @@ class JsonSerializable:
         json_str = json.dumps(data, indent=4)
 
         if file_path:
-            with open(file_path, "w", encoding="utf-8") as f:
+            # 書き込み途中での中断に備え一時ファイル経由で置換
+            tmp_path = f"{file_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
                 f.write(json_str)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, file_path)
 
         return json_str
 
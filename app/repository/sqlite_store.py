@@ -0,0 +1,305 @@
+import json
+import time
+import queue
+import logging
+import sqlite3
+import threading
+from concurrent.futures import Future
+from typing import Final, Iterator, Optional, Union
+from dataclasses import dataclass
+
+from app.metering.reading import Reading
+from app.metrics.registry import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+SCHEMA: Final[str] = """
+CREATE TABLE IF NOT EXISTS readings (
+    meter TEXT NOT NULL,
+    epc INTEGER NOT NULL,
+    timestamp REAL NOT NULL,
+    eoj TEXT NOT NULL,
+    name TEXT NOT NULL,
+    value TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS readings_meter_epc_timestamp
+    ON readings (meter, epc, timestamp);
+
+CREATE TABLE IF NOT EXISTS frames (
+    meter TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS frames_meter_timestamp ON frames (meter, timestamp);
+
+CREATE TABLE IF NOT EXISTS state (
+    meter TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (meter, key)
+);
+"""
+"""計測値(meter, EPC, 受信日時で索引)・受信フレーム・メーター毎の状態"""
+
+ROWS_WRITTEN = REGISTRY.counter(
+    "sqlite_rows_written_total", "Rows committed to SQLite", ("table",)
+)
+ROWS_DROPPED = REGISTRY.counter(
+    "sqlite_rows_dropped_total", "Rows dropped because the write queue was full"
+)
+BATCH_SECONDS = REGISTRY.histogram(
+    "sqlite_batch_seconds", "Time to commit one batch transaction"
+)
+
+
+@dataclass
+class _FrameRow:
+    meter: str
+    timestamp: float
+    data: bytes
+
+
+@dataclass
+class _StateRow:
+    meter: str
+    key: str
+    value: str
+    done: Future
+
+
+_Row = Union[Reading, _FrameRow, _StateRow]
+
+
+class SqliteStore:
+    """計測値・受信フレーム・状態の SQLite 保存(WALモード)
+
+    書き込みは専用スレッドで行い、batch_size 件または flush_interval 秒毎に
+    1トランザクションでまとめて確定する。write() はイベントループを停止させず、
+    キューが満杯の場合は破棄して dropped に計上する。
+    読み出しは別接続で行うため、書き込み中でも待たされない。
+    出力先(Sink)としてそのまま forward_readings() に渡せる。
+    """
+
+    def __init__(
+        self,
+        file_path: str,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        max_queue: int = 100_000,
+    ):
+        self._file_path: str = file_path
+        self._batch_size: int = batch_size
+        self._flush_interval: float = flush_interval
+
+        self._queue: queue.Queue[Optional[_Row]] = queue.Queue(max_queue)
+        self._thread: Optional[threading.Thread] = None
+
+        self._reader: Optional[sqlite3.Connection] = None
+        self._reader_lock: threading.Lock = threading.Lock()
+
+        # スキーマは起動時に同期的に作成(読み出しを書き込みスレッドの開始前から可能にする)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+        conn.close()
+
+        self.dropped: int = 0
+        """キュー満杯で破棄した件数"""
+
+    def start(self):
+        if self._thread is not None:
+            return
+
+        self._thread = threading.Thread(
+            target=self._proc_write, name="SqliteStore", daemon=True
+        )
+        self._thread.start()
+
+    def write(self, reading: Reading):
+        self._put(reading)
+
+    def write_frame(self, meter: str, data: bytes, timestamp: float = None):
+        self._put(_FrameRow(meter, timestamp or time.time(), data))
+
+    def set_state(self, meter: str, key: str, value: str) -> Future:
+        """状態を保存(確定すると完了する Future を返す)"""
+        done = Future()
+        # 状態は破棄できないため満杯でも待機して投入
+        self._queue.put(_StateRow(meter, key, value, done))
+        return done
+
+    def get_state(self, meter: str, key: str) -> Optional[str]:
+        row = self._read(
+            "SELECT value FROM state WHERE meter = ? AND key = ?", (meter, key)
+        )
+        return row[0][0] if row else None
+
+    def state(self, meter: str) -> "MeterState":
+        return MeterState(self, meter)
+
+    def frame_writer(self, meter: str) -> "SqliteFrameWriter":
+        return SqliteFrameWriter(self, meter)
+
+    def query_readings(
+        self,
+        meter: str,
+        epc: int,
+        start: float = None,
+        end: float = None,
+        limit: int = None,
+    ) -> list[Reading]:
+        """計測値を受信順に返す(start 以上 end 未満)"""
+        sql = "SELECT meter, timestamp, eoj, epc, name, value FROM readings"
+        sql += " WHERE meter = ? AND epc = ? AND timestamp >= ? AND timestamp < ?"
+        sql += " ORDER BY timestamp"
+        params = [meter, epc, start or 0.0, end or float("inf")]
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        return [
+            Reading(meter, timestamp, eoj, epc, name, json.loads(value))
+            for meter, timestamp, eoj, epc, name, value in self._read(sql, params)
+        ]
+
+    def query_frames(
+        self, meter: str, start: float = None, end: float = None
+    ) -> Iterator[tuple[float, bytes]]:
+        """受信フレーム(受信日時, フレーム)を受信順に返す(start 以上 end 未満)"""
+        yield from self._read(
+            "SELECT timestamp, data FROM frames"
+            " WHERE meter = ? AND timestamp >= ? AND timestamp < ?"
+            " ORDER BY timestamp",
+            (meter, start or 0.0, end or float("inf")),
+        )
+
+    def close(self, timeout: float = None):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+        with self._reader_lock:
+            if self._reader is not None:
+                self._reader.close()
+                self._reader = None
+
+    def _put(self, row: _Row):
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self.dropped += 1
+            ROWS_DROPPED.labels().inc()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self._file_path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # WALでは NORMAL でも破損はせず、電源断時に直近のトランザクションのみ失われる
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _read(self, sql: str, params) -> list[tuple]:
+        with self._reader_lock:
+            if self._reader is None:
+                self._reader = self._connect()
+            return self._reader.execute(sql, params).fetchall()
+
+    def _proc_write(self):
+        conn = self._connect()
+        running = True
+
+        try:
+            while running:
+                batch: list[_Row] = []
+                deadline = time.monotonic() + self._flush_interval
+
+                while len(batch) < self._batch_size:
+                    try:
+                        row = self._queue.get(
+                            timeout=max(0.0, deadline - time.monotonic())
+                        )
+                    except queue.Empty:
+                        break
+
+                    if row is None:
+                        running = False
+                        break
+
+                    batch.append(row)
+
+                if batch:
+                    self._write_batch(conn, batch)
+        finally:
+            conn.close()
+
+    def _write_batch(self, conn: sqlite3.Connection, batch: list[_Row]):
+        readings = [row for row in batch if isinstance(row, Reading)]
+        frames = [row for row in batch if isinstance(row, _FrameRow)]
+        states = [row for row in batch if isinstance(row, _StateRow)]
+
+        started = time.perf_counter()
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT INTO readings VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        (
+                            r.meter,
+                            r.epc,
+                            r.timestamp,
+                            r.eoj,
+                            r.name,
+                            json.dumps(r.value, ensure_ascii=False),
+                        )
+                        for r in readings
+                    ),
+                )
+                conn.executemany(
+                    "INSERT INTO frames VALUES (?, ?, ?)",
+                    ((f.meter, f.timestamp, f.data) for f in frames),
+                )
+                conn.executemany(
+                    "INSERT OR REPLACE INTO state VALUES (?, ?, ?, ?)",
+                    ((s.meter, s.key, s.value, time.time()) for s in states),
+                )
+        except sqlite3.Error as e:
+            logger.error("SQLite write failed: %s", e, extra={"rows": len(batch)})
+            for state in states:
+                state.done.set_exception(e)
+            return
+
+        BATCH_SECONDS.labels().observe(time.perf_counter() - started)
+        ROWS_WRITTEN.labels(table="readings").inc(len(readings))
+        ROWS_WRITTEN.labels(table="frames").inc(len(frames))
+        ROWS_WRITTEN.labels(table="state").inc(len(states))
+        for state in states:
+            state.done.set_result(None)
+
+
+class MeterState:
+    """メーター1台分の状態(EPAN等)の保存先"""
+
+    def __init__(self, store: SqliteStore, meter: str):
+        self._store: SqliteStore = store
+        self._meter: str = meter
+
+    def get(self, key: str) -> Optional[str]:
+        return self._store.get_state(self._meter, key)
+
+    def set(self, key: str, value: str) -> Future:
+        return self._store.set_state(self._meter, key, value)
+
+
+class SqliteFrameWriter:
+    """受信フレームの記録先(FrameArchiveWriter と同じ append/close)"""
+
+    def __init__(self, store: SqliteStore, meter: str):
+        self._store: SqliteStore = store
+        self._meter: str = meter
+
+    def append(self, data: bytes, timestamp: float = None) -> bool:
+        self._store.write_frame(self._meter, data, timestamp)
+        return True
+
+    def close(self):
+        """ストア全体の終了は所有者が行う"""
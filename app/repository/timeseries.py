@@ -0,0 +1,284 @@
+import math
+import time
+from array import array
+from enum import StrEnum
+from typing import Final, Optional
+
+from app.echonet.property.property import Property
+from app.echonet.property.home_equipment_device.low_voltage_smart_pm import (
+    LowVoltageSmartPm,
+)
+from app.repository.interval_set import IntervalSet
+
+
+class Series(StrEnum):
+    """計測値系列"""
+
+    MOMENT_POWER = "moment_power_w"
+    """瞬時電力計測値(W)"""
+    MOMENT_CURRENT_R = "moment_current_r_a"
+    """瞬時電流計測値 R相(A)"""
+    MOMENT_CURRENT_T = "moment_current_t_a"
+    """瞬時電流計測値 T相(A)"""
+    CUMULATIVE_ENERGY_NORMAL = "cumulative_energy_normal_kwh"
+    """積算電力量計測値 正方向(kWh)"""
+    CUMULATIVE_ENERGY_REVERSE = "cumulative_energy_reverse_kwh"
+    """積算電力量計測値 逆方向(kWh)"""
+    INTERVAL_ENERGY_NORMAL = "interval_energy_normal_kwh"
+    """30分毎の積算電力量計測値 正方向(kWh)"""
+    INTERVAL_ENERGY_REVERSE = "interval_energy_reverse_kwh"
+    """30分毎の積算電力量計測値 逆方向(kWh)"""
+    ONE_MINUTE_ENERGY_NORMAL = "one_minute_energy_normal_kwh"
+    """1分毎の積算電力量計測値 正方向(kWh)"""
+    ONE_MINUTE_ENERGY_REVERSE = "one_minute_energy_reverse_kwh"
+    """1分毎の積算電力量計測値 逆方向(kWh)"""
+
+
+SERIES_STEPS: Final[dict[str, float]] = {
+    Series.INTERVAL_ENERGY_NORMAL: 30 * 60,
+    Series.INTERVAL_ENERGY_REVERSE: 30 * 60,
+    Series.ONE_MINUTE_ENERGY_NORMAL: 60,
+    Series.ONE_MINUTE_ENERGY_REVERSE: 60,
+}
+"""計測時刻(コマ)を持つ系列のコマ間隔(秒)"""
+
+
+class RingBuffer:
+    """固定長時系列リングバッファ
+
+    タイムスタンプ(UNIX秒)と値を型付き配列に保持する。
+    追加はO(1)、時刻範囲の切り出しはタイムスタンプ列の二分探索で行う。
+    欠測値はNaNとして保持する。
+    """
+
+    def __init__(self, capacity: int, typecode: str = "d"):
+        if capacity <= 0:
+            raise ValueError("capacity must be greater than 0.")
+
+        self._capacity: int = capacity
+        self._timestamps: array = array("d", bytes(8 * capacity))
+        """タイムスタンプ列"""
+        self._values: array = array(typecode, [0]) * capacity
+        """値列"""
+        self._head: int = 0
+        """最古データの位置"""
+        self._size: int = 0
+        """格納数"""
+
+    @property
+    def capacity(self) -> int:
+        """容量"""
+        return self._capacity
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, timestamp: float, value: Optional[float]):
+        if self._size and timestamp < self._timestamps[self._physical(self._size - 1)]:
+            raise ValueError("timestamp must not be older than the latest entry.")
+
+        if self._size < self._capacity:
+            index = self._physical(self._size)
+            self._size += 1
+        else:
+            # 満杯時は最古データを上書き
+            index = self._head
+            self._head = (self._head + 1) % self._capacity
+
+        self._timestamps[index] = timestamp
+        self._values[index] = math.nan if value is None else value
+
+    def insert(self, timestamp: float, value: Optional[float]):
+        """時刻順を保って追加(同一時刻は上書き)
+
+        過去データの補完用。挿入位置以降の要素を移動するためO(n)
+        """
+        latest = self.latest()
+        if latest is None or timestamp > latest[0]:
+            self.append(timestamp, value)
+            return
+
+        value = math.nan if value is None else value
+        position = self._bisect_left(timestamp)
+
+        if self._timestamps[self._physical(position)] == timestamp:
+            self._values[self._physical(position)] = value
+            return
+
+        if self._size < self._capacity:
+            # 挿入位置以降を1つ後ろへ移動
+            for logical in range(self._size, position, -1):
+                self._move(logical - 1, logical)
+            self._size += 1
+        else:
+            # 満杯時は最古データを破棄し、挿入位置より前を1つ前へ移動
+            if position == 0:
+                return
+            position -= 1
+            for logical in range(position):
+                self._move(logical + 1, logical)
+
+        index = self._physical(position)
+        self._timestamps[index] = timestamp
+        self._values[index] = value
+
+    def latest(self) -> Optional[tuple[float, float]]:
+        """最新データ(タイムスタンプ, 値)"""
+        if not self._size:
+            return None
+        index = self._physical(self._size - 1)
+        return self._timestamps[index], self._values[index]
+
+    def range(self, start: float, end: float) -> tuple[array, array]:
+        """start <= timestamp < end のデータを(タイムスタンプ列, 値列)で返す"""
+        lo = self._bisect_left(start)
+        hi = self._bisect_left(end)
+        return self._slice(self._timestamps, lo, hi), self._slice(self._values, lo, hi)
+
+    def _physical(self, logical: int) -> int:
+        return (self._head + logical) % self._capacity
+
+    def _move(self, src: int, dst: int):
+        src_index = self._physical(src)
+        dst_index = self._physical(dst)
+        self._timestamps[dst_index] = self._timestamps[src_index]
+        self._values[dst_index] = self._values[src_index]
+
+    def _bisect_left(self, timestamp: float) -> int:
+        lo, hi = 0, self._size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._timestamps[self._physical(mid)] < timestamp:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _slice(self, column: array, lo: int, hi: int) -> array:
+        if lo >= hi:
+            return column[0:0]
+
+        start = self._physical(lo)
+        stop = self._physical(hi - 1) + 1
+
+        if start < stop:
+            return column[start:stop]
+
+        # 折り返し位置を跨ぐ場合は2区間を連結
+        return column[start:] + column[:stop]
+
+
+class TimeSeriesStore:
+    """系列毎のリングバッファを保持するメモリ内時系列ストア"""
+
+    DEFAULT_CAPACITY: Final[int] = 24 * 60 * 60
+    """既定容量(1秒周期で24時間分)"""
+
+    def __init__(self, capacities: dict[str, int] = None):
+        self._capacities: dict[str, int] = capacities or {}
+        self._buffers: dict[str, RingBuffer] = {}
+        self._coverage: dict[str, IntervalSet] = {}
+        """コマを持つ系列の格納済み区間(欠測の検出用)"""
+
+        self._coefficient: Optional[int] = None
+        """係数(0xD3)"""
+        self._unit_multiplier: Optional[float] = None
+        """積算電力量単位の倍率(0xE1)"""
+
+    def series(self, name: str) -> RingBuffer:
+        buffer = self._buffers.get(name)
+        if buffer is None:
+            buffer = RingBuffer(self._capacities.get(name, self.DEFAULT_CAPACITY))
+            self._buffers[name] = buffer
+        return buffer
+
+    def coverage(self, name: str) -> IntervalSet:
+        """格納済みのコマの区間(コマを持つ系列のみ、リングバッファから破棄済みの分を含む)"""
+        coverage = self._coverage.get(name)
+        if coverage is None:
+            coverage = IntervalSet()
+            self._coverage[name] = coverage
+        return coverage
+
+    def gaps(self, name: str, start: float, end: float) -> list[tuple[float, float]]:
+        """[start, end) のうちコマが格納されていない区間"""
+        return self.coverage(name).gaps(start, end)
+
+    def record(self, name: str, timestamp: float, value: Optional[float]):
+        buffer = self.series(name)
+        latest = buffer.latest()
+        if latest is None or timestamp >= latest[0]:
+            buffer.append(timestamp, value)
+        else:
+            # 時計の巻き戻り(NTP補正等)で最新より古い場合も例外とせず時刻順に挿入
+            buffer.insert(timestamp, value)
+        self._cover(name, timestamp)
+
+    def insert(self, name: str, timestamp: float, value: Optional[float]):
+        """過去データを時刻順に挿入(履歴補完用)"""
+        self.series(name).insert(timestamp, value)
+        self._cover(name, timestamp)
+
+    def _cover(self, name: str, timestamp: float):
+        step = SERIES_STEPS.get(name)
+        if step is not None:
+            self.coverage(name).add(timestamp, timestamp + step)
+
+    def ingest(self, prop: Property, timestamp: float = None):
+        """受信プロパティを対応する系列に格納"""
+        if timestamp is None:
+            timestamp = time.time()
+
+        match prop:
+            case LowVoltageSmartPm.MomentPower():
+                self.record(Series.MOMENT_POWER, timestamp, prop.value)
+            case LowVoltageSmartPm.MomentCurrent():
+                self.record(Series.MOMENT_CURRENT_R, timestamp, prop.r_phase)
+                self.record(Series.MOMENT_CURRENT_T, timestamp, prop.t_phase)
+            case LowVoltageSmartPm.Coefficient():
+                self._coefficient = prop.value
+            case LowVoltageSmartPm.CumulativeEnergyUnit():
+                self._unit_multiplier = prop.multiplier
+            case LowVoltageSmartPm.CumulativeEnergyMeasurementNormalDir():
+                self._record_energy(
+                    Series.CUMULATIVE_ENERGY_NORMAL, timestamp, prop.value
+                )
+            case LowVoltageSmartPm.CumulativeEnergyMeasurementReverseDir():
+                self._record_energy(
+                    Series.CUMULATIVE_ENERGY_REVERSE, timestamp, prop.value
+                )
+            case LowVoltageSmartPm.IntCumulativeEnergyNormalDir():
+                self._record_energy(
+                    Series.INTERVAL_ENERGY_NORMAL,
+                    prop.timestamp.timestamp(),
+                    prop.value,
+                )
+            case LowVoltageSmartPm.IntCumulativeEnergyReverseDir():
+                self._record_energy(
+                    Series.INTERVAL_ENERGY_REVERSE,
+                    prop.timestamp.timestamp(),
+                    prop.value,
+                )
+            case LowVoltageSmartPm.OneMinuteCumulativeEnergy():
+                self._record_energy(
+                    Series.ONE_MINUTE_ENERGY_NORMAL,
+                    prop.timestamp.timestamp(),
+                    prop.forward_energy,
+                )
+                self._record_energy(
+                    Series.ONE_MINUTE_ENERGY_REVERSE,
+                    prop.timestamp.timestamp(),
+                    prop.reverse_energy,
+                )
+
+    def _record_energy(self, name: str, timestamp: float, raw: Optional[int]):
+        # 単位(0xE1)未取得の間は換算できないため格納しない
+        if self._unit_multiplier is None:
+            return
+
+        value = None
+        if raw is not None:
+            value = raw * (self._coefficient or 1) * self._unit_multiplier
+
+        # 定時積算値は同一時刻の再送や履歴補完との前後があるため挿入で格納
+        self.insert(name, timestamp, value)
@@ -0,0 +1,194 @@
+import os
+import csv
+import gzip
+import json
+import time
+import queue
+import shutil
+import logging
+import threading
+from enum import StrEnum
+from datetime import datetime
+from typing import IO, Final, Optional
+
+from app.metering.reading import Reading
+
+logger = logging.getLogger(__name__)
+
+CSV_COLUMNS: Final[list[str]] = ["meter", "timestamp", "eoj", "epc", "name", "value"]
+
+
+class FileFormat(StrEnum):
+    """出力形式"""
+
+    CSV = "csv"
+    JSONL = "jsonl"
+
+
+class RotatingFileSink:
+    """計測値のファイル出力(サイズ・時間でローテーション)
+
+    書き込みは専用スレッドでまとめて行うため、write()はイベントループを停止させない。
+    キューが満杯の場合は計測値を破棄し、dropped に計上する。
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        prefix: str = "readings",
+        file_format: FileFormat = FileFormat.JSONL,
+        max_bytes: Optional[int] = 64 * 1024 * 1024,
+        max_age: Optional[float] = 24 * 60 * 60,
+        compress: bool = False,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        max_queue: int = 100_000,
+    ):
+        self._directory: str = directory
+        self._prefix: str = prefix
+        self._file_format: FileFormat = file_format
+        self._max_bytes: Optional[int] = max_bytes
+        """ローテーションするファイルサイズ(byte)"""
+        self._max_age: Optional[float] = max_age
+        """ローテーションするファイル経過時間(秒)"""
+        self._compress: bool = compress
+        """ローテーション時にgzip圧縮"""
+        self._batch_size: int = batch_size
+        self._flush_interval: float = flush_interval
+
+        self._queue: queue.Queue[Optional[Reading]] = queue.Queue(max_queue)
+        self._thread: Optional[threading.Thread] = None
+
+        self._file: Optional[IO[str]] = None
+        self._file_path: Optional[str] = None
+        self._file_opened_at: float = 0.0
+        self._csv_writer = None
+
+        self.dropped: int = 0
+        """キュー満杯で破棄した件数"""
+
+    def start(self):
+        if self._thread is not None:
+            return
+
+        os.makedirs(self._directory, exist_ok=True)
+        self._thread = threading.Thread(
+            target=self._proc_write, name="RotatingFileSink", daemon=True
+        )
+        self._thread.start()
+
+    def write(self, reading: Reading):
+        try:
+            self._queue.put_nowait(reading)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self, timeout: float = None):
+        if self._thread is None:
+            return
+
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _proc_write(self):
+        running = True
+
+        while running:
+            batch = []
+            deadline = time.monotonic() + self._flush_interval
+
+            while len(batch) < self._batch_size:
+                try:
+                    reading = self._queue.get(
+                        timeout=max(0.0, deadline - time.monotonic())
+                    )
+                except queue.Empty:
+                    break
+
+                if reading is None:
+                    running = False
+                    break
+
+                batch.append(reading)
+
+            try:
+                if batch:
+                    self._write_batch(batch)
+                elif self._file and self._should_rotate():
+                    self._rotate()
+            except OSError as e:
+                logger.error("Export write failed: %s", e)
+
+        self._close_file()
+
+    def _write_batch(self, batch: list[Reading]):
+        if self._file is None or self._should_rotate():
+            self._rotate()
+
+        match self._file_format:
+            case FileFormat.CSV:
+                self._csv_writer.writerows(
+                    [
+                        reading.meter,
+                        reading.timestamp,
+                        reading.eoj,
+                        f"0x{reading.epc:02X}",
+                        reading.name,
+                        json.dumps(reading.value, ensure_ascii=False),
+                    ]
+                    for reading in batch
+                )
+            case FileFormat.JSONL:
+                self._file.write(
+                    "".join(
+                        json.dumps(reading.to_dict(), ensure_ascii=False) + "\n"
+                        for reading in batch
+                    )
+                )
+
+        self._file.flush()
+
+    def _should_rotate(self) -> bool:
+        if self._max_bytes is not None and self._file.tell() >= self._max_bytes:
+            return True
+        if (
+            self._max_age is not None
+            and time.monotonic() - self._file_opened_at >= self._max_age
+        ):
+            return True
+        return False
+
+    def _rotate(self):
+        self._close_file()
+
+        name = f"{self._prefix}-{datetime.now():%Y%m%d-%H%M%S}"
+        path = os.path.join(self._directory, f"{name}.{self._file_format}")
+
+        index = 1
+        while os.path.exists(path) or os.path.exists(f"{path}.gz"):
+            path = os.path.join(self._directory, f"{name}-{index}.{self._file_format}")
+            index += 1
+
+        self._file = open(path, "w", encoding="utf-8", newline="")
+        self._file_path = path
+        self._file_opened_at = time.monotonic()
+
+        if self._file_format == FileFormat.CSV:
+            self._csv_writer = csv.writer(self._file)
+            self._csv_writer.writerow(CSV_COLUMNS)
+
+    def _close_file(self):
+        if self._file is None:
+            return
+
+        self._file.close()
+        self._file = None
+
+        if self._compress:
+            with (
+                open(self._file_path, "rb") as src,
+                gzip.open(f"{self._file_path}.gz", "wb") as dst,
+            ):
+                shutil.copyfileobj(src, dst)
+            os.remove(self._file_path)
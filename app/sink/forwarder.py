@@ -0,0 +1,37 @@
+from asyncio import Queue
+from typing import Optional, Protocol
+
+from app.echonet.enet_data import EchonetData
+from app.metering.dedup import ReadingDeduplicator
+from app.metering.reading import Reading
+
+
+class Sink(Protocol):
+    """計測値の出力先(write はブロックしないこと)"""
+
+    def start(self): ...
+
+    def write(self, reading: Reading): ...
+
+    def close(self): ...
+
+
+async def forward_readings(
+    subscription: Queue[EchonetData],
+    sinks: list[Sink],
+    meter: str = "default",
+    checkpoint_path: Optional[str] = None,
+):
+    """Echonet.subscribe() の受信データを計測値に変換して各出力先へ渡す
+
+    積算電力量は計測時刻のコマ毎に変換し、出力済みのコマ(履歴の再取得・
+    定時積算との重複)は出力しない。checkpoint_path 指定時は再起動を跨いで判定する。
+    """
+    deduplicator = ReadingDeduplicator(meter, checkpoint_path=checkpoint_path)
+
+    while True:
+        enet_data = await subscription.get()
+
+        for reading in deduplicator.readings(enet_data):
+            for sink in sinks:
+                sink.write(reading)
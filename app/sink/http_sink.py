@@ -0,0 +1,150 @@
+import json
+import logging
+import urllib.error
+import urllib.parse
+import urllib.request
+from typing import Any, Iterator, Optional
+
+from app.metering.reading import Reading
+from app.sink.network_sink import NetworkSink, SinkError
+
+logger = logging.getLogger(__name__)
+
+
+class HttpPostSink(NetworkSink):
+    """HTTP POST による転送(JSON配列)"""
+
+    CONTENT_TYPE: str = "application/json"
+
+    def __init__(
+        self,
+        url: str,
+        headers: Optional[dict[str, str]] = None,
+        timeout: float = 10.0,
+        name: str = "http",
+        **kwargs,
+    ):
+        super().__init__(name, **kwargs)
+        self._url: str = url
+        self._headers: dict[str, str] = headers or {}
+        self._timeout: float = timeout
+
+    def _encode(self, batch: list[Reading]) -> bytes:
+        return json.dumps(
+            [reading.to_dict() for reading in batch], ensure_ascii=False
+        ).encode()
+
+    def _send(self, batch: list[Reading]):
+        body = self._encode(batch)
+        if not body:
+            return
+
+        request = urllib.request.Request(
+            self._url,
+            data=body,
+            headers={"Content-Type": self.CONTENT_TYPE, **self._headers},
+            method="POST",
+        )
+
+        try:
+            with urllib.request.urlopen(request, timeout=self._timeout) as response:
+                response.read()
+        except urllib.error.HTTPError as e:
+            # 4xx はデータ側の問題のため再送しても成功しない
+            if 400 <= e.code < 500 and e.code not in (408, 429):
+                logger.error(
+                    "Sink rejected batch (%d), discarded",
+                    e.code,
+                    extra={"sink": self.name},
+                )
+                return
+            raise SinkError(f"HTTP {e.code}") from e
+        except (urllib.error.URLError, OSError) as e:
+            raise SinkError(str(e)) from e
+
+
+class InfluxLineSink(HttpPostSink):
+    """InfluxDB v2 書き込みAPI(ラインプロトコル)による転送
+
+    プロパティ値の数値・真偽値・文字列をフィールドとし、
+    メーター名・EOJ・EPC・プロパティ名をタグとする。履歴等の配列は対象外。
+    """
+
+    CONTENT_TYPE = "text/plain; charset=utf-8"
+
+    def __init__(
+        self,
+        url: str,
+        org: str,
+        bucket: str,
+        token: Optional[str] = None,
+        measurement: str = "echonet",
+        name: str = "influxdb",
+        **kwargs,
+    ):
+        query = urllib.parse.urlencode(
+            {"org": org, "bucket": bucket, "precision": "ms"}
+        )
+        headers = {"Authorization": f"Token {token}"} if token else {}
+
+        super().__init__(
+            f"{url.rstrip('/')}/api/v2/write?{query}",
+            headers=headers,
+            name=name,
+            **kwargs,
+        )
+        self._measurement: str = _escape_key(measurement)
+
+    def _encode(self, batch: list[Reading]) -> bytes:
+        lines = []
+
+        for reading in batch:
+            fields = ",".join(
+                f"{_escape_key(key)}={_field_value(value)}"
+                for key, value in _flatten(reading.value)
+            )
+            if not fields:
+                continue
+
+            tags = (
+                f"meter={_escape_key(reading.meter)},eoj={reading.eoj},"
+                f"epc={reading.epc:02X},name={_escape_key(reading.name)}"
+            )
+            lines.append(
+                f"{self._measurement},{tags} {fields} {int(reading.timestamp * 1000)}"
+            )
+
+        return "\n".join(lines).encode()
+
+
+def _flatten(value: dict[str, Any], prefix: str = "") -> Iterator[tuple[str, Any]]:
+    for key, item in value.items():
+        match item:
+            case dict():
+                yield from _flatten(item, f"{prefix}{key}.")
+            case None | list():
+                continue
+            case _:
+                yield f"{prefix}{key}", item
+
+
+def _escape_key(key: str) -> str:
+    return (
+        key.replace("\\", "\\\\")
+        .replace(",", "\\,")
+        .replace("=", "\\=")
+        .replace(" ", "\\ ")
+    )
+
+
+def _field_value(value: Any) -> str:
+    match value:
+        case bool():
+            return "true" if value else "false"
+        case int():
+            return f"{value}i"
+        case float():
+            return repr(value)
+        case _:
+            escaped = str(value).replace("\\", "\\\\").replace('"', '\\"')
+            return f'"{escaped}"'
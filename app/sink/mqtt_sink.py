@@ -0,0 +1,82 @@
+import json
+from typing import Optional
+
+from app.metering.reading import Reading
+from app.sink.network_sink import NetworkSink, SinkError
+
+# MQTTブローカーへの転送は任意機能のため、paho-mqtt が無い環境でも他の出力先は利用可能
+try:
+    import paho.mqtt.client as mqtt
+except ImportError:
+    mqtt = None
+
+
+def is_available() -> bool:
+    return mqtt is not None
+
+
+class MqttSink(NetworkSink):
+    """MQTTブローカーへの転送
+
+    計測値1件を1メッセージとし、{topic_prefix}/{meter}/{eoj}/{epc} へJSONで送信する。
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int = 1883,
+        topic_prefix: str = "echonet",
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        qos: int = 1,
+        timeout: float = 10.0,
+        name: str = "mqtt",
+        **kwargs,
+    ):
+        if mqtt is None:
+            raise ImportError(
+                "paho-mqtt is required for MQTT export. "
+                "Install it with the 'mqtt' extra."
+            )
+
+        super().__init__(name, **kwargs)
+        self._host: str = host
+        self._port: int = port
+        self._topic_prefix: str = topic_prefix.rstrip("/")
+        self._username: Optional[str] = username
+        self._password: Optional[str] = password
+        self._qos: int = qos
+        self._timeout: float = timeout
+        self._client = None
+
+    def _open(self):
+        self._client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+        if self._username:
+            self._client.username_pw_set(self._username, self._password)
+
+        # 接続・切断時の再接続は loop_start のスレッドが行う
+        self._client.connect_async(self._host, self._port)
+        self._client.loop_start()
+
+    def _close(self):
+        if self._client:
+            self._client.loop_stop()
+            self._client.disconnect()
+
+    def _send(self, batch: list[Reading]):
+        if self._client is None or not self._client.is_connected():
+            raise SinkError("Not connected")
+
+        messages = [
+            self._client.publish(
+                f"{self._topic_prefix}/{reading.meter}/{reading.eoj}/{reading.epc:02X}",
+                json.dumps(reading.to_dict(), ensure_ascii=False),
+                qos=self._qos,
+            )
+            for reading in batch
+        ]
+
+        for message in messages:
+            message.wait_for_publish(self._timeout)
+            if not message.is_published():
+                raise SinkError("Publish timeout")
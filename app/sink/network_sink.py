@@ -0,0 +1,270 @@
+import os
+import json
+import time
+import queue
+import random
+import logging
+import threading
+from typing import Optional
+
+from app.metering.reading import Reading
+from app.metrics.registry import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+SINK_SENT = REGISTRY.counter(
+    "sink_readings_sent_total", "Readings delivered by sink", ("sink",)
+)
+SINK_DROPPED = REGISTRY.counter(
+    "sink_readings_dropped_total",
+    "Readings discarded by sink",
+    ("sink", "reason"),
+)
+SINK_FAILURES = REGISTRY.counter(
+    "sink_send_failures_total", "Failed batch deliveries", ("sink",)
+)
+SINK_SPOOL_BYTES = REGISTRY.gauge(
+    "sink_spool_bytes", "Bytes spooled on disk waiting for retry", ("sink",)
+)
+
+
+class SinkError(Exception):
+    """送信先への送信失敗(再送対象)"""
+
+
+class NetworkSink:
+    """外部の時系列DB等への計測値転送(基底クラス)
+
+    送信は専用スレッドでまとめて行い、送信先に接続できない間は
+    バッチをディスクへ退避して指数バックオフで再送する。
+    メモリ上のキューとディスク退避量はいずれも上限を持ち、超過分は破棄する。
+    派生クラスは _send() でバッチ1件分を送信し、失敗時は SinkError を送出する。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        spool_dir: Optional[str] = None,
+        batch_size: int = 500,
+        flush_interval: float = 5.0,
+        max_queue: int = 100_000,
+        max_spool_bytes: int = 256 * 1024 * 1024,
+        initial_backoff: float = 1.0,
+        max_backoff: float = 300.0,
+    ):
+        self.name: str = name
+        self._spool_dir: Optional[str] = spool_dir
+        """退避先ディレクトリ(None の場合は退避せず破棄)"""
+        self._batch_size: int = batch_size
+        self._flush_interval: float = flush_interval
+        self._max_spool_bytes: int = max_spool_bytes
+        self._initial_backoff: float = initial_backoff
+        self._max_backoff: float = max_backoff
+
+        self._queue: queue.Queue[Optional[Reading]] = queue.Queue(max_queue)
+        self._thread: Optional[threading.Thread] = None
+
+        self._backoff: float = 0.0
+        """現在の再送間隔(0は正常)"""
+        self._retry_at: float = 0.0
+        """次回送信を試行する時刻(time.monotonic)"""
+
+        self._spool_files: list[str] = []
+        self._spool_bytes: int = 0
+        self._spool_seq: int = 0
+
+        self._sent = SINK_SENT.labels(sink=name)
+        self._failures = SINK_FAILURES.labels(sink=name)
+        self._dropped_full = SINK_DROPPED.labels(sink=name, reason="queue_full")
+        self._dropped_spool = SINK_DROPPED.labels(sink=name, reason="spool_full")
+        self._dropped_unsent = SINK_DROPPED.labels(sink=name, reason="send_failed")
+        SINK_SPOOL_BYTES.labels(sink=name).set_function(lambda: self._spool_bytes)
+
+        self.dropped: int = 0
+        """キュー満杯・退避量超過で破棄した件数"""
+
+    def start(self):
+        if self._thread is not None:
+            return
+
+        if self._spool_dir:
+            os.makedirs(self._spool_dir, exist_ok=True)
+            self._load_spool()
+
+        self._thread = threading.Thread(
+            target=self._proc_send,
+            name=f"{type(self).__name__}-{self.name}",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def write(self, reading: Reading):
+        try:
+            self._queue.put_nowait(reading)
+        except queue.Full:
+            self.dropped += 1
+            self._dropped_full.inc()
+
+    def close(self, timeout: float = None):
+        if self._thread is None:
+            return
+
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _open(self):
+        """送信スレッド開始時の接続処理(必要な派生クラスのみ)"""
+
+    def _close(self):
+        """送信スレッド終了時の切断処理(必要な派生クラスのみ)"""
+
+    def _send(self, batch: list[Reading]):
+        raise NotImplementedError()
+
+    def _proc_send(self):
+        try:
+            self._open()
+        except Exception as e:
+            logger.warning("Sink open failed: %s", e, extra={"sink": self.name})
+            self._fail()
+
+        running = True
+
+        while running:
+            batch = []
+            deadline = time.monotonic() + self._flush_interval
+
+            while len(batch) < self._batch_size:
+                try:
+                    reading = self._queue.get(
+                        timeout=max(0.0, deadline - time.monotonic())
+                    )
+                except queue.Empty:
+                    break
+
+                if reading is None:
+                    running = False
+                    break
+
+                batch.append(reading)
+
+            if batch and not self._try_send(batch):
+                self._spool(batch)
+
+            # 送信可能になれば退避分を古い順に再送
+            while self._spool_files and running and self._can_send():
+                if not self._resend_spool():
+                    break
+
+        self._close()
+
+    def _can_send(self) -> bool:
+        return time.monotonic() >= self._retry_at
+
+    def _try_send(self, batch: list[Reading]) -> bool:
+        if not self._can_send():
+            return False
+
+        # 退避中のデータを追い越さないよう、退避分がある間は新しいバッチも退避する
+        if self._spool_files:
+            return False
+
+        try:
+            self._send(batch)
+        except Exception as e:
+            logger.warning("Sink send failed: %s", e, extra={"sink": self.name})
+            self._fail()
+            return False
+
+        self._succeed(len(batch))
+        return True
+
+    def _succeed(self, count: int):
+        self._sent.inc(count)
+        self._backoff = 0.0
+        self._retry_at = 0.0
+
+    def _fail(self):
+        self._failures.inc()
+        self._backoff = min(
+            self._max_backoff,
+            self._backoff * 2 if self._backoff else self._initial_backoff,
+        )
+        # 複数ゲートウェイからの再送が同時刻に集中しないよう揺らぎを加える
+        self._retry_at = time.monotonic() + self._backoff * random.uniform(0.5, 1.0)
+
+    def _spool(self, batch: list[Reading]):
+        if not self._spool_dir:
+            self._drop(len(batch), self._dropped_unsent)
+            return
+
+        self._spool_seq += 1
+        path = os.path.join(
+            self._spool_dir, f"{time.time_ns():020d}-{self._spool_seq:06d}.jsonl"
+        )
+
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                for reading in batch:
+                    f.write(json.dumps(reading.to_dict(), ensure_ascii=False) + "\n")
+        except OSError as e:
+            logger.error("Sink spool write failed: %s", e, extra={"sink": self.name})
+            self._drop(len(batch), self._dropped_unsent)
+            return
+
+        self._spool_files.append(path)
+        self._spool_bytes += os.path.getsize(path)
+
+        # 退避量の上限を超えた場合は古いものから破棄
+        while self._spool_bytes > self._max_spool_bytes and len(self._spool_files) > 1:
+            self._drop(self._remove_spool(self._spool_files[0]), self._dropped_spool)
+
+    def _resend_spool(self) -> bool:
+        path = self._spool_files[0]
+
+        try:
+            with open(path, encoding="utf-8") as f:
+                batch = [Reading(**json.loads(line)) for line in f if line.strip()]
+        except (OSError, ValueError, TypeError) as e:
+            logger.error("Sink spool read failed: %s", e, extra={"sink": self.name})
+            self._remove_spool(path)
+            return True
+
+        try:
+            self._send(batch)
+        except Exception as e:
+            logger.warning("Sink resend failed: %s", e, extra={"sink": self.name})
+            self._fail()
+            return False
+
+        self._remove_spool(path)
+        self._succeed(len(batch))
+        return True
+
+    def _remove_spool(self, path: str) -> int:
+        """退避ファイルを削除し、含まれていた件数を返す"""
+        self._spool_files.remove(path)
+
+        count = 0
+        try:
+            self._spool_bytes -= os.path.getsize(path)
+            with open(path, encoding="utf-8") as f:
+                count = sum(1 for line in f if line.strip())
+            os.remove(path)
+        except OSError:
+            pass
+
+        return count
+
+    def _load_spool(self):
+        self._spool_files = sorted(
+            os.path.join(self._spool_dir, name)
+            for name in os.listdir(self._spool_dir)
+            if name.endswith(".jsonl")
+        )
+        self._spool_bytes = sum(os.path.getsize(path) for path in self._spool_files)
+
+    def _drop(self, count: int, counter):
+        self.dropped += count
+        counter.inc(count)
@@ -0,0 +1,75 @@
+import json
+import os
+from typing import Optional
+from datetime import datetime
+from dataclasses import dataclass, field
+
+from app.repository.json_repo import JsonSerializable
+
+
+@dataclass
+class MeterConfig(JsonSerializable):
+    """メーター1台分の接続設定"""
+
+    name: str
+    """メーター名(メトリクス・出力のラベル)"""
+    serial_port: str
+    """BP35A1のシリアルポート"""
+    rb_id: str
+    """Bルート認証ID"""
+    rb_password: str
+    """Bルートパスワード"""
+    data_dir: Optional[str] = None
+    """EPAN・補完チェックポイント等の保存先(省略時はメーター名)"""
+    capture_dir: Optional[str] = None
+    """シリアル送受信のキャプチャ出力先(省略時は記録しない)"""
+    archive_dir: Optional[str] = None
+    """受信フレームのアーカイブ出力先(省略時は記録しない)"""
+    poll_interval: Optional[float] = None
+    """瞬時電力の要求間隔(秒) ※指定時は通知を受信した値の要求を省略(省略時は応答毎に継続要求)"""
+
+    def capture_path(self) -> Optional[str]:
+        if not self.capture_dir:
+            return None
+        os.makedirs(self.capture_dir, exist_ok=True)
+        return os.path.join(
+            self.capture_dir, f"{self.name}-{datetime.now():%Y%m%d-%H%M%S}.bpcap"
+        )
+
+    def archive_path(self) -> Optional[str]:
+        """アーカイブのパス(拡張子なし) ※再起動後も同一ファイルに追記"""
+        if not self.archive_dir:
+            return None
+        return os.path.join(self.archive_dir, self.name)
+
+    def data_path(self, file_name: str) -> str:
+        data_dir = self.data_dir or self.name
+        os.makedirs(data_dir, exist_ok=True)
+        return os.path.join(data_dir, file_name)
+
+
+@dataclass
+class SupervisorConfig:
+    """複数メーターの設定
+
+    {"meters": [{"name": ..., "serialPort": ..., "rbId": ..., "rbPassword": ...}, ...]}
+    """
+
+    meters: list[MeterConfig] = field(default_factory=list)
+
+    @classmethod
+    def load(cls, file_path: str) -> "SupervisorConfig":
+        with open(file_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        meters = [MeterConfig.from_json(json.dumps(meter)) for meter in data["meters"]]
+
+        names = [meter.name for meter in meters]
+        if len(set(names)) != len(names):
+            raise ValueError("Meter names must be unique.")
+
+        ports = [meter.serial_port for meter in meters]
+        if len(set(ports)) != len(ports):
+            raise ValueError("Serial ports must be unique.")
+
+        return cls(meters=meters)
@@ -0,0 +1,74 @@
+import time
+import random
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+from app.metrics.registry import REGISTRY
+from app.supervisor.config import MeterConfig
+
+logger = logging.getLogger(__name__)
+
+METER_UP = REGISTRY.gauge("meter_up", "Meter stack is running", ("meter",))
+METER_RESTARTS = REGISTRY.counter(
+    "meter_restarts_total", "Meter stack restarts after failure", ("meter",)
+)
+
+
+class Supervisor:
+    """複数メーターの監視
+
+    メーター毎のスタックを同一イベントループ上で独立して実行し、
+    異常終了したメーターのみ指数バックオフで再起動する。
+    """
+
+    def __init__(
+        self,
+        meters: list[MeterConfig],
+        run_meter: Callable[[MeterConfig], Awaitable[None]],
+        initial_backoff: float = 5.0,
+        max_backoff: float = 600.0,
+        stable_time: float = 600.0,
+    ):
+        self._meters: list[MeterConfig] = meters
+        self._run_meter: Callable[[MeterConfig], Awaitable[None]] = run_meter
+        """メーター1台分のスタックを実行するコルーチン(異常時は例外を送出)"""
+        self._initial_backoff: float = initial_backoff
+        self._max_backoff: float = max_backoff
+        self._stable_time: float = stable_time
+        """この時間以上動作した後の異常終了はバックオフを初期値に戻す"""
+
+    async def run(self):
+        await asyncio.gather(*(self._supervise(meter) for meter in self._meters))
+
+    async def _supervise(self, meter: MeterConfig):
+        up = METER_UP.labels(meter=meter.name)
+        restarts = METER_RESTARTS.labels(meter=meter.name)
+        backoff = self._initial_backoff
+
+        while True:
+            started = time.monotonic()
+            up.set(1)
+
+            try:
+                await self._run_meter(meter)
+                logger.warning("Meter stopped", extra={"meter": meter.name})
+            except asyncio.CancelledError:
+                up.set(0)
+                raise
+            except Exception as e:
+                logger.exception(
+                    "Meter failed with exception: %s", e, extra={"meter": meter.name}
+                )
+
+            up.set(0)
+
+            if time.monotonic() - started >= self._stable_time:
+                backoff = self._initial_backoff
+
+            delay = backoff * random.uniform(0.8, 1.2)
+            logger.info("Meter restarting in %.0fs", delay, extra={"meter": meter.name})
+            await asyncio.sleep(delay)
+
+            restarts.inc()
+            backoff = min(self._max_backoff, backoff * 2)
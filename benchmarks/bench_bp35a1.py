@@ -0,0 +1,59 @@
+import aioserial
+
+from app.bp35a1.bp35a1 import BP35A1
+from benchmarks.bench_codec import FRAMES
+from benchmarks.harness import Benchmark
+
+ERXUDP_LINE = (
+    "ERXUDP FE80:0000:0000:0000:021D:1290:1234:5678 "
+    "FE80:0000:0000:0000:021D:1290:0000:0001 0E1A 0E1A 001D129012345678 1 "
+    f"{len(FRAMES['single_e7']):04X} {FRAMES['single_e7'].hex().upper()}\r\n"
+).encode()
+
+ERXUDP_HISTORY_LINE = (
+    "ERXUDP FE80:0000:0000:0000:021D:1290:1234:5678 "
+    "FE80:0000:0000:0000:021D:1290:0000:0001 0E1A 0E1A 001D129012345678 1 "
+    f"{len(FRAMES['history1_e2']):04X} {FRAMES['history1_e2'].hex().upper()}\r\n"
+).encode()
+
+EVENT_LINE = b"EVENT 21 FE80:0000:0000:0000:021D:1290:1234:5678 00\r\n"
+
+EPANDESC_LINES = [
+    b"EPANDESC\r\n",
+    b"  Channel:21\r\n",
+    b"  Channel Page:09\r\n",
+    b"  Pan ID:8888\r\n",
+    b"  Addr:001D129012345678\r\n",
+    b"  LQI:E1\r\n",
+    b"  PairID:00112233\r\n",
+]
+
+
+def _run(coro):
+    # 無制限キューへの put のみで中断しないため、イベントループを介さず実行
+    try:
+        coro.send(None)
+    except StopIteration as e:
+        return e.value
+    raise RuntimeError("Coroutine suspended")
+
+
+def benchmarks() -> list[Benchmark]:
+    bp35a1 = BP35A1("bench", serial=aioserial.AioSerial())
+
+    def process(*lines: bytes):
+        for line in lines:
+            _run(bp35a1._process_line(line))
+        # 受信結果は破棄してキューの肥大化を防ぐ
+        while not bp35a1._event_queue.empty():
+            bp35a1._event_queue.get_nowait()
+
+    return [
+        Benchmark("bp35a1.process_line.ERXUDP", lambda: process(ERXUDP_LINE)),
+        Benchmark(
+            "bp35a1.process_line.ERXUDP_history1",
+            lambda: process(ERXUDP_HISTORY_LINE),
+        ),
+        Benchmark("bp35a1.process_line.EVENT", lambda: process(EVENT_LINE)),
+        Benchmark("bp35a1.process_line.EPANDESC", lambda: process(*EPANDESC_LINES)),
+    ]
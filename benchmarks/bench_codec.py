@@ -0,0 +1,255 @@
+import struct
+import inspect
+
+from app.echonet.protocol.decoder import getPropertyDecoder
+from app.echonet.protocol.eoj import EnetObject, EnetObjectHeader
+from app.echonet.protocol.esv import EnetService
+from app.echonet.protocol.protocol_rx import ProtocolRx
+from app.echonet.protocol.protocol_tx import ProtocolTx
+from app.echonet.protocol.tid import TransactionId
+from app.echonet.object.classcode import ClassCode, ClassGroupCode
+from app.echonet.property.property import Property
+from app.echonet.property.base_property import BaseProperty
+from app.echonet.property.home_equipment_device import history_columnar
+from app.echonet.property.home_equipment_device.low_voltage_smart_pm import (
+    LowVoltageSmartPm,
+)
+from benchmarks.harness import Benchmark
+
+SM_ENET_OBJ = EnetObject(
+    classGroupCode=ClassGroupCode.HomeEquipmentDevice,
+    classCode=ClassCode.LowVoltageSmartPowerMeter,
+    instanceCode=0x01,
+)
+CTRL_ENET_OBJ = EnetObject(
+    classGroupCode=ClassGroupCode.ManagerOpDevice,
+    classCode=ClassCode.Controller,
+    instanceCode=0x01,
+)
+
+HISTORY_TIMESTAMP = struct.pack(">HBBBB", 2024, 5, 1, 12, 30)
+
+# クラス毎の代表的なEDT(実機応答相当)
+SAMPLE_EDTS: dict[type[Property], bytes] = {
+    BaseProperty.OpStatus: b"\x30",
+    BaseProperty.InstallLocation: b"\x08",
+    BaseProperty.VersionInfo: b"\x00\x00J\x00",
+    BaseProperty.InstantPowerConsumption: struct.pack(">I", 1234),
+    BaseProperty.CumulativePowerConsumption: struct.pack(">I", 123456),
+    BaseProperty.ManufacturerErrorCode: b"\x00\x00\x00\x01\x02",
+    BaseProperty.CurrentLimitSetting: b"\x32",
+    BaseProperty.AbnormalState: b"\x42",
+    BaseProperty.MemberID: b"\x00\x00\x16",
+    BaseProperty.BusinessCode: b"\x00\x00\x16",
+    BaseProperty.ProductCode: b"PRODUCT-0001",
+    BaseProperty.SerialNumber: b"SERIAL-00001",
+    BaseProperty.ManufactureDate: struct.pack(">HBB", 2020, 4, 1),
+    BaseProperty.PowerSavingMode: b"\x42",
+    BaseProperty.RemoteControlSetting: b"\x42",
+    BaseProperty.CurrentTime: b"\x0c\x1e",
+    BaseProperty.CurrentDate: struct.pack(">HBB", 2024, 5, 1),
+    BaseProperty.PowerLimitSetting: struct.pack(">H", 3000),
+    BaseProperty.CumulativeOperatingTime: b"\x43" + struct.pack(">I", 1000),
+    BaseProperty.PropertyMap: bytes(
+        [8, 0x80, 0x81, 0x82, 0x88, 0x8A, 0x9D, 0x9E, 0x9F]
+    ),
+    BaseProperty.SetMPropertyMap: b"\x00",
+    BaseProperty.GetMPropertyMap: b"\x00",
+    BaseProperty.ChangeAnnoPropertyMap: bytes([3, 0x80, 0x81, 0x88]),
+    BaseProperty.SetPropertyMap: bytes([2, 0x81, 0x97]),
+    BaseProperty.GetPropertyMap: bytes([16]) + bytes([0xFF] * 8 + [0x00] * 8),
+    LowVoltageSmartPm.BrouteIdentifyNo: b"\x00" + bytes(range(15)),
+    LowVoltageSmartPm.OneMinuteCumulativeEnergy: struct.pack(
+        ">HBBBBBII", 2024, 5, 1, 12, 31, 0, 123456, 789
+    ),
+    LowVoltageSmartPm.Coefficient: struct.pack(">I", 1),
+    LowVoltageSmartPm.CumulativeEnergySignificantDigit: b"\x06",
+    LowVoltageSmartPm.CumulativeEnergyMeasurement: struct.pack(">I", 123456),
+    LowVoltageSmartPm.CumulativeEnergyMeasurementNormalDir: struct.pack(">I", 123456),
+    LowVoltageSmartPm.CumulativeEnergyMeasurementReverseDir: struct.pack(">I", 789),
+    LowVoltageSmartPm.CumulativeEnergyUnit: b"\x01",
+    LowVoltageSmartPm.CumulativeEnergyMeasurementHistory1: struct.pack(
+        ">H48I", 1, *range(100000, 100048)
+    ),
+    LowVoltageSmartPm.CumulativeEnergyMeasurementHistory1NormalDir: struct.pack(
+        ">H48I", 1, *range(100000, 100048)
+    ),
+    LowVoltageSmartPm.CumulativeEnergyMeasurementHistory1ReverseDir: struct.pack(
+        ">H48I", 1, *([0xFFFFFFFE] * 48)
+    ),
+    LowVoltageSmartPm.CumulativeHistoryCollectDay1: b"\x01",
+    LowVoltageSmartPm.MomentPower: struct.pack(">i", 1234),
+    LowVoltageSmartPm.MomentCurrent: struct.pack(">hh", 52, 31),
+    LowVoltageSmartPm.IntCumulativeEnergyMeasurement: struct.pack(
+        ">HBBBBBI", 2024, 5, 1, 12, 30, 0, 123456
+    ),
+    LowVoltageSmartPm.IntCumulativeEnergyNormalDir: struct.pack(
+        ">HBBBBBI", 2024, 5, 1, 12, 30, 0, 123456
+    ),
+    LowVoltageSmartPm.IntCumulativeEnergyReverseDir: struct.pack(
+        ">HBBBBBI", 2024, 5, 1, 12, 30, 0, 789
+    ),
+    LowVoltageSmartPm.CumulativeEnergyMeasurementHistory2: HISTORY_TIMESTAMP
+    + b"\x0c"
+    + b"".join(struct.pack(">II", 100000 + i, 500 + i) for i in range(12)),
+    LowVoltageSmartPm.CumulativeHistoryCollectDay2: HISTORY_TIMESTAMP + b"\x0c",
+    LowVoltageSmartPm.CumulativeEnergyMeasurementHistory3: struct.pack(
+        ">HBBBB", 2024, 5, 1, 12, 31
+    )
+    + b"\x0a"
+    + b"".join(struct.pack(">II", 100000 + i, 500 + i) for i in range(10)),
+    LowVoltageSmartPm.CumulativeHistoryCollectDay3: struct.pack(
+        ">HBBBBB", 2024, 5, 1, 12, 31, 10
+    ),
+}
+
+
+def property_classes() -> list[type[Property]]:
+    """BaseProperty・LowVoltageSmartPm に定義された全プロパティクラス"""
+    return [
+        member
+        for owner in (BaseProperty, LowVoltageSmartPm)
+        for _, member in inspect.getmembers(owner, inspect.isclass)
+        if issubclass(member, Property)
+    ]
+
+
+def make_frame(esv: EnetService, properties: list[tuple[int, bytes]]) -> bytes:
+    frame = bytearray(b"\x10\x81\x00\x01")
+    frame.extend(EnetObjectHeader(src=SM_ENET_OBJ, dst=CTRL_ENET_OBJ).encode())
+    frame.extend((esv, len(properties)))
+    for epc, edt in properties:
+        frame.extend((epc, len(edt)))
+        frame.extend(edt)
+    return bytes(frame)
+
+
+FRAMES: dict[str, bytes] = {
+    "single_e7": make_frame(
+        EnetService.GetRes, [(0xE7, SAMPLE_EDTS[LowVoltageSmartPm.MomentPower])]
+    ),
+    "history1_e2": make_frame(
+        EnetService.GetRes,
+        [(0xE2, SAMPLE_EDTS[LowVoltageSmartPm.CumulativeEnergyMeasurementHistory1])],
+    ),
+    "history2_ec_12": make_frame(
+        EnetService.GetRes,
+        [(0xEC, SAMPLE_EDTS[LowVoltageSmartPm.CumulativeEnergyMeasurementHistory2])],
+    ),
+}
+
+
+def _decode_encode(cls: type[Property], edt: bytes) -> list[Benchmark]:
+    benchmarks = [Benchmark(f"decode.{cls.__qualname__}", lambda: cls.decode(edt))]
+
+    instance = cls.decode(edt)
+    try:
+        instance.encode()
+    except Exception:
+        # 書き込み非対応(GET専用で encode 未実装)のプロパティは decode のみ
+        return benchmarks
+
+    benchmarks.append(Benchmark(f"encode.{cls.__qualname__}", instance.encode))
+    return benchmarks
+
+
+def _protocol_tx(count: int, enet_service: EnetService) -> Benchmark:
+    properties = [
+        cls.decode(SAMPLE_EDTS[cls])
+        for cls in (
+            LowVoltageSmartPm.MomentPower,
+            LowVoltageSmartPm.MomentCurrent,
+            LowVoltageSmartPm.IntCumulativeEnergyNormalDir,
+            LowVoltageSmartPm.CumulativeEnergyMeasurementHistory1NormalDir,
+        )
+    ]
+    properties = (properties * count)[:count]
+    header = EnetObjectHeader(src=CTRL_ENET_OBJ, dst=SM_ENET_OBJ)
+
+    def make():
+        protocol_tx = ProtocolTx(header, enet_service, packet_size_limit=1232)
+        for prop in properties:
+            protocol_tx.add_property(prop)
+        return protocol_tx.make(TransactionId())
+
+    return Benchmark(f"protocol_tx.{enet_service.name}_{count}", make)
+
+
+def benchmarks() -> list[Benchmark]:
+    result = [
+        Benchmark(f"protocol_rx.{name}", lambda frame=frame: ProtocolRx.proc(frame))
+        for name, frame in FRAMES.items()
+    ]
+
+    result.append(_protocol_tx(64, EnetService.Get))
+    result.append(_protocol_tx(64, EnetService.GetRes))
+
+    for cls in property_classes():
+        edt = SAMPLE_EDTS.get(cls)
+        if edt is not None:
+            result.extend(_decode_encode(cls, edt))
+
+    epcs = [0x80, 0x82, 0x8A, 0x9F, 0xD3, 0xE0, 0xE2, 0xE7, 0xEA, 0xEC, 0xEE, 0xF0]
+    result.append(
+        Benchmark(
+            "decoder.getPropertyDecoder",
+            lambda: [getPropertyDecoder(SM_ENET_OBJ, epc) for epc in epcs],
+        )
+    )
+
+    return result
+
+
+def uncovered() -> list[str]:
+    """代表EDT未定義のプロパティクラス(デコーダ未実装等)"""
+    return [cls.__qualname__ for cls in property_classes() if cls not in SAMPLE_EDTS]
+
+
+# 履歴２・３の未設定(収集日時 0xFFFF/0xFF...)の応答
+HISTORY_SENTINEL_EDTS: list[bytes] = [
+    b"\xff" * 6 + b"\x00",
+    b"\xff" * 6 + b"\x01" + struct.pack(">II", 0xFFFFFFFE, 0xFFFFFFFE),
+]
+
+
+def check_columnar() -> list[str]:
+    """列指向デコード(NumPy)がプロパティクラスのデコードと一致するか検証し、不一致を返す"""
+    if not history_columnar.is_available():
+        return []
+
+    mismatches = []
+
+    def masked(values, valid) -> list:
+        return [int(v) if ok else None for v, ok in zip(values, valid)]
+
+    for cls in (
+        LowVoltageSmartPm.CumulativeEnergyMeasurementHistory1NormalDir,
+        LowVoltageSmartPm.CumulativeEnergyMeasurementHistory1ReverseDir,
+    ):
+        edt = SAMPLE_EDTS[cls]
+        expected = cls.decode(edt)
+        columns = history_columnar.decode_history1(edt)
+        actual = (columns.collect_day, masked(columns.values, columns.valid))
+        if actual != (expected.collect_day, expected.values):
+            mismatches.append(f"decode_history1 {cls.__qualname__}")
+
+    for cls in (
+        LowVoltageSmartPm.CumulativeEnergyMeasurementHistory2,
+        LowVoltageSmartPm.CumulativeEnergyMeasurementHistory3,
+    ):
+        for index, edt in enumerate([SAMPLE_EDTS[cls], *HISTORY_SENTINEL_EDTS]):
+            expected = cls.decode(edt)
+            columns = history_columnar.decode_history_records(edt)
+            actual = (
+                columns.timestamp,
+                list(
+                    zip(
+                        masked(columns.forward, columns.forward_valid),
+                        masked(columns.reverse, columns.reverse_valid),
+                    )
+                ),
+            )
+            if actual != (expected.timestamp, list(expected.energy_records)):
+                mismatches.append(f"decode_history_records {cls.__qualname__}[{index}]")
+
+    return mismatches
@@ -0,0 +1,128 @@
+import gc
+import json
+import time
+import platform
+import statistics
+from typing import Callable, Optional
+from dataclasses import dataclass, field, asdict
+
+
+@dataclass
+class Benchmark:
+    name: str
+    """ベンチマーク名(グループ.対象)"""
+    func: Callable[[], object]
+    """計測対象(引数なしで1回分の処理を行う)"""
+
+
+@dataclass
+class Result:
+    name: str
+    loops: int
+    """1回の計測での実行回数"""
+    min_ns: float
+    """1回あたりの最小時間(ns)"""
+    median_ns: float
+    """1回あたりの中央値(ns)"""
+    stdev_ns: float
+
+
+@dataclass
+class Report:
+    results: dict[str, Result] = field(default_factory=dict)
+    python: str = field(default_factory=platform.python_version)
+    machine: str = field(default_factory=platform.machine)
+    created_at: float = field(default_factory=time.time)
+
+    def to_json(self, file_path: str):
+        data = asdict(self)
+        with open(file_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+
+    @classmethod
+    def from_json(cls, file_path: str) -> "Report":
+        with open(file_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        data["results"] = {
+            name: Result(**result) for name, result in data["results"].items()
+        }
+        return cls(**data)
+
+
+@dataclass
+class Regression:
+    name: str
+    baseline_ns: float
+    current_ns: float
+    threshold: float
+
+    @property
+    def ratio(self) -> float:
+        return self.current_ns / self.baseline_ns
+
+
+def measure(benchmark: Benchmark, repeat: int = 7, min_time: float = 0.2) -> Result:
+    """min_time 以上かかる実行回数を求め、repeat 回計測した1回あたりの時間を返す"""
+    func = benchmark.func
+    func()
+
+    loops = 1
+    while True:
+        elapsed = _time_loops(func, loops)
+        if elapsed >= min_time:
+            break
+        loops *= 10 if elapsed < min_time / 10 else 2
+
+    samples = [_time_loops(func, loops) / loops * 1e9 for _ in range(repeat)]
+
+    return Result(
+        name=benchmark.name,
+        loops=loops,
+        min_ns=min(samples),
+        median_ns=statistics.median(samples),
+        stdev_ns=statistics.stdev(samples) if len(samples) > 1 else 0.0,
+    )
+
+
+def _time_loops(func: Callable[[], object], loops: int) -> float:
+    # GCによるばらつきを避けるため計測中は停止
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        return time.perf_counter() - start
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def compare(
+    current: Report,
+    baseline: Report,
+    threshold: float,
+    thresholds: Optional[dict[str, float]] = None,
+) -> list[Regression]:
+    """基準値より threshold(割合) を超えて遅くなったベンチマークを返す
+
+    ノイズの影響が小さい最小時間で比較する。thresholds はベンチマーク名の前方一致で個別指定。
+    """
+    thresholds = thresholds or {}
+    regressions = []
+
+    for name, result in current.results.items():
+        base = baseline.results.get(name)
+        if base is None or base.min_ns <= 0:
+            continue
+
+        limit = threshold
+        for prefix, value in thresholds.items():
+            if name.startswith(prefix):
+                limit = value
+
+        if result.min_ns > base.min_ns * (1 + limit):
+            regressions.append(Regression(name, base.min_ns, result.min_ns, limit))
+
+    return regressions
@@ -0,0 +1,117 @@
+"""モジュールの import 時間の計測(python -X importtime の集計)
+
+python -m benchmarks.import_time                          # main の import 時間と上位モジュール
+python -m benchmarks.import_time app.echonet.echonet --top 30
+python main.py --profile-import                           # main のみ
+"""
+
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+from dataclasses import dataclass
+
+from benchmarks.harness import Result
+
+IMPORT_TARGETS: list[str] = [
+    "main",
+    "app.echonet.echonet",
+    "app.echonet.protocol.protocol_rx",
+]
+"""run.py で計測する import 対象(起動時間の回帰検出用)"""
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@dataclass
+class ImportEntry:
+    name: str
+    self_us: int
+    """モジュール自体の実行時間(μs)"""
+    cumulative_us: int
+    """依存モジュールを含む時間(μs)"""
+    depth: int
+    """import の入れ子の深さ(0が最上位)"""
+
+
+def profile_import(module: str) -> list[ImportEntry]:
+    """新しいインタプリタで module を import し、モジュール毎の時間を得る
+
+    インタプリタ起動時に読み込まれるモジュール(site 等)は除く。
+    """
+    startup = {entry.name for entry in _importtime("pass")}
+    return [
+        entry for entry in _importtime(f"import {module}") if entry.name not in startup
+    ]
+
+
+def _importtime(code: str) -> list[ImportEntry]:
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    entries = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append(
+            ImportEntry(name.strip(), int(self_us), int(cumulative_us), depth)
+        )
+
+    return entries
+
+
+def total_us(entries: list[ImportEntry]) -> int:
+    return sum(entry.cumulative_us for entry in entries if entry.depth == 0)
+
+
+def measure_import(module: str, repeat: int = 5) -> Result:
+    """import 時間(全依存を含む)を repeat 回計測 ※初回は .pyc 生成を含むため除外"""
+    profile_import(module)
+    samples = [total_us(profile_import(module)) * 1000.0 for _ in range(repeat)]
+
+    return Result(
+        name=f"import.{module}",
+        loops=1,
+        min_ns=min(samples),
+        median_ns=statistics.median(samples),
+        stdev_ns=statistics.stdev(samples) if len(samples) > 1 else 0.0,
+    )
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Profile module import time")
+    parser.add_argument("module", nargs="?", default="main")
+    parser.add_argument("--top", type=int, default=20, help="modules to list")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    result = measure_import(args.module, repeat=args.repeat)
+    entries = profile_import(args.module)
+
+    print(
+        f"import {args.module}: {result.min_ns / 1e6:.1f} ms "
+        f"(median {result.median_ns / 1e6:.1f} ms)"
+    )
+    print(f"{'self [ms]':>10} {'cumulative [ms]':>16}  module")
+    for entry in sorted(entries, key=lambda e: e.cumulative_us, reverse=True)[
+        : args.top
+    ]:
+        print(
+            f"{entry.self_us / 1000:>10.1f} {entry.cumulative_us / 1000:>16.1f}  "
+            f"{'  ' * entry.depth}{entry.name}"
+        )
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
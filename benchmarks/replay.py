@@ -0,0 +1,105 @@
+"""キャプチャファイルの再生による受信処理全体のスループット計測
+
+python -m benchmarks.replay capture.bpcap                 # 最大速度
+python -m benchmarks.replay capture.bpcap --speed 1       # 実時間(停滞の再現)
+python -m benchmarks.replay capture.bpcap --trace t.json  # 区間毎の所要時間
+"""
+
+import sys
+import json
+import time
+import asyncio
+import argparse
+
+from app.echonet.echonet import Echonet
+from app.interface.replay_if import ReplayInterface
+from app.metrics.tracing import TRACER
+
+
+async def replay(capture_path: str, speed: float) -> dict:
+    interface = ReplayInterface(capture_path, speed=speed)
+    echonet = Echonet([], interface, name="replay")
+
+    frames = 0
+    properties = 0
+    consumed = asyncio.Event()
+
+    async def consume():
+        nonlocal frames, properties
+        while True:
+            enet_data = await echonet.get_received_data()
+            frames += 1
+            properties += len(enet_data.properties)
+            consumed.set()
+
+    started = time.perf_counter()
+    await interface.init()
+
+    rx_task = asyncio.create_task(echonet.proc_rx_task())
+    consumer = asyncio.create_task(consume())
+
+    try:
+        # 全データの再生後、最後のフレームの受信処理を終えると EOFError で終了する
+        try:
+            await rx_task
+        except EOFError:
+            pass
+
+        # 受信処理済みのデータを全て取り出すまで待つ
+        while echonet.pending_received():
+            consumed.clear()
+            await consumed.wait()
+        elapsed = time.perf_counter() - started
+    finally:
+        rx_task.cancel()
+        consumer.cancel()
+        await asyncio.gather(rx_task, consumer, return_exceptions=True)
+        await interface.close()
+
+    lines = interface.serial.lines
+    return {
+        "capture": capture_path,
+        "speed": speed,
+        "elapsed_s": elapsed,
+        "lines": lines,
+        "frames": frames,
+        "properties": properties,
+        "lines_per_s": lines / elapsed if elapsed else 0.0,
+        "frames_per_s": frames / elapsed if elapsed else 0.0,
+        "max_lag_s": interface.serial.max_lag,
+    }
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Replay a serial capture")
+    parser.add_argument("capture")
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=0,
+        help="playback speed (0 = as fast as possible)",
+    )
+    parser.add_argument("-o", "--output", help="write result JSON")
+    parser.add_argument("--trace", help="write Chrome trace JSON")
+    args = parser.parse_args(argv)
+
+    if args.trace:
+        TRACER.start()
+
+    result = asyncio.run(replay(args.capture, args.speed))
+
+    if args.trace:
+        TRACER.stop()
+        TRACER.export(args.trace)
+        result["stages"] = TRACER.summary()
+    print(json.dumps(result, indent=2))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""コーデック・プロトコル処理のマイクロベンチマーク
+
+python -m benchmarks.run -o benchmark.json                 # 計測
+python -m benchmarks.run -b -t 0.10                        # 基準値と比較(10%超の低下で終了コード1)
+python -m benchmarks.run -b other.json --threshold-for protocol_rx.=0.05
+python -m benchmarks.run --no-import                       # import 時間の計測を省略
+
+-b のみの指定時は benchmarks/baseline.json(リポジトリに含む基準値)と比較する。
+計測値は環境に依存するため、別の環境で比較する場合や計測対象を変更した場合は、
+変更前のコミット(REF)を別の作業ツリーで計測して作り直す。
+
+git worktree add /tmp/base REF && (cd /tmp/base && python -m benchmarks.run -o "$OLDPWD/benchmarks/baseline.json")
+git worktree remove /tmp/base
+
+基準値がない場合、または基準値に含まれないベンチマークのみの場合は終了コード2。
+"""
+
+import os
+import sys
+import argparse
+
+from benchmarks import bench_bp35a1, bench_codec
+from benchmarks.harness import Report, Result, compare, measure
+from benchmarks.import_time import IMPORT_TARGETS, measure_import
+
+DEFAULT_OUTPUT = "benchmark.json"
+DEFAULT_BASELINE = "benchmarks/baseline.json"
+
+
+def _parse_thresholds(values: list[str]) -> dict[str, float]:
+    thresholds = {}
+    for value in values:
+        prefix, _, ratio = value.partition("=")
+        thresholds[prefix] = float(ratio)
+    return thresholds
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Codec and protocol micro-benchmarks")
+    parser.add_argument("-o", "--output", default=DEFAULT_OUTPUT)
+    parser.add_argument(
+        "-b",
+        "--baseline",
+        nargs="?",
+        const=DEFAULT_BASELINE,
+        help=f"baseline JSON to compare against (default {DEFAULT_BASELINE})",
+    )
+    parser.add_argument(
+        "-t",
+        "--threshold",
+        type=float,
+        default=0.10,
+        help="allowed slowdown ratio (default 0.10 = 10%%)",
+    )
+    parser.add_argument(
+        "--threshold-for",
+        action="append",
+        default=[],
+        metavar="PREFIX=RATIO",
+        help="per-benchmark threshold by name prefix",
+    )
+    parser.add_argument("-k", "--filter", help="run benchmarks containing this text")
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--min-time", type=float, default=0.2)
+    parser.add_argument(
+        "--no-import", action="store_true", help="skip import time benchmarks"
+    )
+    args = parser.parse_args(argv)
+
+    # 計測後に基準値がないと判明して比較されないことのないよう先に確認
+    if args.baseline and not os.path.exists(args.baseline):
+        print(
+            f"Baseline not found: {args.baseline}\n"
+            f"Create it on this machine from the reference commit (REF) with:\n"
+            f"  git worktree add /tmp/base REF && (cd /tmp/base && "
+            f"python -m benchmarks.run -o {os.path.abspath(args.baseline)})\n"
+            f"  git worktree remove /tmp/base",
+            file=sys.stderr,
+        )
+        return 2
+
+    benchmarks = bench_codec.benchmarks() + bench_bp35a1.benchmarks()
+    if args.filter:
+        benchmarks = [b for b in benchmarks if args.filter in b.name]
+
+    import_targets = [] if args.no_import else IMPORT_TARGETS
+    if args.filter:
+        import_targets = [m for m in import_targets if args.filter in f"import.{m}"]
+
+    # 計測対象の実装同士で結果が異なる場合は計測せず失敗とする
+    mismatches = bench_codec.check_columnar()
+    for mismatch in mismatches:
+        print(f"MISMATCH {mismatch}")
+    if mismatches:
+        return 1
+
+    report = Report()
+
+    def add(result: Result):
+        report.results[result.name] = result
+        print(
+            f"{result.name:<70} {result.min_ns:>12.0f} ns "
+            f"(median {result.median_ns:.0f} ns)"
+        )
+
+    for benchmark in benchmarks:
+        add(measure(benchmark, repeat=args.repeat, min_time=args.min_time))
+
+    # 起動時間(新しいインタプリタでの import)は別プロセスで計測
+    for module in import_targets:
+        add(measure_import(module, repeat=args.repeat))
+
+    for name in bench_codec.uncovered():
+        print(f"{name:<70} {'skipped':>12}")
+
+    report.to_json(args.output)
+
+    if not args.baseline:
+        return 0
+
+    baseline = Report.from_json(args.baseline)
+    missing = [name for name in report.results if name not in baseline.results]
+    for name in missing:
+        print(f"NO BASELINE {name}")
+    if missing and len(missing) == len(report.results):
+        print(f"No benchmark found in baseline {args.baseline}", file=sys.stderr)
+        return 2
+
+    regressions = compare(
+        report,
+        baseline,
+        args.threshold,
+        _parse_thresholds(args.threshold_for),
+    )
+
+    for regression in regressions:
+        print(
+            f"REGRESSION {regression.name}: {regression.baseline_ns:.0f} ns -> "
+            f"{regression.current_ns:.0f} ns (x{regression.ratio:.2f}, "
+            f"limit +{regression.threshold:.0%})"
+        )
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
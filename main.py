@@ -1,28 +1,64 @@
+from __future__ import annotations
+
 import os
+import sys
+import signal
 import asyncio
-import traceback
-from dotenv import load_dotenv
+import logging
+from typing import TYPE_CHECKING, Optional
+
+# 起動時間短縮のため、プロトコル・プロパティ定義等は使用する関数内で読み込む
+if TYPE_CHECKING:
+    from app.bp35a1.link_monitor import LinkHealth, LinkMonitor
+    from app.echonet.echonet import DeviceObject, Echonet
+    from app.echonet.protocol.eoj import EnetObject
+    from app.repository.sqlite_store import SqliteStore
+    from app.repository.timeseries import TimeSeriesStore
+    from app.sink.forwarder import Sink
+    from app.supervisor.config import MeterConfig
+
+# __main__ として実行されるため app 配下の名前で出力設定を適用する
+logger = logging.getLogger("app.main")
 
-from app.echonet.echonet import Echonet
-from app.echonet.protocol.eoj import EnetObject
-from app.echonet.protocol.esv import EnetService
-from app.echonet.enet_data import EchonetData
-from app.echonet.property.home_equipment_device.low_voltage_smart_pm import (
-    LowVoltageSmartPm,
-)
-from app.echonet.property.profile.node_profile import NodeProfile
-from app.echonet.object.classcode import ClassCode, ClassGroupCode
-from app.interface.bp35a1_if import BP35A1Interface
+RESPONSE_TIMEOUT = 30.0
+"""Get/SetC の応答待ち時間(秒) ※回線品質に応じて短縮"""
 
+SCHEDULED_NOTIFY_WAIT = 35 * 60.0
+"""定時積算電力量(30分毎に通知)を要求するまでの待機時間(秒)"""
 
-async def main_task(echonet: Echonet):
 
-    CTRL_ENET_OBJ = EnetObject(
+def controller_object() -> EnetObject:
+    """自ノードのコントローラオブジェクト"""
+    from app.echonet.object.classcode import ClassCode, ClassGroupCode
+    from app.echonet.protocol.eoj import EnetObject
+
+    return EnetObject(
         classGroupCode=ClassGroupCode.ManagerOpDevice,
         classCode=ClassCode.Controller,
         instanceCode=0x01,
     )
 
+
+async def main_task(
+    echonet: Echonet,
+    store: TimeSeriesStore,
+    checkpoint_path: str,
+    capability_path: str,
+    poll_interval: Optional[float] = None,
+    link_monitor: Optional[LinkMonitor] = None,
+):
+    from app.echonet.discovery import CapabilityDiscovery
+    from app.echonet.enet_data import EchonetData
+    from app.echonet.protocol.esv import EnetService
+    from app.echonet.property.home_equipment_device.low_voltage_smart_pm import (
+        LowVoltageSmartPm,
+    )
+    from app.echonet.property.profile.node_profile import NodeProfile
+    from app.metering.accounting import EnergyAccountant
+    from app.metering.backfill import BackfillEngine
+    from app.metering.poller import NotificationPoller
+
+    ctrl_enet_obj = controller_object()
     sm_enet_obj: EnetObject = None
 
     # インスタンスリスト取得
@@ -33,72 +69,369 @@ async def main_task(echonet: Echonet):
             if isinstance(prop, NodeProfile.InstanceListNotify):
                 sm_enet_obj = prop.enet_objs[0]
 
-    # 瞬時電力計測値 要求
-    request_data = EchonetData(
-        src_enet_object=CTRL_ENET_OBJ,
-        dst_enet_object=sm_enet_obj,
-        enet_service=EnetService.Get,
-        properties=[LowVoltageSmartPm.MomentPower()],
+    # 対応プロパティを取得し、以降の要求から未対応EPCを除外
+    discovery = CapabilityDiscovery(echonet, ctrl_enet_obj, cache_path=capability_path)
+    capabilities = await discovery.discover(sm_enet_obj)
+
+    # 停止中などの欠測を積算履歴から定期補完
+    backfill_engine = BackfillEngine(
+        echonet,
+        store,
+        ctrl_enet_obj,
+        sm_enet_obj,
+        checkpoint_path=checkpoint_path,
+        capabilities=capabilities,
     )
+    backfill_task = asyncio.create_task(backfill_engine.run_periodically())
 
-    await echonet.send_data(request_data)
+    # 積算電力量の換算用に係数・単位・有効桁数を取得
+    await echonet.send_data(
+        EchonetData(
+            src_enet_object=ctrl_enet_obj,
+            dst_enet_object=sm_enet_obj,
+            enet_service=EnetService.Get,
+            properties=[
+                LowVoltageSmartPm.Coefficient(),
+                LowVoltageSmartPm.CumulativeEnergyUnit(),
+                LowVoltageSmartPm.CumulativeEnergySignificantDigit(),
+            ],
+        )
+    )
 
-    while True:
-        received_data = await echonet.get_received_data()
+    poller_task = None
+    if poll_interval is None:
+        # 瞬時電力計測値 要求
+        request_data = EchonetData(
+            src_enet_object=ctrl_enet_obj,
+            dst_enet_object=sm_enet_obj,
+            enet_service=EnetService.Get,
+            properties=[LowVoltageSmartPm.MomentPower()],
+        )
 
-        for prop in received_data.properties:
-            print(prop)
+        await echonet.send_data(request_data)
 
-            if isinstance(prop, LowVoltageSmartPm.MomentPower):
-                # 取得後に瞬時電力計測値を継続要求
-                await echonet.send_data(request_data)
+        # 状変アナウンスされる(または取得できない)場合は継続要求しない
+        poll_moment_power = capabilities is None or bool(
+            capabilities.poll_epcs([LowVoltageSmartPm.MomentPower().code])
+        )
+    else:
+        # 通知(Inf/InfC)で受信した値は要求せず、間隔内に通知がない場合のみ要求
+        poller = NotificationPoller(
+            echonet, ctrl_enet_obj, sm_enet_obj, name=echonet.name
+        )
+        poll_targets = [
+            (LowVoltageSmartPm.MomentPower(), poll_interval),
+            # 定時積算電力量は30分毎に通知されるため、取りこぼした場合のみ要求
+            (LowVoltageSmartPm.IntCumulativeEnergyNormalDir(), SCHEDULED_NOTIFY_WAIT),
+            (LowVoltageSmartPm.IntCumulativeEnergyReverseDir(), SCHEDULED_NOTIFY_WAIT),
+        ]
+        for prop, interval in poll_targets:
+            if capabilities is None or capabilities.can_get(prop.code):
+                poller.add(prop, interval)
 
+        poll_moment_power = False
+        poller_task = asyncio.create_task(poller.run())
 
-async def run():
-    load_dotenv()
+    if link_monitor is not None:
+        # 回線品質の劣化時は取得間隔を延ばし、応答待ちを短縮して再要求を早める
+        def adapt(health: LinkHealth):
+            echonet.response_timeout = RESPONSE_TIMEOUT * health.timeout_scale()
+            if poller_task is not None:
+                poller.interval_scale = health.poll_scale()
+
+        link_monitor.add_listener(adapt)
+        adapt(link_monitor.health)
+
+    accountant = EnergyAccountant()
+
+    try:
+        while True:
+            received_data = await echonet.get_received_data()
 
-    SERIAL_PORT = os.getenv("SERIAL_PORT")
-    RB_ID = os.getenv("RB_ID")
-    RB_PASSWORD = os.getenv("RB_PASSWORD")
+            for prop in received_data.properties:
+                logger.info("%s", prop)
+                store.ingest(prop)
 
-    bp35a1_interface = BP35A1Interface(SERIAL_PORT, RB_ID, RB_PASSWORD)
-    await bp35a1_interface.init()
+                energy_delta = accountant.consume(prop)
+                if energy_delta:
+                    logger.info("%s", energy_delta)
 
-    device_objects = []
-    echonet = Echonet(device_objects, bp35a1_interface)
+                if poll_moment_power and isinstance(
+                    prop, LowVoltageSmartPm.MomentPower
+                ):
+                    # 取得後に瞬時電力計測値を継続要求
+                    await echonet.send_data(request_data)
+    finally:
+        # 再起動時に停止したスタックで補完を続けないよう併せて停止
+        backfill_task.cancel()
+        if poller_task:
+            poller_task.cancel()
+
+
+def create_sinks() -> list[Sink]:
+    # 出力先のモジュール(urllib・paho-mqtt 等)は設定されたもののみ読み込む
+    EXPORT_DIR = os.getenv("EXPORT_DIR")
+    SPOOL_DIR = os.getenv("SPOOL_DIR", "spool")
+    INFLUX_URL = os.getenv("INFLUX_URL")
+    HTTP_SINK_URL = os.getenv("HTTP_SINK_URL")
+    MQTT_HOST = os.getenv("MQTT_HOST")
+
+    sinks = []
+
+    if EXPORT_DIR:
+        from app.sink.file_sink import FileFormat, RotatingFileSink
+
+        sinks.append(
+            RotatingFileSink(
+                EXPORT_DIR,
+                file_format=FileFormat(os.getenv("EXPORT_FORMAT", FileFormat.JSONL)),
+                compress=os.getenv("EXPORT_GZIP") == "1",
+            )
+        )
+
+    if INFLUX_URL:
+        from app.sink.http_sink import InfluxLineSink
+
+        sinks.append(
+            InfluxLineSink(
+                INFLUX_URL,
+                org=os.getenv("INFLUX_ORG"),
+                bucket=os.getenv("INFLUX_BUCKET"),
+                token=os.getenv("INFLUX_TOKEN"),
+                spool_dir=os.path.join(SPOOL_DIR, "influxdb"),
+            )
+        )
+
+    if HTTP_SINK_URL:
+        from app.sink.http_sink import HttpPostSink
 
-    tasks = [
-        asyncio.create_task(echonet.proc_tx_task()),
-        asyncio.create_task(echonet.proc_rx_task()),
-        asyncio.create_task(main_task(echonet)),
+        sinks.append(
+            HttpPostSink(HTTP_SINK_URL, spool_dir=os.path.join(SPOOL_DIR, "http"))
+        )
+
+    if MQTT_HOST:
+        from app.sink.mqtt_sink import MqttSink
+
+        sinks.append(
+            MqttSink(
+                MQTT_HOST,
+                port=int(os.getenv("MQTT_PORT", "1883")),
+                username=os.getenv("MQTT_USERNAME"),
+                password=os.getenv("MQTT_PASSWORD"),
+                spool_dir=os.path.join(SPOOL_DIR, "mqtt"),
+            )
+        )
+
+    return sinks
+
+
+def create_device_objects() -> list[DeviceObject]:
+    from app.echonet.echonet import DeviceObject
+    from app.echonet.property.base_property import BaseProperty
+    from app.echonet.property.install_location import SpecialLocationCode
+
+    # 自ノードのコントローラオブジェクト(ノードプロファイルはEchonet側で自動生成)
+    return [
+        DeviceObject(
+            enet_object=controller_object(),
+            properties=[
+                BaseProperty.OpStatus(),
+                BaseProperty.InstallLocation(location_code=SpecialLocationCode.NOT_SET),
+                BaseProperty.VersionInfo(release="J"),
+                BaseProperty.AbnormalState(),
+                BaseProperty.MemberID(),
+            ],
+        )
     ]
 
+
+async def run_meter(
+    meter: MeterConfig, sinks: list[Sink], database: Optional[SqliteStore] = None
+):
+    """メーター1台分のスタックを実行(いずれかのタスクが異常終了した時点で例外を送出)"""
+    from app.echonet.discovery import CAPABILITY_CACHE_JSON
+    from app.echonet.echonet import Echonet
+    from app.interface.bp35a1_if import EPAN_DATA_JSON, BP35A1Interface
+    from app.metering.backfill import BACKFILL_CHECKPOINT_JSON
+    from app.metering.dedup import FORWARDED_SLOTS_JSON
+    from app.repository.frame_archive import FrameArchiveWriter
+    from app.repository.timeseries import TimeSeriesStore
+    from app.sink.forwarder import forward_readings
+
+    bp35a1_interface = BP35A1Interface(
+        meter.serial_port,
+        meter.rb_id,
+        meter.rb_password,
+        epan_path=meter.data_path(EPAN_DATA_JSON),
+        capture_path=meter.capture_path(),
+        state=database.state(meter.name) if database else None,
+    )
+
+    archive = None
+
     try:
-        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        await bp35a1_interface.init()
+
+        archive_path = meter.archive_path()
+        if archive_path:
+            archive = FrameArchiveWriter(archive_path)
+        elif database:
+            archive = database.frame_writer(meter.name)
+
+        echonet = Echonet(
+            create_device_objects(), bp35a1_interface, name=meter.name, archive=archive
+        )
+        store = TimeSeriesStore()
+
+        tasks = [
+            asyncio.create_task(echonet.proc_tx_task()),
+            asyncio.create_task(echonet.proc_rx_task()),
+            asyncio.create_task(
+                main_task(
+                    echonet,
+                    store,
+                    meter.data_path(BACKFILL_CHECKPOINT_JSON),
+                    meter.data_path(CAPABILITY_CACHE_JSON),
+                    meter.poll_interval,
+                    bp35a1_interface.link_monitor,
+                )
+            ),
+            asyncio.create_task(bp35a1_interface.wait_closed()),
+            asyncio.create_task(bp35a1_interface.link_monitor.run()),
+        ]
+
+        # 出力先への転送は受信処理とは別タスクで行い、遅い出力先が受信を止めないようにする
+        if sinks:
+            tasks.append(
+                asyncio.create_task(
+                    forward_readings(
+                        echonet.subscribe(),
+                        sinks,
+                        meter=meter.name,
+                        checkpoint_path=meter.data_path(FORWARDED_SLOTS_JSON),
+                    )
+                )
+            )
+
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
 
         for task in done:
-            try:
-                result = task.result()
-                print(f"Task completed successfully: {result}")
-            except asyncio.CancelledError:
-                print("Task was cancelled.")
-            except Exception as e:
-                print(f"Task failed with exception: {e}")
-                traceback.print_exc()
+            task.result()
+    finally:
+        await bp35a1_interface.close()
+        if archive:
+            archive.close()
 
-    except KeyboardInterrupt:
-        all_tasks = asyncio.all_tasks()
 
-        for task in all_tasks:
-            task.cancel()
+async def run():
+    from dotenv import load_dotenv
+
+    from app.log.config import (
+        configure_logging,
+        is_raw_line_logging,
+        set_raw_line_logging,
+        stop_logging,
+    )
+    from app.metrics.tracing import TRACER
+    from app.supervisor.config import MeterConfig, SupervisorConfig
+
+    load_dotenv()
+
+    configure_logging(
+        level=os.getenv("LOG_LEVEL", "INFO"),
+        json_format=os.getenv("LOG_FORMAT") == "json",
+        raw_lines=os.getenv("LOG_RAW_LINES") == "1",
+    )
+
+    # SIGUSR1 でシリアル送受信行のデバッグ出力を切り替え(実行中の通信障害調査用)
+    if hasattr(signal, "SIGUSR1"):
+        asyncio.get_running_loop().add_signal_handler(
+            signal.SIGUSR1, lambda: set_raw_line_logging(not is_raw_line_logging())
+        )
+
+    CONFIG_FILE = os.getenv("CONFIG_FILE")
+    METRICS_PORT = os.getenv("METRICS_PORT")
+    TRACE_FILE = os.getenv("TRACE_FILE")
+    SQLITE_PATH = os.getenv("SQLITE_PATH")
+    POLL_INTERVAL = os.getenv("POLL_INTERVAL")
+
+    # 受信・送信経路の区間計測(終了時に Chrome trace 形式で出力)
+    if TRACE_FILE:
+        TRACER.start()
+
+    # 接続処理も計測するため、メトリクス公開は初期化前に開始
+    metrics_server = None
+    if METRICS_PORT:
+        from app.metrics.http_server import MetricsServer
+
+        metrics_server = MetricsServer(
+            host=os.getenv("METRICS_HOST", "127.0.0.1"), port=int(METRICS_PORT)
+        )
+        await metrics_server.start()
+
+    # 出力先は全メーターで共有(計測値にメーター名を付与)
+    sinks = create_sinks()
+
+    # 計測値・受信フレーム・EPANの保存先(計測値の出力先を兼ねる)
+    database = None
+    if SQLITE_PATH:
+        from app.repository.sqlite_store import SqliteStore
 
-        await asyncio.gather(*all_tasks, return_exceptions=True)
+        database = SqliteStore(SQLITE_PATH)
+        sinks.append(database)
+
+    for sink in sinks:
+        sink.start()
+
+    try:
+        if CONFIG_FILE:
+            # 設定ファイルの全メーターを監視し、異常終了したメーターのみ再起動
+            from app.supervisor.supervisor import Supervisor
+
+            config = SupervisorConfig.load(CONFIG_FILE)
+            supervisor = Supervisor(
+                config.meters, lambda meter: run_meter(meter, sinks, database)
+            )
+            await supervisor.run()
+        else:
+            meter = MeterConfig(
+                name=os.getenv("METER_NAME", "default"),
+                serial_port=os.getenv("SERIAL_PORT"),
+                rb_id=os.getenv("RB_ID"),
+                rb_password=os.getenv("RB_PASSWORD"),
+                data_dir=".",
+                capture_dir=os.getenv("CAPTURE_DIR"),
+                archive_dir=os.getenv("ARCHIVE_DIR"),
+                poll_interval=float(POLL_INTERVAL) if POLL_INTERVAL else None,
+            )
+            try:
+                await run_meter(meter, sinks, database)
+            except Exception as e:
+                logger.exception("Task failed with exception: %s", e)
 
     finally:
+        for sink in sinks:
+            sink.close()
+        if metrics_server:
+            await metrics_server.close()
+        if TRACE_FILE:
+            TRACER.stop()
+            TRACER.export(TRACE_FILE)
         await asyncio.sleep(0)
+        stop_logging()
 
 
 if __name__ == "__main__":
+    if "--profile-import" in sys.argv:
+        from benchmarks.import_time import main as profile_import
+
+        sys.exit(profile_import(["main"]))
+
     try:
         asyncio.run(run())
     except KeyboardInterrupt:
@@ -0,0 +1,214 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+from app.echonet.capability import Capabilities
+from app.echonet.enet_data import EchonetData
+from app.echonet.object.classcode import ClassCode, ClassGroupCode
+from app.echonet.protocol.eoj import EnetObject
+from app.echonet.protocol.esv import EnetService
+from app.echonet.property.home_equipment_device.low_voltage_smart_pm import (
+    LowVoltageSmartPm,
+)
+from app.metering.backfill import HALF_HOUR, BackfillEngine, HistoryKind
+from app.repository.timeseries import Series, TimeSeriesStore
+
+SM_ENET_OBJ = EnetObject(
+    classGroupCode=ClassGroupCode.HomeEquipmentDevice,
+    classCode=ClassCode.LowVoltageSmartPowerMeter,
+    instanceCode=0x01,
+)
+CTRL_ENET_OBJ = EnetObject(
+    classGroupCode=ClassGroupCode.ManagerOpDevice,
+    classCode=ClassCode.Controller,
+    instanceCode=0x01,
+)
+
+
+class FakeEchonet:
+    """収集日のSetCを記憶し、履歴のGetにその日時分の計測値を返すスマートメーター"""
+
+    def __init__(self, fail_history: bool = False):
+        self.fail_history: bool = fail_history
+        self.requests: list[EchonetData] = []
+        self._set: dict[int, object] = {}
+
+    def submit(self, data: EchonetData) -> asyncio.Future:
+        self.requests.append(data)
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(self._respond(data))
+        return future
+
+    async def request(self, data: EchonetData) -> list[EchonetData]:
+        return await self.submit(data)
+
+    def history_requests(self) -> list[EchonetData]:
+        return [r for r in self.requests if r.enet_service == EnetService.SetC]
+
+    def _respond(self, data: EchonetData) -> list[EchonetData]:
+        if data.enet_service == EnetService.SetC:
+            if self.fail_history:
+                return [self._response(EnetService.SetC_Sna, data.properties)]
+            for prop in data.properties:
+                self._set[prop.code] = prop
+            return [self._response(EnetService.SetRes, data.properties)]
+
+        if self.fail_history and data.properties[0].code in (0xE2, 0xE4, 0xEC, 0xEE):
+            return []
+
+        properties = []
+        for prop in data.properties:
+            match prop.code:
+                case 0xD3:
+                    properties.append(LowVoltageSmartPm.Coefficient(1))
+                case 0xE1:
+                    properties.append(
+                        LowVoltageSmartPm.CumulativeEnergyUnit(
+                            LowVoltageSmartPm.CumulativeEnergyUnit.Unit(0x01)
+                        )
+                    )
+                case 0xE2 | 0xE4:
+                    collect_day = self._set[0xE5].collect_day
+                    properties.append(type(prop)(collect_day, [10] * 48))
+                case 0xEC:
+                    target = self._set[0xED]
+                    properties.append(
+                        LowVoltageSmartPm.CumulativeEnergyMeasurementHistory2(
+                            target.timestamp,
+                            target.collect_count,
+                            [(10, 0)] * target.collect_count,
+                        )
+                    )
+        return [self._response(EnetService.GetRes, properties)]
+
+    @staticmethod
+    def _response(service: EnetService, properties) -> EchonetData:
+        return EchonetData(SM_ENET_OBJ, CTRL_ENET_OBJ, service, tuple(properties))
+
+
+def _engine(echonet, store, tmp_path, **kwargs) -> BackfillEngine:
+    return BackfillEngine(
+        echonet,
+        store,
+        CTRL_ENET_OBJ,
+        SM_ENET_OBJ,
+        checkpoint_path=str(tmp_path / "backfill.json"),
+        **kwargs,
+    )
+
+
+def _store_with_gap(end: datetime, missing: range, slots: int = 20) -> TimeSeriesStore:
+    """end から slots コマ遡った30分毎の系列(missing のコマは欠測)"""
+    store = TimeSeriesStore()
+    for index in range(slots):
+        if index not in missing:
+            slot = end - HALF_HOUR * index
+            store.insert(Series.INTERVAL_ENERGY_NORMAL, slot.timestamp(), 1.0)
+    return store
+
+
+def _end(now: datetime) -> datetime:
+    return BackfillEngine._floor(now - timedelta(minutes=5), HALF_HOUR)
+
+
+def test_detect_gaps_returns_consecutive_missing_slots(tmp_path):
+    end = datetime(2026, 5, 10, 12, 0)
+    store = _store_with_gap(end, missing=range(4, 7))
+    engine = _engine(FakeEchonet(), store, tmp_path)
+
+    runs = engine.detect_gaps(
+        Series.INTERVAL_ENERGY_NORMAL, end - HALF_HOUR * 19, end, HALF_HOUR
+    )
+
+    assert runs == [[end - HALF_HOUR * index for index in (6, 5, 4)]]
+
+
+def test_plan_half_hour_prefers_history1_for_fragmented_days(tmp_path):
+    now = datetime(2026, 5, 10, 12, 0)
+    engine = _engine(FakeEchonet(), TimeSeriesStore(), tmp_path)
+    day = datetime(2026, 5, 9)
+    short_run = [datetime(2026, 5, 10, 1, 0), datetime(2026, 5, 10, 1, 30)]
+    fragmented = [[day + HALF_HOUR * 2], [day + HALF_HOUR * 30]]
+
+    tasks = engine._plan_half_hour([short_run, *fragmented], now)
+
+    assert [(t.kind, t.timestamp, t.count) for t in tasks] == [
+        (HistoryKind.HISTORY2, short_run[-1], 2),
+        (HistoryKind.HISTORY1, day, BackfillEngine.HISTORY1_SLOTS),
+    ]
+
+
+def test_plan_half_hour_uses_only_supported_history(tmp_path):
+    now = datetime(2026, 5, 10, 12, 0)
+    engine = _engine(
+        FakeEchonet(),
+        TimeSeriesStore(),
+        tmp_path,
+        capabilities=Capabilities(get_epcs=[0xEC], set_epcs=[0xED]),
+    )
+    day = datetime(2026, 5, 9)
+
+    tasks = engine._plan_half_hour([[day + HALF_HOUR * 2], [day + HALF_HOUR * 30]], now)
+
+    assert {t.kind for t in tasks} == {HistoryKind.HISTORY2}
+    assert len(tasks) == 2
+
+
+def test_run_fills_gaps_and_advances_watermark(tmp_path):
+    now = datetime.now().replace(second=0, microsecond=0)
+    end = _end(now)
+    store = _store_with_gap(end, missing=range(3, 6))
+    echonet = FakeEchonet()
+    engine = _engine(echonet, store, tmp_path)
+
+    asyncio.run(engine.run(now))
+
+    start = end - HALF_HOUR * 19
+    assert (
+        engine.detect_gaps(Series.INTERVAL_ENERGY_NORMAL, start, end, HALF_HOUR) == []
+    )
+    checkpoint = json.loads((tmp_path / "backfill.json").read_text())
+    assert checkpoint["tasks"] == []
+    assert checkpoint["watermark"] == end.isoformat()
+
+
+def test_run_resumes_failed_tasks_from_checkpoint(tmp_path):
+    now = datetime.now().replace(second=0, microsecond=0)
+    end = _end(now)
+    store = _store_with_gap(end, missing=range(3, 6))
+
+    asyncio.run(_engine(FakeEchonet(fail_history=True), store, tmp_path).run(now))
+    checkpoint = json.loads((tmp_path / "backfill.json").read_text())
+    # 欠測区間が日付を跨ぐ時刻に実行すると日毎に分かれる
+    planned = len(checkpoint["tasks"])
+    assert planned and all(task["attempts"] == 1 for task in checkpoint["tasks"])
+    assert checkpoint["watermark"] <= (end - HALF_HOUR * 5).isoformat()
+
+    # 再起動後(新しいエンジン)も未完了の要求から補完を再開する
+    echonet = FakeEchonet()
+    asyncio.run(_engine(echonet, store, tmp_path).run(now))
+
+    assert len(echonet.history_requests()) == planned
+    checkpoint = json.loads((tmp_path / "backfill.json").read_text())
+    assert checkpoint["tasks"] == []
+    assert checkpoint["watermark"] == end.isoformat()
+
+
+def test_run_gives_up_after_max_attempts(tmp_path):
+    now = datetime.now().replace(second=0, microsecond=0)
+    end = _end(now)
+    store = _store_with_gap(end, missing=range(3, 6))
+    echonet = FakeEchonet(fail_history=True)
+    engine = _engine(echonet, store, tmp_path, max_attempts=2)
+
+    for _ in range(2):
+        asyncio.run(engine.run(now))
+    checkpoint = json.loads((tmp_path / "backfill.json").read_text())
+    planned = len(checkpoint["tasks"])
+    assert planned and all(task["attempts"] == 2 for task in checkpoint["tasks"])
+    assert len(echonet.history_requests()) == 2 * planned
+    assert checkpoint["watermark"] == end.isoformat()
+
+    # 上限に達した区間は以降要求しない
+    asyncio.run(engine.run(now))
+    assert len(echonet.history_requests()) == 2 * planned